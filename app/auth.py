@@ -6,7 +6,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import User
+from app.models import User, UserRole
 import bcrypt
 
 # 密码加密上下文
@@ -103,3 +103,27 @@ def get_current_user(
         )
     return user
 
+
+
+def get_current_admin_claims(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> dict:
+    """管理员鉴权（仅解析令牌中的 role 声明，不查用户表）
+
+    只用于只读 GET 接口：管理员被降级/禁用后，最长在令牌有效期内
+    （ACCESS_TOKEN_EXPIRE_MINUTES）仍可读取；任何写操作必须用查库校验的 require_admin。
+    不含 role 声明的旧令牌回退到查库校验。
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="无法验证凭据",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = verify_token(token, credentials_exception)
+    role = payload.get("role")
+    if role is None:
+        role = get_current_user(token, db).role.value
+    if role != UserRole.ADMIN.value:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="需要管理员权限")
+    return payload
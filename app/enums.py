@@ -0,0 +1,63 @@
+"""业务枚举（不依赖 SQLAlchemy，供 schemas 等模块直接导入）"""
+import enum
+
+
+class UserRole(str, enum.Enum):
+    """用户角色枚举"""
+    ADMIN = "admin"      # 平台管理员
+    AGENT = "agent"      # 代理(+1/+2)
+    NORMAL = "normal"    # 普通用户/号主
+
+
+class ConfigStatus(str, enum.Enum):
+    """配置状态枚举"""
+    ENABLED = "enabled"
+    DISABLED = "disabled"
+
+
+class EnvStatus(str, enum.Enum):
+    """环境变量状态枚举"""
+    VALID = "valid"
+    INVALID = "invalid"
+
+
+class KSAccountStatus(str, enum.Enum):
+    """快手账号状态枚举"""
+    NORMAL = "normal"    # 正常
+    BLACK = "black"      # 黑号
+    BANNED = "banned"    # 封禁
+    EXPIRED = "expired"  # CK失效
+
+
+class RunLogStatus(str, enum.Enum):
+    """运行日志状态枚举"""
+    SUCCESS = "success"
+    FAIL = "fail"
+    PARTIAL = "partial"
+
+class TransactionType(str, enum.Enum):
+    """钱包交易类型枚举"""
+    SETTLEMENT_INCOME = "settlement_income"  # 结算收入
+    INVITE_REWARD = "invite_reward"          # 邀请奖励
+    WITHDRAW = "withdraw"                    # 提现
+    ADJUST = "adjust"                        # 调整
+    RECHARGE = "recharge"                    # 充值
+    SETTLEMENT_DISTRIBUTE = "settlement_distribute"  # 结算分发（分账）
+
+
+class RechargeOrderStatus(str, enum.Enum):
+    """充值订单状态枚举"""
+    PENDING = "pending"      # 待支付
+    PAID = "paid"           # 已支付
+    CONFIRMED = "confirmed"  # 已确认（已分账）
+    CANCELLED = "cancelled"  # 已取消
+    EXPIRED = "expired"      # 已过期
+
+
+class TransferStatus(str, enum.Enum):
+    """转账状态枚举"""
+    PENDING = "pending"      # 待转账
+    PROCESSING = "processing"  # 转账中
+    SUCCESS = "success"      # 成功
+    FAILED = "failed"        # 失败
+    REFUNDED = "refunded"    # 已退回
@@ -2,7 +2,8 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, Request, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, ORJSONResponse, RedirectResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy import text
 from starlette.templating import Jinja2Templates
@@ -84,12 +85,18 @@ async def lifespan(app: FastAPI):
     logger.info("定时调度器已停止")
     print("定时调度器已停止")
 
+    # 释放青龙客户端的 keep-alive 连接池
+    from app.services.qinglong import close_cached_clients
+    close_cached_clients()
+
 
 # 创建FastAPI应用
 app = FastAPI(
     title="快手账号管理平台",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # 接口默认用 orjson 序列化响应
+    default_response_class=ORJSONResponse,
 )
 
 # 挂载静态文件（使用绝对路径）
@@ -122,7 +129,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     if request.url.path.startswith("/api"):
         return JSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content={"detail": exc.errors()}
+            # model_validator 抛出的 ValueError 会出现在 ctx 中，需先转成可序列化结构
+            content={"detail": jsonable_encoder(exc.errors())}
         )
     # 对于非API请求，重新抛出异常
     raise exc
@@ -159,6 +167,7 @@ app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(account.router)
 app.include_router(ql_instances.router)
+app.include_router(ql_instances.admin_router)
 app.include_router(script_configs.router)
 app.include_router(earnings.router)
 app.include_router(settlements.router)
@@ -259,6 +268,12 @@ async def favicon():
     return Response(status_code=204)
 
 
+@app.get("/healthz")
+async def healthz():
+    """健康检查：附带数据库连接池占用情况"""
+    return {"status": "ok", "db_pool": engine.pool.status()}
+
+
 # ==================== 文档和下载 API ====================
 
 @app.get("/api/guide/content")
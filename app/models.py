@@ -17,69 +17,17 @@ from sqlalchemy import (
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
-import enum
 from app.database import Base
-
-
-class UserRole(str, enum.Enum):
-    """用户角色枚举"""
-    ADMIN = "admin"      # 平台管理员
-    AGENT = "agent"      # 代理(+1/+2)
-    NORMAL = "normal"    # 普通用户/号主
-
-
-class ConfigStatus(str, enum.Enum):
-    """配置状态枚举"""
-    ENABLED = "enabled"
-    DISABLED = "disabled"
-
-
-class EnvStatus(str, enum.Enum):
-    """环境变量状态枚举"""
-    VALID = "valid"
-    INVALID = "invalid"
-
-
-class KSAccountStatus(str, enum.Enum):
-    """快手账号状态枚举"""
-    NORMAL = "normal"    # 正常
-    BLACK = "black"      # 黑号
-    BANNED = "banned"    # 封禁
-    EXPIRED = "expired"  # CK失效
-
-
-class RunLogStatus(str, enum.Enum):
-    """运行日志状态枚举"""
-    SUCCESS = "success"
-    FAIL = "fail"
-    PARTIAL = "partial"
-
-class TransactionType(str, enum.Enum):
-    """钱包交易类型枚举"""
-    SETTLEMENT_INCOME = "settlement_income"  # 结算收入
-    INVITE_REWARD = "invite_reward"          # 邀请奖励
-    WITHDRAW = "withdraw"                    # 提现
-    ADJUST = "adjust"                        # 调整
-    RECHARGE = "recharge"                    # 充值
-    SETTLEMENT_DISTRIBUTE = "settlement_distribute"  # 结算分发（分账）
-
-
-class RechargeOrderStatus(str, enum.Enum):
-    """充值订单状态枚举"""
-    PENDING = "pending"      # 待支付
-    PAID = "paid"           # 已支付
-    CONFIRMED = "confirmed"  # 已确认（已分账）
-    CANCELLED = "cancelled"  # 已取消
-    EXPIRED = "expired"      # 已过期
-
-
-class TransferStatus(str, enum.Enum):
-    """转账状态枚举"""
-    PENDING = "pending"      # 待转账
-    PROCESSING = "processing"  # 转账中
-    SUCCESS = "success"      # 成功
-    FAILED = "failed"        # 失败
-    REFUNDED = "refunded"    # 已退回
+from app.enums import (
+    ConfigStatus,
+    EnvStatus,
+    KSAccountStatus,
+    RechargeOrderStatus,
+    RunLogStatus,
+    TransactionType,
+    TransferStatus,
+    UserRole,
+)
 
 
 # ==================== 用户与登录模块 ====================
@@ -114,6 +62,10 @@ class User(Base):
     ks_accounts = relationship("KSAccount", back_populates="user")
     wallet = relationship("WalletAccount", back_populates="user", uselist=False)
 
+    __table_args__ = (
+        Index("idx_users_status_id", "status", "id"),
+    )
+
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', role='{self.role.value}')>"
 
@@ -125,8 +77,8 @@ class UserReferral(Base):
     __tablename__ = "user_referrals"
 
     user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True, comment="被邀请人（号主）")
-    inviter_level1 = Column(BigInteger, ForeignKey("users.id"), nullable=True, comment="+1，直接邀请人")
-    inviter_level2 = Column(BigInteger, ForeignKey("users.id"), nullable=True, comment="+2，邀请+1的人")
+    inviter_level1 = Column(BigInteger, ForeignKey("users.id"), nullable=True, index=True, comment="+1，直接邀请人")
+    inviter_level2 = Column(BigInteger, ForeignKey("users.id"), nullable=True, index=True, comment="+2，邀请+1的人")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # 关系
@@ -196,7 +148,7 @@ class UserScriptEnv(Base):
     __tablename__ = "user_script_envs"
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    config_id = Column(BigInteger, ForeignKey("user_script_configs.id"), nullable=False, comment="user_script_configs.id")
+    config_id = Column(BigInteger, ForeignKey("user_script_configs.id"), nullable=False, index=True, comment="user_script_configs.id")
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=True, index=True, comment="归属用户（users.id）")
     env_name = Column(String(100), nullable=False, index=True, comment="环境变量名，例如 KS_COOKIE")
     env_value = Column(Text, nullable=False, comment="变量值，例如 CK")
@@ -224,6 +176,11 @@ class UserScriptEnv(Base):
     ip = relationship("IPPool")
     user_ip = relationship("UserIPPool")
 
+    __table_args__ = (
+        # 按配置取某类变量（如 ksck* 前缀）：config_id 等值 + env_name 前缀范围，同一索引内完成
+        Index("idx_env_config_name_status", "config_id", "env_name", "status"),
+    )
+
     def __repr__(self):
         return f"<UserScriptEnv(id={self.id}, env_name='{self.env_name}')>"
 
@@ -366,6 +323,7 @@ class SettlementPeriod(Base):
 
     __table_args__ = (
         UniqueConstraint("period_start", "period_end", name="uk_period_range"),
+        Index("idx_periods_active", "is_active"),
     )
 
     @hybrid_property
@@ -456,6 +414,7 @@ class SettlementUserPayable(Base):
 
     __table_args__ = (
         Index("idx_payable_status", "period_id", "status"),
+        Index("idx_payable_user_status", "user_id", "status"),
     )
 
     def __repr__(self):
@@ -484,6 +443,7 @@ class SettlementPayment(Base):
     __table_args__ = (
         Index("idx_payments_period_user", "period_id", "payer_user_id"),
         Index("idx_payments_status", "period_id", "status"),
+        Index("idx_payments_payer", "payer_user_id", "period_id"),
     )
 
     def __repr__(self):
@@ -511,6 +471,8 @@ class SettlementCommission(Base):
     __table_args__ = (
         Index("idx_comm_beneficiary", "period_id", "beneficiary_user_id", "funding_status", "is_unlocked"),
         Index("idx_comm_source", "period_id", "source_user_id", "funding_status"),
+        # 资金化入账按 funded_at 精确匹配并聚合 amount_coins：覆盖索引，避免回表
+        Index("idx_comm_source_funded", "period_id", "source_user_id", "funding_status", "funded_at", "amount_coins"),
     )
 
     def __repr__(self):
@@ -557,6 +519,7 @@ class SettlementBanReport(Base):
         Index("idx_ban_period_user", "period_id", "user_id"),
         Index("idx_ban_period_status", "period_id", "status", "is_applied"),
         Index("idx_ban_reviewed", "reviewed_by", "reviewed_at"),
+        Index("idx_ban_user", "user_id", "report_id"),
     )
 
     def __repr__(self):
@@ -598,7 +561,9 @@ class WalletLedger(Base):
 
     __table_args__ = (
         Index("idx_ledger_user_time", "user_id", "created_at"),
+        Index("idx_ledger_user_id", "user_id", "ledger_id"),
         Index("idx_ledger_user_period", "user_id", "period_id"),
+        Index("idx_ledger_period_source", "period_id", "ref_source_user_id"),
     )
 
     def __repr__(self):
@@ -2,6 +2,8 @@
 管理员相关路由
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
@@ -15,6 +17,9 @@ from app.schemas import Token
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
+# 列表序列化适配器（模块加载时构建一次）
+_USER_LIST_ADAPTER = TypeAdapter(List[UserResponse])
+
 
 @router.post("/create-admin", response_model=Token)
 async def create_admin_account(
@@ -70,7 +75,7 @@ async def create_admin_account(
     # 生成访问令牌
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": admin_user.username},
+        data={"sub": admin_user.username, "role": admin_user.role.value},
         expires_delta=access_token_expires
     )
     
@@ -82,7 +87,7 @@ async def create_admin_account(
 
 
 @router.get("/users")
-async def list_all_users(
+def list_all_users(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -94,30 +99,33 @@ async def list_all_users(
         )
 
     users = db.query(User).all()
-    result = []
-
-    for user in users:
-        user_data = UserResponse.model_validate(user).model_dump()
-
-        # 获取用户的ksck列表
-        configs = db.query(UserScriptConfig).filter(UserScriptConfig.user_id == user.id).all()
-        ksck_list = []
-        for config in configs:
-            envs = db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config.id).all()
-            for env in envs:
-                # 将status转换为字符串值，处理Enum对象
-                status_str = env.status.value if hasattr(env.status, 'value') else str(env.status)
-                ksck_list.append({
-                    "id": env.id,
-                    "name": env.env_name,
-                    "status": status_str
-                })
+    result = _USER_LIST_ADAPTER.dump_python(
+        _USER_LIST_ADAPTER.validate_python(users, from_attributes=True), mode="json"
+    )
 
+    # 一次 JOIN 取回全部 ksck，按用户分组（不再逐用户、逐配置查询）
+    env_rows = (
+        db.query(UserScriptConfig.user_id, UserScriptEnv.id, UserScriptEnv.env_name, UserScriptEnv.status)
+        .join(UserScriptConfig, UserScriptEnv.config_id == UserScriptConfig.id)
+        .order_by(UserScriptConfig.id, UserScriptEnv.id)
+        .all()
+    )
+    ksck_by_user = {}
+    for user_id, env_id, env_name, env_status in env_rows:
+        # 将status转换为字符串值，处理Enum对象
+        status_str = env_status.value if hasattr(env_status, 'value') else str(env_status)
+        ksck_by_user.setdefault(user_id, []).append({
+            "id": env_id,
+            "name": env_name,
+            "status": status_str
+        })
+
+    for user_data in result:
+        ksck_list = ksck_by_user.get(user_data["id"], [])
         user_data["ksck_count"] = len(ksck_list)
         user_data["ksck_list"] = ksck_list
-        result.append(user_data)
 
-    return result
+    return ORJSONResponse(result)
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
@@ -8,13 +8,15 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from decimal import Decimal
 
 from app.database import get_db
 from app.models import AlipayConfig, User, UserRole
 from app.auth import get_current_user
+from app.schemas import ORMModel
+from app.services.alipay_service import invalidate_alipay_config_cache
 
 router = APIRouter(prefix="/api/admin/alipay", tags=["支付宝配置"])
 
@@ -47,7 +49,8 @@ class AlipayConfigCreate(BaseModel):
 
     remark: Optional[str] = Field(None, max_length=255, description="备注")
 
-    @validator('private_key', 'alipay_public_key')
+    @field_validator('private_key', 'alipay_public_key')
+    @classmethod
     def validate_pem_format(cls, v):
         """验证PEM格式"""
         if not v.startswith('-----'):
@@ -76,7 +79,7 @@ class AlipayConfigUpdate(BaseModel):
     remark: Optional[str] = None
 
 
-class AlipayConfigResponse(BaseModel):
+class AlipayConfigResponse(ORMModel):
     """支付宝配置响应"""
     id: int
     name: str
@@ -100,9 +103,6 @@ class AlipayConfigResponse(BaseModel):
     private_key: Optional[str] = None
     alipay_public_key: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== API 接口 ====================
 
@@ -152,6 +152,7 @@ async def create_alipay_config(
 
     db.add(config)
     db.commit()
+    invalidate_alipay_config_cache()
     db.refresh(config)
 
     return _format_config_response(config)
@@ -246,6 +247,7 @@ async def update_alipay_config(
         setattr(config, key, value)
 
     db.commit()
+    invalidate_alipay_config_cache()
     db.refresh(config)
 
     return _format_config_response(config)
@@ -276,6 +278,7 @@ async def delete_alipay_config(
 
     db.delete(config)
     db.commit()
+    invalidate_alipay_config_cache()
 
     return {"message": "已删除"}
 
@@ -311,6 +314,7 @@ async def enable_alipay_config(
     # 启用当前配置
     config.status = 1
     db.commit()
+    invalidate_alipay_config_cache()
 
     return {"message": "已启用"}
 
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User, UserReferral, UserRole
-from app.schemas import UserRegister, UserLogin, Token, UserResponse, Message, BindInviterRequest, ReferralInfo
+from app.schemas import (
+    UserRegister, UserLogin, Token, UserResponse, Message, BindInviterRequest, InviterBrief, ReferralInfo
+)
 from app.auth import (
     hash_password,
     verify_password,
@@ -21,11 +23,10 @@ def generate_referral_code(user_id: int) -> str:
 
 def find_inviter_by_code(db: Session, invite_code: str) -> User:
     """根据邀请码查找邀请人"""
+    # 首尾空白已在 schema 层去除
     if not invite_code:
         return None
-    
-    invite_code = invite_code.strip()
-    
+
     # 1. 首先按 referral_code 查找（推荐方式）
     inviter = db.query(User).filter(User.referral_code == invite_code).first()
     if inviter:
@@ -123,7 +124,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         # 生成访问令牌
         access_token_expires = timedelta(minutes=30)
         access_token = create_access_token(
-            data={"sub": new_user.username},
+            data={"sub": new_user.username, "role": new_user.role.value},
             expires_delta=access_token_expires
         )
         
@@ -182,7 +183,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     # 生成访问令牌
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "role": user.role.value},
         expires_delta=access_token_expires
     )
     
@@ -222,11 +223,7 @@ async def get_my_referral_info(
     if current_user.inviter_id:
         inviter = db.query(User).filter(User.id == current_user.inviter_id).first()
         if inviter:
-            inviter_info = {
-                "id": inviter.id,
-                "username": inviter.username,
-                "nickname": inviter.nickname
-            }
+            inviter_info = InviterBrief.model_validate(inviter)
     
     # 统计我邀请的人数
     level1_count = db.query(UserReferral).filter(
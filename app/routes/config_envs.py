@@ -1,16 +1,17 @@
 import random
 import re
 from datetime import date, datetime, timedelta
-from typing import List, Optional, Set
+from typing import Dict, List, Optional, Set, Union
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import exists, func, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.auth import get_current_user
-from app.database import get_db
+from app.database import get_db, safe_options
 from app.logging_config import get_logger
 from app.models import (
     EnvStatus,
@@ -26,14 +27,18 @@ from app.models import (
     EarningRecord,
 )
 from app.schemas import (
+    IPInfo,
     UserScriptConfigResponse,
     UserScriptEnvResponse,
 )
 from app.services.account_health import classify_account_health, pick_account_health_basis
-from app.services.qinglong import QingLongClient
+from app.services.qinglong import QingLongClient, get_cached_client
 
 router = APIRouter(prefix="/api/config-envs", tags=["配置环境"])
 
+# 列表序列化适配器（模块加载时构建一次）
+_ENV_LIST_ADAPTER = TypeAdapter(List[UserScriptEnvResponse])
+
 DEFAULT_QL_NAME = "默认青龙实例"
 DEFAULT_QL_BASE_URL = "http://192.168.5.204:1116"
 DEFAULT_QL_CLIENT_ID = "N16sNCmXwY_S"
@@ -45,6 +50,9 @@ IP_MODE_USER_POOL = "user_pool"
 VALID_IP_MODES = {IP_MODE_SYSTEM_RANDOM, IP_MODE_USER_POOL}
 VALID_IP_STATUSES = {"active", "disabled"}
 
+KSCK_MAX_INDEX = 888
+_KSCK_NAME_RE = re.compile(r"ksck(\d*)$")
+
 
 def require_admin(current_user: User = Depends(get_current_user)) -> User:
     """要求管理员权限"""
@@ -55,8 +63,8 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
 
 class KSCKEnvPayload(BaseModel):
     """新增/修改 ksck 变量的载荷"""
-    cookie: Optional[str] = Field(None, description="ksck 值（必填）")
-    remark: Optional[str] = Field(None, description="备注")
+    cookie: Optional[str] = Field(None, max_length=16384, description="ksck 值（必填）")
+    remark: Optional[str] = Field(None, max_length=255, description="备注")
     ip_mode: Optional[str] = Field(None, description="IP模式：system_random/user_pool")
     ip_id: Optional[int] = Field(None, description="IP池ID")
     user_ip_id: Optional[int] = Field(None, description="用户自有代理池ID")
@@ -129,8 +137,42 @@ def build_ql_value(env: UserScriptEnv, proxy_url: str) -> str:
     return f"{remark}#{cookie}#{proxy_url or ''}"
 
 
-def recalc_ip_usage(db: Session, ip_ids: Optional[Set[int]] = None) -> None:
-    """刷新 IP 使用次数到 ip_pool.usage_count（不使用触发器）"""
+def build_ip_info(ip: Union[IPPool, UserIPPool], used: int) -> IPInfo:
+    """构造 IP 信息（系统 IP / 用户自有代理；数据来自数据库，跳过校验）"""
+    proxy_url = build_user_proxy_url(ip) if isinstance(ip, UserIPPool) else build_proxy_url(ip)
+    return IPInfo.model_construct(
+        id=ip.id,
+        proxy_url=proxy_url,
+        region=ip.region,
+        vendor=ip.vendor,
+        max_users=ip.max_users or 2,
+        used=int(used or 0),
+    )
+
+
+# 直接从 ORM 行读取的响应字段（ip_mode / IP 信息由调用方单独挂载）
+_ENV_RESPONSE_COLUMNS = tuple(
+    name for name in UserScriptEnvResponse.model_fields if name not in ("ip_mode", "ip_info", "user_ip_info")
+)
+
+
+def build_env_response(
+    env: UserScriptEnv,
+    ip_mode: str,
+    ip_info: Optional[IPInfo] = None,
+    user_ip_info: Optional[IPInfo] = None,
+) -> UserScriptEnvResponse:
+    """ORM 环境变量直接转换为响应模型（数据来自数据库，model_construct 跳过逐字段校验）"""
+    values = {name: getattr(env, name) for name in _ENV_RESPONSE_COLUMNS}
+    status_value = values["status"]
+    values["status"] = status_value.value if isinstance(status_value, EnvStatus) else status_value
+    return UserScriptEnvResponse.model_construct(
+        **values, ip_mode=ip_mode, ip_info=ip_info, user_ip_info=user_ip_info
+    )
+
+
+def recalc_ip_usage(db: Session, ip_ids: Optional[Set[int]] = None) -> Dict[int, int]:
+    """刷新 IP 使用次数到 ip_pool.usage_count（不使用触发器），返回 {ip_id: 使用数}"""
     # 统计当前使用数
     usage_query = db.query(UserScriptEnv.ip_id, func.count(UserScriptEnv.id)).filter(
         UserScriptEnv.ip_id.isnot(None),
@@ -147,16 +189,17 @@ def recalc_ip_usage(db: Session, ip_ids: Optional[Set[int]] = None) -> None:
         else set(ip_ids)
     )
     if not targets:
-        return
+        return {}
     for ip_id in targets:
         db.query(IPPool).filter(IPPool.id == ip_id).update(
             {"usage_count": usage_map.get(ip_id, 0)}
         )
     db.flush()
+    return {ip_id: int(usage_map.get(ip_id, 0)) for ip_id in targets}
 
 
-def recalc_user_ip_usage(db: Session, user_ip_ids: Optional[Set[int]] = None) -> None:
-    """刷新用户自有 IP 使用次数到 user_ip_pool.usage_count（不使用触发器）"""
+def recalc_user_ip_usage(db: Session, user_ip_ids: Optional[Set[int]] = None) -> Dict[int, int]:
+    """刷新用户自有 IP 使用次数到 user_ip_pool.usage_count（不使用触发器），返回 {ip_id: 使用数}"""
     usage_query = db.query(UserScriptEnv.user_ip_id, func.count(UserScriptEnv.id)).filter(
         UserScriptEnv.user_ip_id.isnot(None),
         UserScriptEnv.status == EnvStatus.VALID.value,
@@ -172,12 +215,13 @@ def recalc_user_ip_usage(db: Session, user_ip_ids: Optional[Set[int]] = None) ->
         else set(user_ip_ids)
     )
     if not targets:
-        return
+        return {}
     for ip_id in targets:
         db.query(UserIPPool).filter(UserIPPool.id == ip_id).update(
             {"usage_count": usage_map.get(ip_id, 0)}
         )
     db.flush()
+    return {ip_id: int(usage_map.get(ip_id, 0)) for ip_id in targets}
 
 
 def normalize_ip_mode_or_default(ip_mode: Optional[str]) -> str:
@@ -195,17 +239,17 @@ def can_manage_user(current_user: User, target_user_id: int, db: Session) -> boo
     if current_user.id == target_user_id:
         return True
 
-    referral = (
-        db.query(UserReferral).filter(UserReferral.user_id == target_user_id).first()
+    return bool(
+        db.query(
+            exists().where(
+                UserReferral.user_id == target_user_id,
+                or_(
+                    UserReferral.inviter_level1 == current_user.id,
+                    UserReferral.inviter_level2 == current_user.id,
+                ),
+            )
+        ).scalar()
     )
-    if not referral:
-        return False
-
-    if referral.inviter_level1 == current_user.id:
-        return True
-    if referral.inviter_level2 == current_user.id:
-        return True
-    return False
 
 
 def can_create_env(current_user: User, target_user_id: int, db: Session) -> bool:
@@ -251,20 +295,23 @@ def get_manageable_user_ids(current_user: User, db: Session) -> Set[int]:
 
 
 def get_manageable_users(current_user: User, db: Session):
-    """获取可管理的用户信息列表"""
-    ids = get_manageable_user_ids(current_user, db)
-    users = (
-        db.query(User)
-        .filter(User.id.in_(ids), User.status == 1)
-        .order_by(User.id)
-        .all()
-    )
+    """获取可管理的用户信息列表（单次查询：User LEFT JOIN UserReferral）"""
+    query = db.query(User).filter(User.status == 1)
+    if current_user.role != UserRole.ADMIN:
+        query = query.outerjoin(UserReferral, UserReferral.user_id == User.id).filter(
+            or_(
+                User.id == current_user.id,
+                UserReferral.inviter_level1 == current_user.id,
+                UserReferral.inviter_level2 == current_user.id,
+            )
+        )
+    users = query.order_by(User.id).all()
     return [
         {
             "id": u.id,
             "username": u.username,
             "nickname": u.nickname,
-            "role": u.role.value if hasattr(u.role, "value") else u.role,
+            "role": u.role.value,
         }
         for u in users
     ]
@@ -272,25 +319,20 @@ def get_manageable_users(current_user: User, db: Session):
 
 def generate_env_name(db: Session, config_id: int) -> str:
     """生成全局顺序变量名 ksck1..ksck888（忽略其他前缀，复用缺口）"""
-    existing = [
-        name
-        for (name,) in db.query(UserScriptEnv.env_name).filter(
-            UserScriptEnv.env_name.like("ksck%")
-        )
-    ]
-    prefix = "ksck"
-    used = set()
-    for name in existing:
-        if not name.startswith(prefix):
+    used = bytearray(KSCK_MAX_INDEX + 1)
+    for (name,) in db.query(UserScriptEnv.env_name).filter(
+        UserScriptEnv.env_name.like("ksck%")
+    ):
+        m = _KSCK_NAME_RE.match(name or "")
+        if not m:
             continue
-        suffix = name[len(prefix):]
-        if suffix == "":
-            used.add(1)
-        elif suffix.isdigit():
-            used.add(int(suffix))
-    for i in range(1, 889):  # 1..888
-        if i not in used:
-            return f"{prefix}{i}"
+        # 无后缀的 "ksck" 视为占用 1 号
+        index = int(m.group(1)) if m.group(1) else 1
+        if 1 <= index <= KSCK_MAX_INDEX:
+            used[index] = 1
+    for i in range(1, KSCK_MAX_INDEX + 1):
+        if not used[i]:
+            return f"ksck{i}"
     raise HTTPException(status_code=400, detail="ksck 序号已用尽（1-888）")
 
 
@@ -415,8 +457,7 @@ def assert_unique_remark(db: Session, remark: str, exclude_env_id: Optional[int]
     query = db.query(UserScriptEnv.id).filter(UserScriptEnv.remark == remark)
     if exclude_env_id is not None:
         query = query.filter(UserScriptEnv.id != exclude_env_id)
-    exists = db.query(query.exists()).scalar()
-    if exists:
+    if db.query(query.exists()).scalar():
         raise HTTPException(status_code=400, detail="备注必须为唯一值")
 
 
@@ -459,7 +500,7 @@ def get_ql_client_for_config(config: UserScriptConfig, db: Session) -> QingLongC
 
     if instance.status != 1:
         raise HTTPException(status_code=400, detail="青龙实例已停用")
-    return QingLongClient(instance)
+    return get_cached_client(instance)
 
 
 def sync_env_to_ql(
@@ -490,8 +531,10 @@ async def list_manageable_configs(
 ):
     """列出当前用户可管理的配置列表"""
     manageable_ids = get_manageable_user_ids(current_user, db)
-    query = db.query(UserScriptConfig).filter(
-        UserScriptConfig.user_id.in_(manageable_ids)
+    query = (
+        db.query(UserScriptConfig)
+        .options(*safe_options())
+        .filter(UserScriptConfig.user_id.in_(manageable_ids))
     )
     configs = query.order_by(UserScriptConfig.id.desc()).all()
     return configs
@@ -752,6 +795,7 @@ async def list_available_ips(
     """获取IP池列表（包含容量信息）"""
     ips = (
         db.query(IPPool)
+        .options(*safe_options())
         .filter(
             IPPool.status == "active",
             (IPPool.expire_date.is_(None)) | (IPPool.expire_date >= date.today()),
@@ -1035,12 +1079,10 @@ async def admin_create_system_ip(
         raise HTTPException(status_code=400, detail="IP 不能为空")
     status_value = _normalize_ip_status_or_400(payload.status) or "active"
 
-    exists = (
-        db.query(IPPool.id)
-        .filter(IPPool.ip == ip_str, IPPool.port == payload.port)
-        .first()
-    )
-    if exists:
+    duplicated = db.query(
+        exists().where(IPPool.ip == ip_str, IPPool.port == payload.port)
+    ).scalar()
+    if duplicated:
         raise HTTPException(status_code=400, detail="该 IP:端口 已存在")
 
     record = IPPool(
@@ -1540,7 +1582,8 @@ async def create_user_ip_pool(
 
 
 @router.get(
-    "/configs/{config_id}/envs", response_model=List[UserScriptEnvResponse]
+    "/configs/{config_id}/envs",
+    response_model=List[UserScriptEnvResponse],
 )
 async def list_envs(
     config_id: int,
@@ -1552,6 +1595,7 @@ async def list_envs(
     assert_config_permission(current_user, config, db)
     envs = (
         db.query(UserScriptEnv)
+        .options(*safe_options(selectinload(UserScriptEnv.ip), selectinload(UserScriptEnv.user_ip)))
         .filter(
             UserScriptEnv.config_id == config_id,
             ~UserScriptEnv.env_name.like("__archived__%")
@@ -1562,16 +1606,10 @@ async def list_envs(
     system_ip_ids = {env.ip_id for env in envs if env.ip_id}
     user_ip_ids = {env.user_ip_id for env in envs if env.user_ip_id}
 
-    system_ip_map = {}
-    user_ip_map = {}
     system_usage_map = {}
     user_usage_map = {}
 
     if system_ip_ids:
-        system_ip_map = {
-            ip.id: ip
-            for ip in db.query(IPPool).filter(IPPool.id.in_(system_ip_ids)).all()
-        }
         usage_rows = (
             db.query(UserScriptEnv.ip_id, func.count(UserScriptEnv.id))
             .filter(
@@ -1584,10 +1622,6 @@ async def list_envs(
         system_usage_map = {ip_id: int(count or 0) for ip_id, count in usage_rows}
 
     if user_ip_ids:
-        user_ip_map = {
-            ip.id: ip
-            for ip in db.query(UserIPPool).filter(UserIPPool.id.in_(user_ip_ids)).all()
-        }
         usage_rows = (
             db.query(UserScriptEnv.user_ip_id, func.count(UserScriptEnv.id))
             .filter(
@@ -1605,50 +1639,19 @@ async def list_envs(
         if mode not in VALID_IP_MODES:
             mode = IP_MODE_SYSTEM_RANDOM
 
-        ip = system_ip_map.get(env.ip_id) if env.ip_id else None
-        user_ip = user_ip_map.get(env.user_ip_id) if env.user_ip_id else None
+        ip = env.ip
+        user_ip = env.user_ip
 
         ip_info = None
         user_ip_info = None
 
         if mode == IP_MODE_USER_POOL and user_ip:
-            user_ip_info = {
-                "id": user_ip.id,
-                "proxy_url": build_user_proxy_url(user_ip),
-                "region": user_ip.region,
-                "vendor": user_ip.vendor,
-                "max_users": user_ip.max_users or 2,
-                "used": user_usage_map.get(user_ip.id, 0),
-            }
+            user_ip_info = build_ip_info(user_ip, user_usage_map.get(user_ip.id, 0))
         elif ip:
-            ip_info = {
-                "id": ip.id,
-                "proxy_url": build_proxy_url(ip),
-                "region": ip.region,
-                "vendor": ip.vendor,
-                "max_users": ip.max_users or 2,
-                "used": system_usage_map.get(ip.id, 0),
-            }
-        result.append(
-            {
-                "id": env.id,
-                "config_id": env.config_id,
-                "env_name": env.env_name,
-                "env_value": env.env_value,
-                "ql_env_id": env.ql_env_id,
-                "ip_mode": mode,
-                "ip_id": env.ip_id,
-                "ip_info": ip_info,
-                "user_ip_id": env.user_ip_id,
-                "user_ip_info": user_ip_info,
-                "status": env.status,
-                "remark": env.remark,
-                "disabled_until": env.disabled_until.isoformat() if env.disabled_until else None,
-                "created_at": env.created_at,
-                "updated_at": env.updated_at,
-            }
-        )
-    return result
+            ip_info = build_ip_info(ip, system_usage_map.get(ip.id, 0))
+        result.append(build_env_response(env, mode, ip_info, user_ip_info))
+    # 元素已由 model_construct 构建，直接序列化返回，跳过 response_model 的再次校验
+    return ORJSONResponse(_ENV_LIST_ADAPTER.dump_python(result, mode="json"))
 
 
 @router.post(
@@ -1656,7 +1659,7 @@ async def list_envs(
     response_model=UserScriptEnvResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_env(
+def create_env(
     config_id: int,
     data: KSCKEnvPayload,
     db: Session = Depends(get_db),
@@ -1759,15 +1762,7 @@ async def create_env(
             .scalar()
             or 0
         )
-        ip_info = {
-            "id": system_ip_obj.id,
-            "proxy_url": build_proxy_url(system_ip_obj),
-            "region": system_ip_obj.region,
-            "vendor": system_ip_obj.vendor,
-            "max_users": system_ip_obj.max_users or 2,
-            "used": used_count,
-            "usage_count": used_count,
-        }
+        ip_info = build_ip_info(system_ip_obj, used_count)
 
     if user_ip_obj:
         used_count = (
@@ -1779,40 +1774,16 @@ async def create_env(
             .scalar()
             or 0
         )
-        user_ip_info = {
-            "id": user_ip_obj.id,
-            "proxy_url": build_user_proxy_url(user_ip_obj),
-            "region": user_ip_obj.region,
-            "vendor": user_ip_obj.vendor,
-            "max_users": user_ip_obj.max_users or 2,
-            "used": used_count,
-            "usage_count": used_count,
-        }
+        user_ip_info = build_ip_info(user_ip_obj, used_count)
 
-    return {
-        "id": env.id,
-        "config_id": env.config_id,
-        "env_name": env.env_name,
-        "env_value": env.env_value,
-        "ql_env_id": env.ql_env_id,
-        "ip_mode": ip_mode,
-        "ip_id": env.ip_id,
-        "ip_info": ip_info,
-        "user_ip_id": env.user_ip_id,
-        "user_ip_info": user_ip_info,
-        "status": env.status,
-        "remark": env.remark,
-        "disabled_until": env.disabled_until.isoformat() if env.disabled_until else None,
-        "created_at": env.created_at,
-        "updated_at": env.updated_at,
-    }
+    return build_env_response(env, ip_mode, ip_info, user_ip_info)
 
 
 @router.put(
     "/configs/{config_id}/envs/{env_id}",
     response_model=UserScriptEnvResponse,
 )
-async def update_env(
+def update_env(
     config_id: int,
     env_id: int,
     data: KSCKEnvPayload,
@@ -1835,7 +1806,7 @@ async def update_env(
 
     old_remark = (env.remark or "").strip()
     if old_remark and remark != old_remark:
-        used_in_earnings = db.query(EarningRecord).filter(EarningRecord.env_id == env.id).first()
+        used_in_earnings = db.query(exists().where(EarningRecord.env_id == env.id)).scalar()
         if used_in_earnings:
             raise HTTPException(status_code=400, detail="备注已用于收益统计，不能修改")
 
@@ -1917,8 +1888,14 @@ async def update_env(
         logger.info("同步到青龙成功: env_name=%s, ql_env_id=%s", env.env_name, env.ql_env_id)
 
         config.last_sync_at = datetime.now()
+
+        # 与变量更新同一事务重算 IP 使用数，返回值直接用于响应，无需再次 COUNT
+        db.flush()
+        system_ids_to_recalc: Set[int] = {i for i in (old_ip_id, env.ip_id) if i}
+        user_ids_to_recalc: Set[int] = {i for i in (old_user_ip_id, env.user_ip_id) if i}
+        system_usage_map = recalc_ip_usage(db, system_ids_to_recalc) if system_ids_to_recalc else {}
+        user_usage_map = recalc_user_ip_usage(db, user_ids_to_recalc) if user_ids_to_recalc else {}
         db.commit()
-        db.refresh(env)
     except Exception as exc:
         db.rollback()
         logger.error(f"同步青龙失败: env_id={env_id}, env_name={env.env_name}, error={exc}", exc_info=True)
@@ -1927,22 +1904,6 @@ async def update_env(
             detail=f"同步青龙失败: {exc}"
         )
 
-    system_ids_to_recalc: Set[int] = set()
-    if old_ip_id:
-        system_ids_to_recalc.add(old_ip_id)
-    if env.ip_id:
-        system_ids_to_recalc.add(env.ip_id)
-    if system_ids_to_recalc:
-        recalc_ip_usage(db, system_ids_to_recalc)
-
-    user_ids_to_recalc: Set[int] = set()
-    if old_user_ip_id:
-        user_ids_to_recalc.add(old_user_ip_id)
-    if env.user_ip_id:
-        user_ids_to_recalc.add(env.user_ip_id)
-    if user_ids_to_recalc:
-        recalc_user_ip_usage(db, user_ids_to_recalc)
-
     ip_info = None
     user_ip_info = None
     current_ip_mode = (env.ip_mode or IP_MODE_SYSTEM_RANDOM).strip()
@@ -1956,67 +1917,19 @@ async def update_env(
                 db.query(UserIPPool).filter(UserIPPool.id == env.user_ip_id).first()
             )
         if current_user_ip:
-            used_count = (
-                db.query(func.count(UserScriptEnv.id))
-                .filter(
-                    UserScriptEnv.user_ip_id == current_user_ip.id,
-                    UserScriptEnv.status == EnvStatus.VALID.value,
-                )
-                .scalar()
-                or 0
-            )
-            user_ip_info = {
-                "id": current_user_ip.id,
-                "proxy_url": build_user_proxy_url(current_user_ip),
-                "region": current_user_ip.region,
-                "vendor": current_user_ip.vendor,
-                "max_users": current_user_ip.max_users or 2,
-                "used": used_count,
-            }
+            user_ip_info = build_ip_info(current_user_ip, user_usage_map.get(current_user_ip.id, 0))
     elif env.ip_id:
         current_ip = system_ip_obj
         if not current_ip or current_ip.id != env.ip_id:
             current_ip = db.query(IPPool).filter(IPPool.id == env.ip_id).first()
         if current_ip:
-            used_count = (
-                db.query(func.count(UserScriptEnv.id))
-                .filter(
-                    UserScriptEnv.ip_id == current_ip.id,
-                    UserScriptEnv.status == EnvStatus.VALID.value,
-                )
-                .scalar()
-                or 0
-            )
-            ip_info = {
-                "id": current_ip.id,
-                "proxy_url": build_proxy_url(current_ip),
-                "region": current_ip.region,
-                "vendor": current_ip.vendor,
-                "max_users": current_ip.max_users or 2,
-                "used": used_count,
-            }
+            ip_info = build_ip_info(current_ip, system_usage_map.get(current_ip.id, 0))
 
-    return {
-        "id": env.id,
-        "config_id": env.config_id,
-        "env_name": env.env_name,
-        "env_value": env.env_value,
-        "ql_env_id": env.ql_env_id,
-        "ip_mode": current_ip_mode,
-        "ip_id": env.ip_id,
-        "ip_info": ip_info,
-        "user_ip_id": env.user_ip_id,
-        "user_ip_info": user_ip_info,
-        "status": env.status,
-        "remark": env.remark,
-        "disabled_until": env.disabled_until.isoformat() if env.disabled_until else None,
-        "created_at": env.created_at,
-        "updated_at": env.updated_at,
-    }
+    return build_env_response(env, current_ip_mode, ip_info, user_ip_info)
 
 
 @router.delete("/configs/{config_id}/envs/{env_id}")
-async def delete_env(
+def delete_env(
     config_id: int,
     env_id: int,
     db: Session = Depends(get_db),
@@ -2027,7 +1940,7 @@ async def delete_env(
     assert_config_permission(current_user, config, db)
     env = get_env_or_404(env_id, config_id, db)
 
-    used_in_earnings = db.query(EarningRecord).filter(EarningRecord.env_id == env.id).first()
+    used_in_earnings = db.query(exists().where(EarningRecord.env_id == env.id)).scalar()
     if used_in_earnings:
         raise HTTPException(status_code=400, detail="该账号已存在收益记录，不能删除；请改为禁用")
 
@@ -2052,7 +1965,7 @@ async def delete_env(
 
 
 @router.post("/configs/{config_id}/envs/{env_id}/enable")
-async def enable_env(
+def enable_env(
     config_id: int,
     env_id: int,
     db: Session = Depends(get_db),
@@ -2106,7 +2019,7 @@ async def enable_env(
 
 
 @router.post("/configs/{config_id}/envs/{env_id}/disable")
-async def disable_env(
+def disable_env(
     config_id: int,
     env_id: int,
     db: Session = Depends(get_db),
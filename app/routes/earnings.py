@@ -4,6 +4,7 @@ from datetime import date, timedelta
 from typing import Dict, List, Optional, Set
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
@@ -99,6 +100,10 @@ def _get_env_remark_map(db: Session, env_ids: List[int]) -> Dict[int, str]:
     return {int(env_id): (remark or "") for env_id, remark in rows}
 
 
+# /earnings 列表按 EarningRecordResponse 字段顺序直接选列（行数多，跳过逐行模型校验）
+_EARNING_RESPONSE_COLUMNS = tuple(getattr(EarningRecord, name) for name in EarningRecordResponse.model_fields)
+
+
 @router.get("/earnings", response_model=List[EarningRecordResponse])
 async def get_earnings(
     start_date: Optional[date] = Query(None),
@@ -108,7 +113,8 @@ async def get_earnings(
     current_user: User = Depends(get_current_user),
 ):
     """获取收益记录（按 env_id + stat_date）"""
-    query = db.query(EarningRecord)
+    # 只取响应字段的列元组，不实例化 ORM 对象/响应模型，直接由 orjson 序列化
+    query = db.query(*_EARNING_RESPONSE_COLUMNS)
 
     if current_user.role != UserRole.ADMIN:
         owned_env_ids = _get_owned_env_ids(db, current_user.id)
@@ -123,7 +129,8 @@ async def get_earnings(
     if env_id:
         query = query.filter(EarningRecord.env_id == env_id)
 
-    return query.order_by(EarningRecord.stat_date.desc()).all()
+    rows = query.order_by(EarningRecord.stat_date.desc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
 
 @router.get("/stats/earnings")
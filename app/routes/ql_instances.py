@@ -5,7 +5,8 @@ from app.database import get_db
 from app.models import QLInstance, User, UserRole
 from app.schemas import QLInstanceCreate, QLInstanceUpdate, QLInstanceResponse
 from app.auth import get_current_user
-from app.services.qinglong import QingLongClient
+from app.services.qinglong import QingLongClient, evict_cached_client
+from app.routes.script_configs import forget_instance_check
 
 router = APIRouter(prefix="/api", tags=["青龙实例"])
 
@@ -20,8 +21,12 @@ def require_admin(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+# 管理员接口：权限校验挂在路由级
+admin_router = APIRouter(prefix="/api", tags=["青龙实例"], dependencies=[Depends(require_admin)])
+
+
 @router.get("/ql-instances", response_model=List[QLInstanceResponse])
-async def get_ql_instances(
+def get_ql_instances(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -31,7 +36,7 @@ async def get_ql_instances(
 
 
 @router.get("/ql-instances/{instance_id}", response_model=QLInstanceResponse)
-async def get_ql_instance(
+def get_ql_instance(
     instance_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -43,11 +48,10 @@ async def get_ql_instance(
     return instance
 
 
-@router.post("/ql-instances", response_model=QLInstanceResponse, status_code=status.HTTP_201_CREATED)
-async def create_ql_instance(
+@admin_router.post("/ql-instances", response_model=QLInstanceResponse, status_code=status.HTTP_201_CREATED)
+def create_ql_instance(
     data: QLInstanceCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    db: Session = Depends(get_db)
 ):
     """创建青龙实例（管理员）"""
     instance = QLInstance(
@@ -64,12 +68,11 @@ async def create_ql_instance(
     return instance
 
 
-@router.put("/ql-instances/{instance_id}", response_model=QLInstanceResponse)
-async def update_ql_instance(
+@admin_router.put("/ql-instances/{instance_id}", response_model=QLInstanceResponse)
+def update_ql_instance(
     instance_id: int,
     data: QLInstanceUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    db: Session = Depends(get_db)
 ):
     """更新青龙实例（管理员）"""
     instance = db.query(QLInstance).filter(QLInstance.id == instance_id).first()
@@ -82,14 +85,15 @@ async def update_ql_instance(
     
     db.commit()
     db.refresh(instance)
+    evict_cached_client(instance.id)
+    forget_instance_check(instance.id)
     return instance
 
 
-@router.delete("/ql-instances/{instance_id}")
-async def delete_ql_instance(
+@admin_router.delete("/ql-instances/{instance_id}")
+def delete_ql_instance(
     instance_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    db: Session = Depends(get_db)
 ):
     """删除青龙实例（管理员）"""
     instance = db.query(QLInstance).filter(QLInstance.id == instance_id).first()
@@ -98,13 +102,14 @@ async def delete_ql_instance(
     
     db.delete(instance)
     db.commit()
+    evict_cached_client(instance_id)
+    forget_instance_check(instance_id)
     return {"message": "删除成功"}
 
 
-@router.post("/ql-instances/test")
-async def test_ql_connection(
-    data: dict,
-    current_user: User = Depends(require_admin)
+@admin_router.post("/ql-instances/test")
+def test_ql_connection(
+    data: dict
 ):
     # 期望 data 里带 base_url/client_id/client_secret
     for k in ("base_url", "client_id", "client_secret"):
@@ -120,29 +125,34 @@ async def test_ql_connection(
         status=1,
     )
 
+    client = QingLongClient(temp)
     try:
-        client = QingLongClient(temp)
         detail = client.ping()
         return {"message": "连接成功", "detail": detail}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"连接失败: {e}")
+    finally:
+        # 临时客户端不进缓存，用完即关闭连接池
+        client.close()
 
 
 
-@router.post("/ql-instances/{instance_id}/test")
-async def test_ql_instance_connection(
+@admin_router.post("/ql-instances/{instance_id}/test")
+def test_ql_instance_connection(
     instance_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    db: Session = Depends(get_db)
 ):
     instance = db.query(QLInstance).filter(QLInstance.id == instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
 
+    # 用独立客户端探测：缓存客户端的 token 未过期时 ping 不会发请求，无法反映实例当前是否可达
+    client = QingLongClient(instance)
     try:
-        client = QingLongClient(instance)
         detail = client.ping()
         return {"message": "连接成功", "detail": detail}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"连接失败: {e}")
+    finally:
+        client.close()
 
@@ -3,7 +3,7 @@
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -14,6 +14,7 @@ from app.models import (
     RechargeOrderStatus, TransferStatus, UserRole
 )
 from app.auth import get_current_user
+from app.schemas import ORMModel
 from app.services.alipay_service import (
     get_alipay_config, generate_order_no, check_pending_payments,
     distribute_amount, get_wallet_with_alipay, manually_confirm_payment
@@ -29,13 +30,14 @@ class RechargeOrderCreate(BaseModel):
     amount: Decimal = Field(..., gt=0, description="充值金额")
     remark_in: Optional[str] = Field(None, max_length=200, description="付款备注")
 
-    @validator('amount')
+    @field_validator('amount')
+    @classmethod
     def validate_amount(cls, v):
         """金额验证：保留两位小数"""
         return v.quantize(Decimal('0.01'))
 
 
-class RechargeOrderResponse(BaseModel):
+class RechargeOrderResponse(ORMModel):
     """充值订单响应"""
     id: int
     order_no: str
@@ -49,11 +51,8 @@ class RechargeOrderResponse(BaseModel):
     created_at: datetime
     qrcode_url: Optional[str] = None  # 支付宝收款码
 
-    class Config:
-        from_attributes = True
 
-
-class TransferRecordResponse(BaseModel):
+class TransferRecordResponse(ORMModel):
     """转账记录响应"""
     id: int
     recharge_order_id: int
@@ -67,9 +66,6 @@ class TransferRecordResponse(BaseModel):
     transferred_at: Optional[datetime] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class RechargeOrderDetail(BaseModel):
     """充值订单详情（包含转账记录）"""
@@ -77,7 +73,7 @@ class RechargeOrderDetail(BaseModel):
     transfers: List[TransferRecordResponse]
 
 
-class AlipayConfigResponse(BaseModel):
+class AlipayConfigResponse(ORMModel):
     """支付宝配置响应（仅返回必要信息）"""
     id: int
     name: str
@@ -87,9 +83,6 @@ class AlipayConfigResponse(BaseModel):
     agent_l2_rate: float
     user_rate: float
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== API 接口 ====================
 
@@ -1,14 +1,21 @@
-from typing import Any, Dict, List, Optional
+from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import TypeAdapter
+from sqlalchemy import or_, select, union_all
 from sqlalchemy.orm import Session, selectinload
 
 from app.auth import get_current_user
-from app.database import get_db
+from app.database import get_db, safe_options
 from app.models import User, UserReferral, UserRole
+from app.schemas import InvitedUserOut, ReferralOut
 
 router = APIRouter(prefix="/api", tags=["推广关系"])
 
+# 列表序列化适配器（模块加载时构建一次）
+_REFERRAL_LIST_ADAPTER = TypeAdapter(List[ReferralOut])
+_INVITED_LIST_ADAPTER = TypeAdapter(List[InvitedUserOut])
+
 
 @router.get("/referrals")
 async def get_referrals(
@@ -16,18 +23,7 @@ async def get_referrals(
     current_user: User = Depends(get_current_user)
 ):
     """获取推广关系列表"""
-
-    def _user_brief(user: Optional[User]) -> Optional[Dict[str, Any]]:
-        if not user:
-            return None
-        return {
-            "id": int(user.id),
-            "username": user.username,
-            "nickname": user.nickname,
-            "phone": user.phone,
-        }
-
-    query = db.query(UserReferral).options(
+    loaders = safe_options(
         selectinload(UserReferral.user),
         selectinload(UserReferral.inviter1),
         selectinload(UserReferral.inviter2),
@@ -35,27 +31,21 @@ async def get_referrals(
 
     if current_user.role == UserRole.ADMIN:
         # 管理员可以看所有
-        referrals = query.all()
+        referrals = db.query(UserReferral).options(*loaders).all()
     else:
-        # 普通用户只能看自己相关的
-        referrals = query.filter(
-            (UserReferral.user_id == current_user.id) |
-            (UserReferral.inviter_level1 == current_user.id) |
-            (UserReferral.inviter_level2 == current_user.id)
-        ).all()
-    
-    return [
-        {
-            "user_id": int(r.user_id),
-            "user": _user_brief(r.user),
-            "inviter_level1": int(r.inviter_level1) if r.inviter_level1 is not None else None,
-            "inviter1": _user_brief(r.inviter1),
-            "inviter_level2": int(r.inviter_level2) if r.inviter_level2 is not None else None,
-            "inviter2": _user_brief(r.inviter2),
-            "created_at": r.created_at
-        }
-        for r in referrals
-    ]
+        # 普通用户只能看自己相关的：三路等值查询 UNION ALL，各自走单列索引
+        me = current_user.id
+        branches = union_all(
+            select(UserReferral).where(UserReferral.user_id == me),
+            select(UserReferral).where(UserReferral.inviter_level1 == me),
+            select(UserReferral).where(UserReferral.inviter_level2 == me),
+        )
+        stmt = select(UserReferral).from_statement(branches).options(*loaders)
+        referrals = db.execute(stmt).scalars().unique().all()
+
+    return _REFERRAL_LIST_ADAPTER.dump_python(
+        _REFERRAL_LIST_ADAPTER.validate_python(referrals, from_attributes=True)
+    )
 
 
 @router.get("/referrals/my-invites")
@@ -64,53 +54,29 @@ async def get_my_invites(
     current_user: User = Depends(get_current_user)
 ):
     """获取我邀请的用户（含完整用户信息）"""
-    # 直接邀请（+1）
-    level1_referrals = db.query(UserReferral).filter(
-        UserReferral.inviter_level1 == current_user.id
-    ).all()
+    me = current_user.id
 
-    # 间接邀请（+2）
-    level2_referrals = db.query(UserReferral).filter(
-        UserReferral.inviter_level2 == current_user.id
+    # 一次 JOIN 取回直接（+1）与间接（+2）邀请的用户
+    rows = db.query(UserReferral, User).join(
+        User, User.id == UserReferral.user_id
+    ).filter(
+        or_(UserReferral.inviter_level1 == me, UserReferral.inviter_level2 == me)
     ).all()
 
-    # 获取用户ID列表
-    level1_user_ids = [r.user_id for r in level1_referrals]
-    level2_user_ids = [r.user_id for r in level2_referrals]
-
-    # 批量获取用户信息
-    all_user_ids = list(set(level1_user_ids + level2_user_ids))
-    user_map = {}
-    if all_user_ids:
-        users = db.query(User).filter(User.id.in_(all_user_ids)).all()
-        user_map = {u.id: u for u in users}
-
-    # 构建返回数据，包含完整用户信息
-    level1_users = []
-    for user_id in level1_user_ids:
-        user = user_map.get(user_id)
-        if user:
-            level1_users.append({
-                "id": user.id,
-                "username": user.username,
-                "nickname": user.nickname,
-                "role": user.role.value if hasattr(user.role, "value") else user.role,
-                "status": user.status,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
-
-    level2_users = []
-    for user_id in level2_user_ids:
-        user = user_map.get(user_id)
-        if user:
-            level2_users.append({
-                "id": user.id,
-                "username": user.username,
-                "nickname": user.nickname,
-                "role": user.role.value if hasattr(user.role, "value") else user.role,
-                "status": user.status,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
+    level1 = []
+    level2 = []
+    for r, user in rows:
+        if r.inviter_level1 == me:
+            level1.append(user)
+        if r.inviter_level2 == me:
+            level2.append(user)
+
+    level1_users = _INVITED_LIST_ADAPTER.dump_python(
+        _INVITED_LIST_ADAPTER.validate_python(level1, from_attributes=True), mode="json"
+    )
+    level2_users = _INVITED_LIST_ADAPTER.dump_python(
+        _INVITED_LIST_ADAPTER.validate_python(level2, from_attributes=True), mode="json"
+    )
 
     return {
         "level1_count": len(level1_users),
@@ -139,17 +105,17 @@ async def get_referral_chain(
     # 获取邀请人信息
     inviter1 = None
     inviter2 = None
-    
-    if referral.inviter_level1:
-        user1 = db.query(User).filter(User.id == referral.inviter_level1).first()
+
+    ids = [x for x in (referral.inviter_level1, referral.inviter_level2) if x]
+    if ids:
+        users = {u.id: u for u in db.query(User).filter(User.id.in_(ids)).all()}
+        user1 = users.get(referral.inviter_level1)
         if user1:
             inviter1 = {"id": user1.id, "username": user1.username, "nickname": user1.nickname}
-    
-    if referral.inviter_level2:
-        user2 = db.query(User).filter(User.id == referral.inviter_level2).first()
+        user2 = users.get(referral.inviter_level2)
         if user2:
             inviter2 = {"id": user2.id, "username": user2.username, "nickname": user2.nickname}
-    
+
     return {
         "user_id": user_id,
         "inviter_level1": inviter1,
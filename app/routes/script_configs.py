@@ -1,38 +1,85 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, load_only, selectinload
+import time
+from typing import Dict, List
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.models import UserScriptConfig, UserScriptEnv, QLInstance, User, UserRole, EarningRecord
+from app.database import get_db, safe_options
+from app.models import UserScriptConfig, UserScriptEnv, QLInstance, User, UserRole, EarningRecord, EnvStatus
 from app.schemas import (
     UserScriptConfigCreate, UserScriptConfigUpdate, UserScriptConfigResponse,
     UserScriptEnvCreate, UserScriptEnvUpdate, UserScriptEnvResponse, EnvDisableRequest
 )
 from app.auth import get_current_user
-from app.services.qinglong import QingLongClient
+from app.services.qinglong import QingLongClient, get_cached_client, peek_cached_client
 
 router = APIRouter(prefix="/api", tags=["脚本配置"])
 
+# 批量保存环境变量的单次上限
+MAX_BATCH_ENVS = 1000
+
+
+# 已确认启用的青龙实例在此时间内免查库；实例更新/删除时移除对应条目，
+# 过期或客户端已被移出缓存的条目在下次访问时清除，只有仍有效的实例会重新写入
+INSTANCE_CHECK_TTL = 60
+_instance_checked_at: Dict[int, float] = {}
+
+
+def forget_instance_check(ql_instance_id: int) -> None:
+    """青龙实例更新/删除后清除免查库标记"""
+    _instance_checked_at.pop(ql_instance_id, None)
+
 
 def get_ql_client(db: Session, ql_instance_id: int) -> QingLongClient:
     """获取青龙客户端"""
+    checked_at = _instance_checked_at.get(ql_instance_id)
+    if checked_at is not None:
+        if time.monotonic() - checked_at < INSTANCE_CHECK_TTL:
+            client = peek_cached_client(ql_instance_id)
+            if client is not None:
+                return client
+        forget_instance_check(ql_instance_id)
+
     instance = db.query(QLInstance).filter(QLInstance.id == ql_instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="青龙实例不存在")
     if instance.status != 1:
         raise HTTPException(status_code=400, detail="青龙实例已停用")
-    return QingLongClient(instance)
+    client = get_cached_client(instance)
+    _instance_checked_at[ql_instance_id] = time.monotonic()
+    return client
+
+
+def owned_config_for(action: str):
+    """依赖工厂：加载配置并校验归属（管理员可操作任意配置），403 文案按动作区分"""
+    def dependency(
+        config_id: int,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+    ) -> UserScriptConfig:
+        config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
+        if not config:
+            raise HTTPException(status_code=404, detail="配置不存在")
+
+        if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail=f"无权{action}此配置")
+        return config
+
+    return dependency
+
+
+owned_config = owned_config_for("操作")
 
 
 # ==================== 脚本配置 CRUD ====================
 
 @router.get("/script-configs", response_model=List[UserScriptConfigResponse])
-async def get_script_configs(
+def get_script_configs(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取脚本配置列表"""
-    query = db.query(UserScriptConfig)
+    query = db.query(UserScriptConfig).options(*safe_options())
     
     # 非管理员只能看自己的配置
     if current_user.role != UserRole.ADMIN:
@@ -42,24 +89,15 @@ async def get_script_configs(
 
 
 @router.get("/script-configs/{config_id}", response_model=UserScriptConfigResponse)
-async def get_script_config(
-    config_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def get_script_config(
+    config: UserScriptConfig = Depends(owned_config_for("访问"))
 ):
     """获取单个脚本配置"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权访问此配置")
-    
     return config
 
 
 @router.post("/script-configs", response_model=UserScriptConfigResponse, status_code=status.HTTP_201_CREATED)
-async def create_script_config(
+def create_script_config(
     data: UserScriptConfigCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -85,20 +123,12 @@ async def create_script_config(
 
 
 @router.put("/script-configs/{config_id}", response_model=UserScriptConfigResponse)
-async def update_script_config(
-    config_id: int,
+def update_script_config(
     data: UserScriptConfigUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config_for("修改")),
+    db: Session = Depends(get_db)
 ):
     """更新脚本配置"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权修改此配置")
-    
     update_data = data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(config, key, value)
@@ -109,19 +139,11 @@ async def update_script_config(
 
 
 @router.delete("/script-configs/{config_id}")
-async def delete_script_config(
-    config_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def delete_script_config(
+    config: UserScriptConfig = Depends(owned_config_for("删除")),
+    db: Session = Depends(get_db)
 ):
     """删除脚本配置"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权删除此配置")
-    
     db.delete(config)
     db.commit()
     return {"message": "删除成功"}
@@ -130,40 +152,24 @@ async def delete_script_config(
 # ==================== 环境变量管理 ====================
 
 @router.get("/script-configs/{config_id}/envs", response_model=List[UserScriptEnvResponse])
-async def get_config_envs(
-    config_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def get_config_envs(
+    config: UserScriptConfig = Depends(owned_config_for("访问")),
+    db: Session = Depends(get_db)
 ):
     """获取配置的环境变量"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权访问此配置")
-    
-    envs = db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config_id).all()
+    envs = db.query(UserScriptEnv).options(*safe_options()).filter(UserScriptEnv.config_id == config.id).all()
     return envs
 
 
 @router.post("/script-configs/{config_id}/envs", response_model=UserScriptEnvResponse, status_code=status.HTTP_201_CREATED)
-async def create_config_env(
-    config_id: int,
+def create_config_env(
     data: UserScriptEnvCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """创建环境变量"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-    
     env = UserScriptEnv(
-        config_id=config_id,
+        config_id=config.id,
         user_id=config.user_id,
         env_name=data.env_name,
         env_value=data.env_value,
@@ -178,45 +184,44 @@ async def create_config_env(
 
 
 @router.post("/script-configs/{config_id}/envs/batch")
-async def batch_save_envs(
-    config_id: int,
+def batch_save_envs(
     envs_data: List[dict],
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """批量保存环境变量"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-    
+    if len(envs_data) > MAX_BATCH_ENVS:
+        raise HTTPException(status_code=413, detail=f"单次最多保存 {MAX_BATCH_ENVS} 个环境变量")
+
     existing_env_ids = [
         int(env_id)
-        for (env_id,) in db.query(UserScriptEnv.id).filter(UserScriptEnv.config_id == config_id).all()
+        for (env_id,) in db.query(UserScriptEnv.id).filter(UserScriptEnv.config_id == config.id).all()
     ]
     if existing_env_ids:
         used_in_earnings = db.query(EarningRecord).filter(EarningRecord.env_id.in_(existing_env_ids)).first()
         if used_in_earnings:
             raise HTTPException(status_code=400, detail="该配置下存在收益记录，不能批量覆盖；请改为逐个禁用/新增")
 
-    # 删除旧的环境变量
-    db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config_id).delete()
-    
-    # 创建新的环境变量
-    for env_data in envs_data:
-        env = UserScriptEnv(
-            config_id=config_id,
-            user_id=config.user_id,
-            env_name=env_data.get('env_name'),
-            env_value=env_data.get('env_value'),
-            ql_env_id=env_data.get('ql_env_id'),
-            status=env_data.get('status', 'valid'),
-            remark=env_data.get('remark')
-        )
-        db.add(env)
-    
+    # 先整理好新数据，再动旧数据
+    rows = [
+        {
+            "config_id": config.id,
+            "user_id": config.user_id,
+            "env_name": env_data.get('env_name'),
+            "env_value": env_data.get('env_value'),
+            "ql_env_id": env_data.get('ql_env_id'),
+            "status": env_data.get('status', EnvStatus.VALID.value),
+            "remark": env_data.get('remark'),
+        }
+        for env_data in envs_data
+    ]
+
+    # 删除旧变量 + 一次 executemany 写入新变量，放在保存点内，失败整体回滚
+    with db.begin_nested():
+        db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config.id).delete()
+        if rows:
+            db.execute(insert(UserScriptEnv), rows)
+
     db.commit()
     return {"message": "保存成功"}
 
@@ -224,19 +229,11 @@ async def batch_save_envs(
 # ==================== 青龙同步功能 ====================
 
 @router.post("/script-configs/{config_id}/sync")
-async def sync_to_ql(
-    config_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def sync_to_ql(
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """同步配置到青龙（创建/更新环境变量）"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-    
     # 获取青龙客户端
     try:
         client = get_ql_client(db, config.ql_instance_id)
@@ -246,35 +243,43 @@ async def sync_to_ql(
         raise HTTPException(status_code=500, detail=f"连接青龙失败: {e}")
     
     # 获取配置下的所有环境变量
-    envs = db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config_id).all()
+    envs = db.query(UserScriptEnv).filter(UserScriptEnv.config_id == config.id).all()
     if not envs:
         raise HTTPException(status_code=400, detail="没有环境变量需要同步")
     
+    # 客户端只做 HTTP（一次全量拉取 + 分类批量请求），ORM 对象的读写留在当前线程
+    payloads = [
+        dict(
+            name=env.env_name,
+            value=env.env_value,
+            remarks=env.remark or f"配置ID:{config.id}",
+            enabled=env.status == EnvStatus.VALID
+        )
+        for env in envs
+    ]
+
+    try:
+        outcomes = client.bulk_sync(payloads)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"读取青龙环境变量失败: {e}")
+
     results = []
     errors = []
     
-    for env in envs:
-        try:
-            # 同步到青龙
-            enabled = env.status == 'valid'
-            result = client.sync_env(
-                name=env.env_name,
-                value=env.env_value,
-                remarks=env.remark or f"配置ID:{config_id}",
-                enabled=enabled
-            )
-            
-            # 更新本地的 ql_env_id
-            ql_env_id = result.get("id") or result.get("_id")
-            if ql_env_id:
-                env.ql_env_id = str(ql_env_id)
-            
-            results.append({"env_name": env.env_name, "status": "success", "ql_env_id": ql_env_id})
-        except Exception as e:
-            errors.append({"env_name": env.env_name, "status": "error", "message": str(e)})
+    for env, (result, error) in zip(envs, outcomes):
+        if error is not None:
+            errors.append({"env_name": env.env_name, "status": "error", "message": str(error)})
+            continue
+
+        # 更新本地的 ql_env_id
+        ql_env_id = result.get("id") or result.get("_id")
+        if ql_env_id:
+            env.ql_env_id = str(ql_env_id)
+        
+        results.append({"env_name": env.env_name, "status": "success", "ql_env_id": ql_env_id})
     
     # 更新同步时间
-    config.last_sync_at = datetime.now()
+    config.last_sync_at = func.now()
     db.commit()
     
     return {
@@ -285,34 +290,26 @@ async def sync_to_ql(
 
 
 @router.post("/script-configs/{config_id}/envs/{env_id}/sync")
-async def sync_single_env_to_ql(
-    config_id: int,
+def sync_single_env_to_ql(
     env_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """同步单个环境变量到青龙"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-    
     env = db.query(UserScriptEnv).filter(
         UserScriptEnv.id == env_id,
-        UserScriptEnv.config_id == config_id
+        UserScriptEnv.config_id == config.id
     ).first()
     if not env:
         raise HTTPException(status_code=404, detail="环境变量不存在")
     
     try:
         client = get_ql_client(db, config.ql_instance_id)
-        enabled = env.status == 'valid'
+        enabled = env.status == EnvStatus.VALID
         result = client.sync_env(
             name=env.env_name,
             value=env.env_value,
-            remarks=env.remark or f"配置ID:{config_id}",
+            remarks=env.remark or f"配置ID:{config.id}",
             enabled=enabled
         )
         
@@ -328,23 +325,15 @@ async def sync_single_env_to_ql(
 
 
 @router.post("/script-configs/{config_id}/envs/{env_id}/enable")
-async def enable_env_in_ql(
-    config_id: int,
+def enable_env_in_ql(
     env_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """启用青龙环境变量"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-
     env = db.query(UserScriptEnv).filter(
         UserScriptEnv.id == env_id,
-        UserScriptEnv.config_id == config_id
+        UserScriptEnv.config_id == config.id
     ).first()
     if not env:
         raise HTTPException(status_code=404, detail="环境变量不存在")
@@ -357,7 +346,7 @@ async def enable_env_in_ql(
         client.enable_env(env.ql_env_id)
 
         # 更新本地状态，清除禁用恢复字段
-        env.status = 'valid'
+        env.status = EnvStatus.VALID
         env.disabled_until = None
         env.disable_days = None
         env.disabled_at = None
@@ -369,24 +358,16 @@ async def enable_env_in_ql(
 
 
 @router.post("/script-configs/{config_id}/envs/{env_id}/disable")
-async def disable_env_in_ql(
-    config_id: int,
+def disable_env_in_ql(
     env_id: int,
     request_data: EnvDisableRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """禁用青龙环境变量，支持指定天数后自动恢复"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-
     env = db.query(UserScriptEnv).filter(
         UserScriptEnv.id == env_id,
-        UserScriptEnv.config_id == config_id
+        UserScriptEnv.config_id == config.id
     ).first()
     if not env:
         raise HTTPException(status_code=404, detail="环境变量不存在")
@@ -402,7 +383,7 @@ async def disable_env_in_ql(
         now = datetime.now()
         disabled_until = now + timedelta(days=request_data.days)
 
-        env.status = 'invalid'
+        env.status = EnvStatus.INVALID
         env.disable_days = request_data.days
         env.disabled_at = now
         env.disabled_until = disabled_until
@@ -418,23 +399,15 @@ async def disable_env_in_ql(
 
 
 @router.delete("/script-configs/{config_id}/envs/{env_id}/ql")
-async def delete_env_from_ql(
-    config_id: int,
+def delete_env_from_ql(
     env_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """从青龙删除环境变量（仅删除青龙上的，保留本地记录）"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-    
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-    
     env = db.query(UserScriptEnv).filter(
         UserScriptEnv.id == env_id,
-        UserScriptEnv.config_id == config_id
+        UserScriptEnv.config_id == config.id
     ).first()
     if not env:
         raise HTTPException(status_code=404, detail="环境变量不存在")
@@ -458,20 +431,12 @@ async def delete_env_from_ql(
 # ==================== 从青龙拉取环境变量 ====================
 
 @router.get("/script-configs/{config_id}/ql-envs")
-async def list_ql_envs(
-    config_id: int,
+def list_ql_envs(
     search: str = "",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    config: UserScriptConfig = Depends(owned_config),
+    db: Session = Depends(get_db)
 ):
     """查询青龙上的环境变量列表"""
-    config = db.query(UserScriptConfig).filter(UserScriptConfig.id == config_id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="配置不存在")
-
-    if current_user.role != UserRole.ADMIN and config.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="无权操作此配置")
-
     try:
         client = get_ql_client(db, config.ql_instance_id)
         envs = client.list_envs(search_value=search)
@@ -483,7 +448,7 @@ async def list_ql_envs(
 # ==================== 自动恢复禁用的环境变量 ====================
 
 @router.post("/script-configs/auto-restore-disabled")
-async def auto_restore_disabled_envs(
+def auto_restore_disabled_envs(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -497,8 +462,10 @@ async def auto_restore_disabled_envs(
     now = datetime.now()
 
     # 查找所有已过期且仍处于禁用状态的环境变量
-    expired_envs = db.query(UserScriptEnv).filter(
-        UserScriptEnv.status == 'invalid',
+    expired_envs = db.query(UserScriptEnv).options(
+        selectinload(UserScriptEnv.config)
+    ).filter(
+        UserScriptEnv.status == EnvStatus.INVALID,
         UserScriptEnv.disabled_until.isnot(None),
         UserScriptEnv.disabled_until <= now
     ).all()
@@ -521,7 +488,7 @@ async def auto_restore_disabled_envs(
                 client.enable_env(env.ql_env_id)
 
             # 更新本地状态
-            env.status = 'valid'
+            env.status = EnvStatus.VALID
             env.disabled_until = None
             env.disable_days = None
             env.disabled_at = None
@@ -552,7 +519,7 @@ async def auto_restore_disabled_envs(
 
 
 @router.get("/script-configs/disabled-pending")
-async def get_disabled_pending_envs(
+def get_disabled_pending_envs(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -563,8 +530,19 @@ async def get_disabled_pending_envs(
     now = datetime.now()
 
     # 查找所有禁用中且未过期的环境变量
-    pending_envs = db.query(UserScriptEnv).filter(
-        UserScriptEnv.status == 'invalid',
+    # 只取列表展示需要的列，跳过 env_value 等大字段
+    pending_envs = db.query(UserScriptEnv).options(
+        load_only(
+            UserScriptEnv.id,
+            UserScriptEnv.env_name,
+            UserScriptEnv.config_id,
+            UserScriptEnv.disabled_at,
+            UserScriptEnv.disabled_until,
+            UserScriptEnv.disable_days,
+        ),
+        selectinload(UserScriptEnv.config).load_only(UserScriptConfig.id, UserScriptConfig.user_id)
+    ).filter(
+        UserScriptEnv.status == EnvStatus.INVALID,
         UserScriptEnv.disabled_until.isnot(None),
         UserScriptEnv.disabled_until > now
     ).all()
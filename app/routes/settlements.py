@@ -4,14 +4,22 @@ from datetime import date, datetime
 from pathlib import Path
 import secrets
 import shutil
-from typing import List, Optional
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import uuid
+
+from apscheduler.jobstores.base import ConflictingIdError
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Response, UploadFile, status
-from sqlalchemy import text
+from pydantic import TypeAdapter
+from sqlalchemy import and_, func, literal, select, text, union_all, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 
-from app.auth import get_current_user
-from app.database import get_db
+from app.auth import get_current_admin_claims, get_current_user
+from app.database import SessionLocal, get_db, safe_options
+from app.logging_config import get_logger
 from app.models import (
     SettlementBanReport,
     SettlementCommission,
@@ -33,11 +41,16 @@ from app.schemas import (
     SettlementPaymentResponse,
     SettlementPeriodCreate,
     SettlementPeriodResponse,
-    SettlementUserIncomeResponse,
-    SettlementUserPayableResponse,
 )
-from app.services.alipay_service import get_alipay_config
-from app.services.settlement_unlock import unlock_commissions_for_beneficiary, unlock_commissions_for_period
+from app.services.alipay_service import get_alipay_qrcode_url
+from app.services.settlement_unlock import (
+    unlock_commissions_for_beneficiary,
+    unlock_commissions_for_period,
+    unlock_commissions_for_source,
+)
+from app.services.scheduler import scheduler
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api", tags=["结算"])
 
@@ -46,23 +59,195 @@ DATA_DIR = BASE_DIR / "data"
 BAN_REPORT_DIR = DATA_DIR / "uploads" / "ban_reports"
 
 _ALLOWED_BAN_REPORT_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+_UPLOAD_COPY_CHUNK = 1 << 20  # 1MB
+# png / jpeg / gif 文件头（webp 为 RIFF....WEBP，单独判断）
+_IMAGE_MAGIC_PREFIXES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a")
+
+# 列表序列化适配器（模块加载时构建一次）
+_BAN_REPORT_LIST_ADAPTER = TypeAdapter(List[SettlementBanReportResponse])
+
+# 结算生成后台任务状态（进程内，仅保留最近 N 条）
+# 注意：状态只存在提交任务的 worker 进程里，多 worker 部署时状态轮询可能落到其他进程而返回 404；
+# 生成接口需在单 worker 下运行（或由前端把 404 当作失败处理）
+_GENERATION_TASKS: Dict[str, Dict[str, Any]] = {}
+_GENERATION_TASKS_LOCK = threading.Lock()
+_GENERATION_TASKS_MAX = 200
+
+# settlement_user_income -> settlement_commissions：L1/L2 两级合成一条 INSERT ... SELECT
+_COMMISSIONS_FROM_INCOME_SQL = """
+(period_id, source_user_id, beneficiary_user_id, level, amount_coins)
+SELECT period_id, user_id, l1_user_id, 1, l1_commission_coins
+FROM settlement_user_income
+WHERE period_id = :period_id
+  AND l1_user_id IS NOT NULL
+  AND l1_commission_coins > 0
+UNION ALL
+SELECT period_id, user_id, l2_user_id, 2, l2_commission_coins
+FROM settlement_user_income
+WHERE period_id = :period_id
+  AND l2_user_id IS NOT NULL
+  AND l2_commission_coins > 0
+"""
+
+
+# 结算相关 SQL 在模块加载时构建一次，各请求直接复用
+# 一次往返探测四张表是否已有本期数据
+_SQL_GENERATED_PRECHECK = text(
+    """
+    SELECT
+      EXISTS(SELECT 1 FROM settlement_referral_snapshot WHERE period_id = :period_id) AS has_snapshot,
+      EXISTS(SELECT 1 FROM settlement_user_income WHERE period_id = :period_id) AS has_income,
+      EXISTS(SELECT 1 FROM settlement_user_payable WHERE period_id = :period_id) AS has_payable,
+      EXISTS(SELECT 1 FROM settlement_commissions WHERE period_id = :period_id) AS has_commissions
+    """
+)
+
+# 关系快照：冻结本期 +1/+2 关系
+_SQL_INSERT_SNAPSHOT = text(
+    """
+    INSERT INTO settlement_referral_snapshot(period_id, user_id, inviter_level1, inviter_level2)
+    SELECT :period_id, r.user_id, r.inviter_level1, r.inviter_level2
+    FROM user_referrals r
+    """
+)
+
+# earning_records -> settlement_user_income（按期聚合并按 bps 拆分）
+_SQL_INSERT_INCOME = text(
+    """
+    INSERT INTO settlement_user_income
+    (period_id, user_id, gross_coins, self_keep_coins, self_payable_coins,
+     l1_user_id, l2_user_id, l1_commission_coins, l2_commission_coins, platform_retain_coins)
+    SELECT
+      p.period_id,
+      er.user_id,
+      SUM(er.coins_total) AS gross_coins,
+      (SUM(er.coins_total) * p.host_bps)    DIV 10000 AS self_keep_coins,
+      (SUM(er.coins_total) * p.collect_bps) DIV 10000 AS self_payable_coins,
+      s.inviter_level1 AS l1_user_id,
+      s.inviter_level2 AS l2_user_id,
+      CASE WHEN s.inviter_level1 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l1_bps) DIV 10000 END AS l1_commission_coins,
+      CASE WHEN s.inviter_level2 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l2_bps) DIV 10000 END AS l2_commission_coins,
+      (
+        (SUM(er.coins_total) * p.collect_bps) DIV 10000
+        - CASE WHEN s.inviter_level1 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l1_bps) DIV 10000 END
+        - CASE WHEN s.inviter_level2 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l2_bps) DIV 10000 END
+      ) AS platform_retain_coins
+    FROM settlement_periods p
+    JOIN earning_records er
+      ON er.stat_date BETWEEN p.period_start AND p.period_end
+    LEFT JOIN settlement_referral_snapshot s
+      ON s.period_id = p.period_id AND s.user_id = er.user_id
+    WHERE p.period_id = :period_id
+      AND er.user_id IS NOT NULL
+    GROUP BY p.period_id, er.user_id, s.inviter_level1, s.inviter_level2
+    """
+)
+
+_SQL_INSERT_COMMISSIONS = text(f"INSERT INTO settlement_commissions{_COMMISSIONS_FROM_INCOME_SQL}")
+_SQL_INSERT_IGNORE_COMMISSIONS = text(f"INSERT IGNORE INTO settlement_commissions{_COMMISSIONS_FROM_INCOME_SQL}")
+
+# settlement_user_income -> settlement_user_payable
+_SQL_INSERT_PAYABLE = text(
+    """
+    INSERT INTO settlement_user_payable(period_id, user_id, amount_due_coins, amount_paid_coins, status)
+    SELECT period_id, user_id, self_payable_coins, 0, 0
+    FROM settlement_user_income
+    WHERE period_id = :period_id
+    """
+)
+
+_SQL_SET_PAYING = text("UPDATE settlement_periods SET status = 1 WHERE period_id = :period_id")
+
+# 来源用户缴清：本期未资金化的 commission 置 FUNDED
+_SQL_MARK_FUNDED = text(
+    """
+    UPDATE settlement_commissions
+    SET funding_status = 1,
+        funded_at = :now
+    WHERE period_id = :period_id
+      AND source_user_id = :source_user_id
+      AND funding_status = 0
+    """
+)
+
+# 按 beneficiary 聚合写入 locked 入账账本（只处理 funded_at = :now 的行）
+_SQL_INSERT_LOCKED_LEDGER = text(
+    """
+    INSERT INTO wallet_ledger
+      (user_id, period_id, entry_type, delta_locked_coins, ref_source_user_id, remark)
+    SELECT
+      beneficiary_user_id,
+      :period_id,
+      'COMMISSION_LOCKED_IN',
+      SUM(amount_coins) AS sum_coins,
+      :source_user_id,
+      'downline paid'
+    FROM settlement_commissions
+    WHERE period_id = :period_id
+      AND source_user_id = :source_user_id
+      AND funding_status = 1
+      AND funded_at = :now
+    GROUP BY beneficiary_user_id
+    """
+)
+
+# 同步累加钱包 locked_coins（不存在则初始化）
+_SQL_UPSERT_LOCKED_WALLET = text(
+    """
+    INSERT INTO wallet_accounts(user_id, available_coins, locked_coins)
+    SELECT
+      beneficiary_user_id,
+      0,
+      SUM(amount_coins) AS sum_coins
+    FROM settlement_commissions
+    WHERE period_id = :period_id
+      AND source_user_id = :source_user_id
+      AND funding_status = 1
+      AND funded_at = :now
+    GROUP BY beneficiary_user_id
+    ON DUPLICATE KEY UPDATE
+      locked_coins = locked_coins + VALUES(locked_coins)
+    """
+)
+
+# 提交缴费：仅当处于缴费窗口且金额不超过剩余应缴时写入
+_SQL_INSERT_PAYMENT_IF_PAYABLE = text(
+    """
+    INSERT INTO settlement_payments
+      (period_id, payer_user_id, amount_coins, method, proof_url, status, submitted_at)
+    SELECT :period_id, :user_id, :amount, :method, :proof_url, 0, :now
+    FROM settlement_periods p
+    JOIN settlement_user_payable pb
+      ON pb.period_id = p.period_id AND pb.user_id = :user_id
+    WHERE p.period_id = :period_id
+      AND :today BETWEEN p.pay_start AND p.pay_end
+      AND pb.amount_due_coins - pb.amount_paid_coins >= :amount
+    """
+)
 
 
 def _save_ban_report_proof_file(upload: UploadFile, period_id: int, user_id: int) -> str:
-    """保存封号提报截图到 data/uploads/ban_reports/ 下，并返回表中存储的相对路径。"""
+    """保存封号提报截图到 data/uploads/ban_reports/ 下，并返回表中存储的相对路径。
+
+    阻塞式文件写入，只能在同步接口（线程池）中调用。
+    """
     BAN_REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
     suffix = Path(upload.filename or "").suffix.lower()
     if suffix not in _ALLOWED_BAN_REPORT_EXTS:
         raise HTTPException(status_code=400, detail="仅支持上传 png/jpg/jpeg/gif/webp 图片")
 
-    ts = datetime.now().strftime("%Y%m%d%H%M%S")
-    rnd = secrets.token_hex(4)
-    filename = f"ban_{period_id}_{user_id}_{ts}_{rnd}{suffix}"
+    filename = f"ban_{period_id}_{user_id}_{time.time_ns():x}_{secrets.token_hex(4)}{suffix}"
+
+    # 只在首块上校验文件头，其余部分分块流式写盘，内存占用与文件大小无关
+    head = upload.file.read(_UPLOAD_COPY_CHUNK)
+    if not head.startswith(_IMAGE_MAGIC_PREFIXES) and not (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        raise HTTPException(status_code=400, detail="文件内容不是有效的图片")
 
     abs_path = BAN_REPORT_DIR / filename
     with abs_path.open("wb") as f:
-        shutil.copyfileobj(upload.file, f)
+        f.write(head)
+        shutil.copyfileobj(upload.file, f, _UPLOAD_COPY_CHUNK)
 
     return (Path("data") / "uploads" / "ban_reports" / filename).as_posix()
 
@@ -75,35 +260,68 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
 
 
 def _validate_period_create(data: SettlementPeriodCreate) -> None:
+    """跨字段校验（单字段范围由 Field 约束保证），失败返回可读的 400"""
     if data.period_start > data.period_end:
         raise HTTPException(status_code=400, detail="period_start 不能晚于 period_end")
     if data.pay_start > data.pay_end:
         raise HTTPException(status_code=400, detail="pay_start 不能晚于 pay_end")
-
-    if data.coin_rate <= 0:
-        raise HTTPException(status_code=400, detail="coin_rate 必须大于 0")
-
-    if not (0 <= data.host_bps <= 10000 and 0 <= data.collect_bps <= 10000):
-        raise HTTPException(status_code=400, detail="host_bps/collect_bps 必须在 0~10000 之间")
     if data.host_bps + data.collect_bps != 10000:
         raise HTTPException(status_code=400, detail="host_bps + collect_bps 必须等于 10000")
-
-    if not (0 <= data.l1_bps <= 10000 and 0 <= data.l2_bps <= 10000):
-        raise HTTPException(status_code=400, detail="l1_bps/l2_bps 必须在 0~10000 之间")
     if data.l1_bps + data.l2_bps > data.collect_bps:
         raise HTTPException(status_code=400, detail="l1_bps + l2_bps 不能大于 collect_bps")
 
-    if data.status not in (0, 1, 2):
-        raise HTTPException(status_code=400, detail="status 仅支持 0/1/2")
-
 
 def _get_period_or_404(db: Session, period_id: int) -> SettlementPeriod:
-    period = db.query(SettlementPeriod).filter(SettlementPeriod.period_id == period_id).first()
+    # 按主键取：同一请求内重复调用直接命中 Session identity map，不再发 SQL
+    period = db.get(SettlementPeriod, int(period_id))
     if not period:
         raise HTTPException(status_code=404, detail="结算期不存在")
     return period
 
 
+class _PeriodConfig(NamedTuple):
+    """结算期计算参数快照（bps/缴费截止，创建后不再变更）"""
+    host_bps: int
+    collect_bps: int
+    l1_bps: int
+    l2_bps: int
+    pay_end: date
+
+
+# 结算期计算参数短时缓存：只缓存创建后不再变更的 bps/pay_end；
+# status 可变，必须在同一事务内从数据库读取，不得放入缓存
+PERIOD_CONFIG_CACHE_TTL = 5
+_period_config_cache: Dict[int, Tuple[float, _PeriodConfig]] = {}
+_period_config_cache_lock = threading.Lock()
+
+
+def _get_period_config(db: Session, period_id: int) -> _PeriodConfig:
+    """获取结算期计算参数（带 TTL 缓存），不存在时 404"""
+    now = time.monotonic()
+    with _period_config_cache_lock:
+        cached = _period_config_cache.get(period_id)
+    if cached and now < cached[0]:
+        return cached[1]
+
+    period = _get_period_or_404(db, period_id)
+    config = _PeriodConfig(
+        host_bps=period.host_bps,
+        collect_bps=period.collect_bps,
+        l1_bps=period.l1_bps,
+        l2_bps=period.l2_bps,
+        pay_end=period.pay_end,
+    )
+    with _period_config_cache_lock:
+        _period_config_cache[period_id] = (now + PERIOD_CONFIG_CACHE_TTL, config)
+    return config
+
+
+def _invalidate_period_config(period_id: int) -> None:
+    """结算期删除后清除缓存"""
+    with _period_config_cache_lock:
+        _period_config_cache.pop(period_id, None)
+
+
 def _get_current_period(db: Session, user_id: Optional[int] = None) -> Optional[SettlementPeriod]:
     """
     获取当前结算期
@@ -113,38 +331,32 @@ def _get_current_period(db: Session, user_id: Optional[int] = None) -> Optional[
     2. 如果没有生效期，且提供了 user_id，返回该用户有未缴清记录的结算期
     3. 如果都没有，返回最新的 OPEN/PENDING 结算期
     """
-    from app.models import SettlementUserPayable
-
-    # 1. 优先查找管理员设置的当前生效期（is_active=1）
-    active_period = (
-        db.query(SettlementPeriod)
-        .filter(SettlementPeriod.is_active == 1)
-        .first()
-    )
-    if active_period:
-        return active_period
-
-    # 2. 如果提供了 user_id，查找该用户有未缴清记录的结算期
+    # 三级优先级合并为一条 UNION ALL，按 prio、period_id DESC 取第一行，一次往返
+    # 1. 管理员设置的当前生效期（is_active=1）
+    branches = [
+        select(SettlementPeriod.period_id, literal(1).label("prio")).where(SettlementPeriod.is_active == 1)
+    ]
+    # 2. 该用户有未缴清记录（不是 PAID 状态）、且结算期为 PENDING/OPEN 的结算期
     if user_id is not None:
-        unpaid_period = (
-            db.query(SettlementPeriod)
+        branches.append(
+            select(SettlementPeriod.period_id, literal(2).label("prio"))
             .join(SettlementUserPayable, SettlementPeriod.period_id == SettlementUserPayable.period_id)
-            .filter(
+            .where(
                 SettlementUserPayable.user_id == user_id,
-                SettlementUserPayable.status != 2,  # 未缴清（不是 PAID 状态）
-                SettlementPeriod.status.in_([0, 1])  # 结算期状态为 PENDING 或 OPEN
+                SettlementUserPayable.status != 2,
+                SettlementPeriod.status.in_([0, 1]),
             )
-            .order_by(SettlementPeriod.period_id.desc())
-            .first()
         )
-        if unpaid_period:
-            return unpaid_period
+    # 3. 最新的 PENDING/OPEN 结算期
+    branches.append(
+        select(SettlementPeriod.period_id, literal(3).label("prio")).where(SettlementPeriod.status.in_([0, 1]))
+    )
+    ranked = union_all(*branches).subquery()
 
-    # 3. 返回最新的结算期
     return (
         db.query(SettlementPeriod)
-        .filter(SettlementPeriod.status.in_([0, 1]))
-        .order_by(SettlementPeriod.period_id.desc())
+        .join(ranked, ranked.c.period_id == SettlementPeriod.period_id)
+        .order_by(ranked.c.prio, SettlementPeriod.period_id.desc())
         .first()
     )
 
@@ -157,15 +369,53 @@ def _assert_in_pay_window(period: SettlementPeriod, today: date) -> None:
         )
 
 
+def _raise_payment_rejected(db: Session, period_id: int, user_id: int, amount: int, today: date) -> None:
+    """缴费 INSERT 未写入时，逐项诊断出具体的拒绝原因"""
+    period = _get_period_or_404(db, period_id)
+    _assert_in_pay_window(period, today)
+
+    payable = db.query(SettlementUserPayable).filter(
+        SettlementUserPayable.period_id == period_id,
+        SettlementUserPayable.user_id == user_id,
+    ).first()
+    if not payable:
+        raise HTTPException(status_code=404, detail="本期未生成应缴记录，无法提交缴费")
+
+    remaining = int(payable.amount_due_coins or 0) - int(payable.amount_paid_coins or 0)
+    if remaining <= 0:
+        raise HTTPException(status_code=400, detail="本期已缴清或无需缴费")
+    if amount > remaining:
+        raise HTTPException(status_code=400, detail=f"本次缴费金额不能超过剩余应缴（{remaining} coins）")
+
+    # 校验均通过说明期间数据被并发修改
+    raise HTTPException(status_code=409, detail="提交失败，请重试")
+
+
+def _fund_commissions_for_source(db: Session, period_id: int, source_user_id: int, now: datetime) -> int:
+    """来源用户缴清：本期 commission 资金化并按 beneficiary 入账到钱包 locked，返回资金化行数"""
+    params = {"now": now, "period_id": period_id, "source_user_id": source_user_id}
+
+    # 将该来源用户本期的 commission 置 FUNDED（仅更新未资金化的行）
+    funded = db.execute(_SQL_MARK_FUNDED, params).rowcount
+    if not funded:
+        # 没有上级分成（最常见于无邀请人的用户），账本与钱包无需再扫描
+        return 0
+
+    # 写入账本（按 beneficiary 聚合；只处理本次刚资金化的行，避免重复入账）
+    db.execute(_SQL_INSERT_LOCKED_LEDGER, params)
+    # 同步更新钱包账户 locked_coins（不存在则初始化）
+    db.execute(_SQL_UPSERT_LOCKED_WALLET, params)
+    return funded
+
+
 @router.get("/settlement/me", response_model=SettlementMeResponse)
-async def get_my_settlement_center(
+def get_my_settlement_center(
     period_id: Optional[int] = Query(None, description="为空则取当前结算期"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """结算中心（用户视角）"""
-    alipay_config = get_alipay_config(db)
-    alipay_qrcode_url = alipay_config.qrcode_url if alipay_config else None
+    alipay_qrcode_url = get_alipay_qrcode_url(db)
 
     if period_id is None:
         period = _get_current_period(db, user_id=current_user.id)
@@ -181,30 +431,47 @@ async def get_my_settlement_center(
     else:
         period = _get_period_or_404(db, int(period_id))
 
-    income = db.query(SettlementUserIncome).filter(
-        SettlementUserIncome.period_id == int(period_id),
-        SettlementUserIncome.user_id == current_user.id,
-    ).first()
-    payable = db.query(SettlementUserPayable).filter(
-        SettlementUserPayable.period_id == int(period_id),
-        SettlementUserPayable.user_id == current_user.id,
-    ).first()
+    # 收益汇总与应缴同期生成、一一对应：一次 LEFT JOIN 同时取回
+    row = (
+        db.query(SettlementUserIncome, SettlementUserPayable)
+        .outerjoin(
+            SettlementUserPayable,
+            and_(
+                SettlementUserPayable.period_id == SettlementUserIncome.period_id,
+                SettlementUserPayable.user_id == SettlementUserIncome.user_id,
+            ),
+        )
+        .filter(
+            SettlementUserIncome.period_id == int(period_id),
+            SettlementUserIncome.user_id == current_user.id,
+        )
+        .first()
+    )
+    if row:
+        income, payable = row
+    else:
+        income = None
+        payable = db.query(SettlementUserPayable).filter(
+            SettlementUserPayable.period_id == int(period_id),
+            SettlementUserPayable.user_id == current_user.id,
+        ).first()
     payments = db.query(SettlementPayment).filter(
         SettlementPayment.period_id == int(period_id),
         SettlementPayment.payer_user_id == current_user.id,
     ).order_by(SettlementPayment.payment_id.desc()).all()
 
+    # 子模型均为 from_attributes，ORM 对象直接交给 Pydantic 一次性校验
     return SettlementMeResponse(
-        period=SettlementPeriodResponse.model_validate(period) if period else None,
-        income=SettlementUserIncomeResponse.model_validate(income) if income else None,
-        payable=SettlementUserPayableResponse.model_validate(payable) if payable else None,
-        payments=[SettlementPaymentResponse.model_validate(p) for p in payments],
+        period=period,
+        income=income,
+        payable=payable,
+        payments=payments,
         alipay_qrcode_url=alipay_qrcode_url,
     )
 
 
 @router.get("/settlement-periods/current", response_model=Optional[SettlementPeriodResponse])
-async def get_current_settlement_period(
+def get_current_settlement_period(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -215,63 +482,21 @@ async def get_current_settlement_period(
         .order_by(SettlementPeriod.period_id.desc())
         .first()
     )
-    if not period:
-        return None
-
-    # 手动添加 period_label 字段
-    return SettlementPeriodResponse(
-        period_id=period.period_id,
-        period_label=period.period_label,
-        period_start=period.period_start,
-        period_end=period.period_end,
-        pay_start=period.pay_start,
-        pay_end=period.pay_end,
-        coin_rate=period.coin_rate,
-        host_bps=period.host_bps,
-        l1_bps=period.l1_bps,
-        l2_bps=period.l2_bps,
-        collect_bps=period.collect_bps,
-        status=period.status,
-        is_active=period.is_active,
-        created_at=period.created_at,
-        updated_at=period.updated_at,
-    )
+    return period
 
 
 @router.get("/settlement-periods", response_model=List[SettlementPeriodResponse])
-async def list_settlement_periods(
+def list_settlement_periods(
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    claims: dict = Depends(get_current_admin_claims),
 ):
     """结算期列表（管理员）"""
-    periods = db.query(SettlementPeriod).order_by(SettlementPeriod.period_id.desc()).all()
-
-    # 手动添加 period_label 字段（hybrid_property 在 Pydantic v1 中可能无法自动序列化）
-    result = []
-    for p in periods:
-        p_dict = {
-            "period_id": p.period_id,
-            "period_label": p.period_label,
-            "period_start": p.period_start,
-            "period_end": p.period_end,
-            "pay_start": p.pay_start,
-            "pay_end": p.pay_end,
-            "coin_rate": p.coin_rate,
-            "host_bps": p.host_bps,
-            "l1_bps": p.l1_bps,
-            "l2_bps": p.l2_bps,
-            "collect_bps": p.collect_bps,
-            "status": p.status,
-            "is_active": p.is_active,
-            "created_at": p.created_at,
-            "updated_at": p.updated_at,
-        }
-        result.append(SettlementPeriodResponse(**p_dict))
-    return result
+    # period_label 为 hybrid_property，按属性读取即可，直接交给 response_model 校验
+    return db.query(SettlementPeriod).order_by(SettlementPeriod.period_id.desc()).all()
 
 
 @router.post("/settlement-periods", response_model=SettlementPeriodResponse)
-async def create_settlement_period(
+def create_settlement_period(
     data: SettlementPeriodCreate,
     response: Response,
     db: Session = Depends(get_db),
@@ -286,50 +511,63 @@ async def create_settlement_period(
     ).first()
     if existing:
         response.status_code = status.HTTP_200_OK
-        return SettlementPeriodResponse(
-            period_id=existing.period_id,
-            period_label=existing.period_label,
-            period_start=existing.period_start,
-            period_end=existing.period_end,
-            pay_start=existing.pay_start,
-            pay_end=existing.pay_end,
-            coin_rate=existing.coin_rate,
-            host_bps=existing.host_bps,
-            l1_bps=existing.l1_bps,
-            l2_bps=existing.l2_bps,
-            collect_bps=existing.collect_bps,
-            status=existing.status,
-            is_active=existing.is_active,
-            created_at=existing.created_at,
-            updated_at=existing.updated_at,
-        )
+        return existing
 
-    period = SettlementPeriod(**data.model_dump())
+    # 时间戳在 Python 侧预先赋值，flush 拿到自增主键后提交前序列化，省去 commit 后的 refresh
+    now = datetime.now()
+    period = SettlementPeriod(**data.model_dump(), created_at=now, updated_at=now)
     db.add(period)
+    db.flush()
+    result = SettlementPeriodResponse.model_validate(period)
     db.commit()
-    db.refresh(period)
     response.status_code = status.HTTP_201_CREATED
-    return SettlementPeriodResponse(
-        period_id=period.period_id,
-        period_label=period.period_label,
-        period_start=period.period_start,
-        period_end=period.period_end,
-        pay_start=period.pay_start,
-        pay_end=period.pay_end,
-        coin_rate=period.coin_rate,
-        host_bps=period.host_bps,
-        l1_bps=period.l1_bps,
-        l2_bps=period.l2_bps,
-        collect_bps=period.collect_bps,
-        status=period.status,
-        is_active=period.is_active,
-        created_at=period.created_at,
-        updated_at=period.updated_at,
-    )
+    return result
+
+
+def _run_settlement_generation(db: Session, period_id: int) -> None:
+    """执行本期结算生成的全部写入语句（单事务）"""
+    params = {"period_id": period_id}
+    try:
+        # 关系快照：冻结本期 +1/+2 关系
+        db.execute(_SQL_INSERT_SNAPSHOT, params)
+        # earning_records -> settlement_user_income（按期聚合并按 bps 拆分）
+        db.execute(_SQL_INSERT_INCOME, params)
+        # settlement_user_income -> settlement_commissions（生成分成明细，默认 funding_status=0）
+        db.execute(_SQL_INSERT_COMMISSIONS, params)
+        # settlement_user_income -> settlement_user_payable（应缴=40%）
+        db.execute(_SQL_INSERT_PAYABLE, params)
+        # 生成后进入 PAYING
+        db.execute(_SQL_SET_PAYING, params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _set_generation_task(task_id: str, **fields) -> None:
+    with _GENERATION_TASKS_LOCK:
+        task = _GENERATION_TASKS.setdefault(task_id, {"task_id": task_id})
+        task.update(fields)
+        while len(_GENERATION_TASKS) > _GENERATION_TASKS_MAX:
+            _GENERATION_TASKS.pop(next(iter(_GENERATION_TASKS)))
+
+
+def _settlement_generation_job(task_id: str, period_id: int) -> None:
+    """后台调度器中执行结算生成，使用独立数据库会话"""
+    _set_generation_task(task_id, status="running", started_at=datetime.now())
+    db = SessionLocal()
+    try:
+        _run_settlement_generation(db, period_id)
+        _set_generation_task(task_id, status="success", finished_at=datetime.now())
+    except Exception as exc:
+        logger.error(f"结算生成失败: period_id={period_id}, error={exc}")
+        _set_generation_task(task_id, status="failed", error=str(exc), finished_at=datetime.now())
+    finally:
+        db.close()
 
 
-@router.post("/settlement-periods/{period_id}/generate")
-async def generate_settlement_for_period(
+@router.post("/settlement-periods/{period_id}/generate", status_code=status.HTTP_202_ACCEPTED)
+def generate_settlement_for_period(
     period_id: int,
     regenerate: bool = Query(False, description="是否重跑（会清空该 period_id 的快照/汇总/应缴数据）"),
     db: Session = Depends(get_db),
@@ -340,18 +578,15 @@ async def generate_settlement_for_period(
     - 生成关系快照 settlement_referral_snapshot（从 user_referrals 全量拷贝）
     - 聚合 earning_records 写入 settlement_user_income（只统计 period_start~period_end）
     - 基于 settlement_user_income 写入 settlement_user_payable（amount_due_coins = self_payable_coins）
+
+    前置校验在请求内完成，写入交给后台调度器执行；通过 generate/status/{task_id} 查询进度。
     """
     _get_period_or_404(db, period_id)
 
-    # 先提交可能存在的挂起事务
-    db.commit()
-
-    has_snapshot = db.query(SettlementReferralSnapshot).filter(SettlementReferralSnapshot.period_id == period_id).first()
-    has_income = db.query(SettlementUserIncome).filter(SettlementUserIncome.period_id == period_id).first()
-    has_payable = db.query(SettlementUserPayable).filter(SettlementUserPayable.period_id == period_id).first()
-    has_commissions = db.query(SettlementCommission).filter(SettlementCommission.period_id == period_id).first()
+    # 一次往返探测四张表是否已有本期数据
+    generated = db.execute(_SQL_GENERATED_PRECHECK, {"period_id": period_id}).one()
 
-    if not regenerate and (has_snapshot or has_income or has_payable or has_commissions):
+    if not regenerate and any(generated):
         raise HTTPException(status_code=400, detail="该结算期已生成过，如需重跑请传 regenerate=true")
 
     if regenerate:
@@ -359,114 +594,43 @@ async def generate_settlement_for_period(
         if any_payment:
             raise HTTPException(status_code=400, detail="该结算期已存在缴费记录，禁止重跑")
 
+    task_id = uuid.uuid4().hex
+    _set_generation_task(task_id, period_id=period_id, status="pending", created_at=datetime.now())
     try:
-        # 关系快照：冻结本期 +1/+2 关系
-        db.execute(
-            text(
-                """
-                INSERT INTO settlement_referral_snapshot(period_id, user_id, inviter_level1, inviter_level2)
-                SELECT :period_id, r.user_id, r.inviter_level1, r.inviter_level2
-                FROM user_referrals r
-                """
-            ),
-            {"period_id": period_id},
-        )
-
-        # earning_records -> settlement_user_income（按期聚合并按 bps 拆分）
-        db.execute(
-            text(
-                """
-                INSERT INTO settlement_user_income
-                (period_id, user_id, gross_coins, self_keep_coins, self_payable_coins,
-                 l1_user_id, l2_user_id, l1_commission_coins, l2_commission_coins, platform_retain_coins)
-                SELECT
-                  p.period_id,
-                  er.user_id,
-                  SUM(er.coins_total) AS gross_coins,
-                  (SUM(er.coins_total) * p.host_bps)    DIV 10000 AS self_keep_coins,
-                  (SUM(er.coins_total) * p.collect_bps) DIV 10000 AS self_payable_coins,
-                  s.inviter_level1 AS l1_user_id,
-                  s.inviter_level2 AS l2_user_id,
-                  CASE WHEN s.inviter_level1 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l1_bps) DIV 10000 END AS l1_commission_coins,
-                  CASE WHEN s.inviter_level2 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l2_bps) DIV 10000 END AS l2_commission_coins,
-                  (
-                    (SUM(er.coins_total) * p.collect_bps) DIV 10000
-                    - CASE WHEN s.inviter_level1 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l1_bps) DIV 10000 END
-                    - CASE WHEN s.inviter_level2 IS NULL THEN 0 ELSE (SUM(er.coins_total) * p.l2_bps) DIV 10000 END
-                  ) AS platform_retain_coins
-                FROM settlement_periods p
-                JOIN earning_records er
-                  ON er.stat_date BETWEEN p.period_start AND p.period_end
-                LEFT JOIN settlement_referral_snapshot s
-                  ON s.period_id = p.period_id AND s.user_id = er.user_id
-                WHERE p.period_id = :period_id
-                  AND er.user_id IS NOT NULL
-                GROUP BY p.period_id, er.user_id, s.inviter_level1, s.inviter_level2
-                """
-            ),
-            {"period_id": period_id},
-        )
-
-        # settlement_user_income -> settlement_commissions（生成分成明细，默认 funding_status=0）
-        db.execute(
-            text(
-                """
-                INSERT INTO settlement_commissions(period_id, source_user_id, beneficiary_user_id, level, amount_coins)
-                SELECT period_id, user_id, l1_user_id, 1, l1_commission_coins
-                FROM settlement_user_income
-                WHERE period_id = :period_id
-                  AND l1_user_id IS NOT NULL
-                  AND l1_commission_coins > 0
-                """
-            ),
-            {"period_id": period_id},
-        )
-        db.execute(
-            text(
-                """
-                INSERT INTO settlement_commissions(period_id, source_user_id, beneficiary_user_id, level, amount_coins)
-                SELECT period_id, user_id, l2_user_id, 2, l2_commission_coins
-                FROM settlement_user_income
-                WHERE period_id = :period_id
-                  AND l2_user_id IS NOT NULL
-                  AND l2_commission_coins > 0
-                """
-            ),
-            {"period_id": period_id},
+        # 同一结算期同时只允许一个生成任务（job 执行完后调度器会自动移除）
+        scheduler.add_job(
+            _settlement_generation_job,
+            id=f"settlement_generate_{period_id}",
+            name=f"生成结算期{period_id}",
+            args=[task_id, period_id],
+            # 一次性任务：调度器繁忙时不因超过宽限期被丢弃（否则任务状态永远停在 pending）
+            misfire_grace_time=None,
+            coalesce=True,
         )
+    except ConflictingIdError:
+        with _GENERATION_TASKS_LOCK:
+            _GENERATION_TASKS.pop(task_id, None)
+        raise HTTPException(status_code=409, detail="该结算期正在生成中，请稍后再试")
 
-        # settlement_user_income -> settlement_user_payable（应缴=40%）
-        db.execute(
-            text(
-                """
-                INSERT INTO settlement_user_payable(period_id, user_id, amount_due_coins, amount_paid_coins, status)
-                SELECT period_id, user_id, self_payable_coins, 0, 0
-                FROM settlement_user_income
-                WHERE period_id = :period_id
-                """
-            ),
-            {"period_id": period_id},
-        )
+    return {"message": "已提交生成任务", "period_id": period_id, "task_id": task_id}
 
-        # 生成后进入 PAYING
-        db.execute(
-            text("UPDATE settlement_periods SET status = 1 WHERE period_id = :period_id"),
-            {"period_id": period_id},
-        )
 
-        db.commit()
-
-        return {"message": "生成成功", "period_id": period_id}
-    except HTTPException:
-        db.rollback()
-        raise
-    except Exception as exc:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"生成失败: {exc}")
+@router.get("/settlement-periods/{period_id}/generate/status/{task_id}")
+def get_settlement_generation_status(
+    period_id: int,
+    task_id: str,
+    claims: dict = Depends(get_current_admin_claims),
+):
+    """查询结算生成任务状态：pending/running/success/failed"""
+    with _GENERATION_TASKS_LOCK:
+        task = dict(_GENERATION_TASKS.get(task_id) or {})
+    if not task or task.get("period_id") != period_id:
+        raise HTTPException(status_code=404, detail="生成任务不存在或已过期")
+    return task
 
 
 @router.post("/settlement-periods/{period_id}/generate-commissions")
-async def generate_commissions_for_period(
+def generate_commissions_for_period(
     period_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -477,29 +641,7 @@ async def generate_commissions_for_period(
 
     try:
         db.execute(
-            text(
-                """
-                INSERT IGNORE INTO settlement_commissions(period_id, source_user_id, beneficiary_user_id, level, amount_coins)
-                SELECT period_id, user_id, l1_user_id, 1, l1_commission_coins
-                FROM settlement_user_income
-                WHERE period_id = :period_id
-                  AND l1_user_id IS NOT NULL
-                  AND l1_commission_coins > 0
-                """
-            ),
-            {"period_id": int(period_id)},
-        )
-        db.execute(
-            text(
-                """
-                INSERT IGNORE INTO settlement_commissions(period_id, source_user_id, beneficiary_user_id, level, amount_coins)
-                SELECT period_id, user_id, l2_user_id, 2, l2_commission_coins
-                FROM settlement_user_income
-                WHERE period_id = :period_id
-                  AND l2_user_id IS NOT NULL
-                  AND l2_commission_coins > 0
-                """
-            ),
+            _SQL_INSERT_IGNORE_COMMISSIONS,
             {"period_id": int(period_id)},
         )
         db.commit()
@@ -510,7 +652,7 @@ async def generate_commissions_for_period(
 
 
 @router.post("/settlement-periods/{period_id}/unlock-commissions")
-async def unlock_commissions(
+def unlock_commissions(
     period_id: int,
     beneficiary_user_id: Optional[int] = Query(None, description="可选：仅解锁指定受益人 user_id"),
     db: Session = Depends(get_db),
@@ -550,7 +692,7 @@ async def unlock_commissions(
 
 
 @router.post("/settlement-payments", response_model=SettlementPaymentResponse, status_code=status.HTTP_201_CREATED)
-async def create_settlement_payment(
+def create_settlement_payment(
     data: SettlementPaymentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -562,41 +704,44 @@ async def create_settlement_payment(
         if not period:
             raise HTTPException(status_code=400, detail="当前无可用结算期")
         period_id = int(period.period_id)
-    else:
-        period = _get_period_or_404(db, int(period_id))
 
     today = date.today()
-    _assert_in_pay_window(period, today)
-
-    payable = db.query(SettlementUserPayable).filter(
-        SettlementUserPayable.period_id == int(period_id),
-        SettlementUserPayable.user_id == current_user.id,
-    ).first()
-    if not payable:
-        raise HTTPException(status_code=404, detail="本期未生成应缴记录，无法提交缴费")
-
-    remaining = int(payable.amount_due_coins or 0) - int(payable.amount_paid_coins or 0)
-    if remaining <= 0:
-        raise HTTPException(status_code=400, detail="本期已缴清或无需缴费")
-    if data.amount_coins > remaining:
-        raise HTTPException(status_code=400, detail=f"本次缴费金额不能超过剩余应缴（{remaining} coins）")
+    now = datetime.now().replace(microsecond=0)
+    amount = int(data.amount_coins)
+
+    # 缴费窗口与剩余应缴校验并入 INSERT ... SELECT，常规路径一次往返完成
+    res = db.execute(
+        _SQL_INSERT_PAYMENT_IF_PAYABLE,
+        {
+            "period_id": int(period_id),
+            "user_id": current_user.id,
+            "amount": amount,
+            "method": data.method,
+            "proof_url": data.proof_url,
+            "now": now,
+            "today": today,
+        },
+    )
+    if res.rowcount != 1:
+        db.rollback()
+        _raise_payment_rejected(db, int(period_id), current_user.id, amount, today)
 
-    payment = SettlementPayment(
+    result = SettlementPaymentResponse(
+        payment_id=int(res.lastrowid),
         period_id=int(period_id),
         payer_user_id=current_user.id,
-        amount_coins=int(data.amount_coins),
+        amount_coins=amount,
         method=data.method,
         proof_url=data.proof_url,
         status=0,
+        submitted_at=now,
     )
-    db.add(payment)
     db.commit()
-    db.refresh(payment)
-    return payment
+    return result
 
 
 @router.get("/settlement-payments/my", response_model=List[SettlementPaymentResponse])
-async def list_my_settlement_payments(
+def list_my_settlement_payments(
     period_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -609,11 +754,11 @@ async def list_my_settlement_payments(
 
 
 @router.get("/settlement-payments", response_model=List[SettlementPaymentResponse])
-async def list_settlement_payments(
+def list_settlement_payments(
     period_id: Optional[int] = Query(None),
     status_filter: Optional[int] = Query(None, alias="status"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    claims: dict = Depends(get_current_admin_claims),
 ):
     """缴费记录列表（管理员）"""
     query = db.query(SettlementPayment)
@@ -625,7 +770,7 @@ async def list_settlement_payments(
 
 
 @router.post("/settlement-payments/{payment_id}/confirm", response_model=SettlementPaymentResponse)
-async def confirm_settlement_payment(
+def confirm_settlement_payment(
     payment_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -635,168 +780,96 @@ async def confirm_settlement_payment(
     now = datetime.now().replace(microsecond=0)
 
     try:
-        payment = (
-            db.query(SettlementPayment)
-            .filter(SettlementPayment.payment_id == int(payment_id))
-            .with_for_update()
-            .first()
-        )
+        payment = db.query(SettlementPayment).filter(SettlementPayment.payment_id == payment_id).first()
         if not payment:
             raise HTTPException(status_code=404, detail="缴费记录不存在")
-        if int(payment.status) != 0:
+        if payment.status != 0:
             raise HTTPException(status_code=400, detail="该记录不是待审核状态")
 
+        # 乐观并发：仅当仍为待审核时才置为已确认（CAS），不再用 SELECT ... FOR UPDATE 串行化管理员操作
+        res = db.execute(
+            update(SettlementPayment)
+            .where(SettlementPayment.payment_id == payment_id, SettlementPayment.status == 0)
+            .values(status=1, confirmed_at=now, confirmed_by=current_user.id, reject_reason=None)
+        )
+        if res.rowcount != 1:
+            raise HTTPException(status_code=409, detail="该缴费记录已被处理，请刷新后重试")
+
         payable = (
             db.query(SettlementUserPayable)
             .filter(
-                SettlementUserPayable.period_id == int(payment.period_id),
-                SettlementUserPayable.user_id == int(payment.payer_user_id),
+                SettlementUserPayable.period_id == payment.period_id,
+                SettlementUserPayable.user_id == payment.payer_user_id,
             )
-            .with_for_update()
             .first()
         )
         if not payable:
             raise HTTPException(status_code=404, detail="未找到对应的应缴记录")
 
-        period = _get_period_or_404(db, int(payment.period_id))
-
-        prev_payable_status = int(payable.status or 0)
+        period = _get_period_or_404(db, payment.period_id)
 
-        payment.status = 1
-        payment.confirmed_at = now
-        payment.confirmed_by = current_user.id
-        payment.reject_reason = None
+        prev_payable_status = payable.status
 
-        due = int(payable.amount_due_coins or 0)
-        paid_before = int(payable.amount_paid_coins or 0)
-        paid_after = paid_before + int(payment.amount_coins or 0)
-        payable.amount_paid_coins = paid_after
+        due = payable.amount_due_coins
+        paid_before = payable.amount_paid_coins
+        paid_after = paid_before + payment.amount_coins
 
-        if payable.first_paid_at is None:
-            payable.first_paid_at = now
-
-        if due <= 0:
-            payable.status = 2
-            if payable.paid_at is None:
-                payable.paid_at = now
-        elif paid_after >= due:
-            payable.status = 2
-            if payable.paid_at is None:
-                payable.paid_at = now
+        if due <= 0 or paid_after >= due:
+            new_payable_status = 2
+        elif date.today() > period.pay_end:
+            new_payable_status = 3
         else:
-            if date.today() > period.pay_end:
-                payable.status = 3
-            else:
-                payable.status = 1 if paid_after > 0 else 0
-
-        # 阶段2：首次缴清 -> 资金化分成并入账到上级钱包（locked）
-        just_paid = prev_payable_status != 2 and int(payable.status or 0) == 2
-        if just_paid:
-            period_id = int(payment.period_id)
-            source_user_id = int(payment.payer_user_id)
-
-            # 将该来源用户本期的 commission 置 FUNDED（仅更新未资金化的行）
-            db.execute(
-                text(
-                    """
-                    UPDATE settlement_commissions
-                    SET funding_status = 1,
-                        funded_at = :now
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 0
-                    """
-                ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
+            new_payable_status = 1 if paid_after > 0 else 0
+
+        # 以读取时的 status/已缴金额作为版本条件；期间被并发修改则放弃本次确认
+        res = db.execute(
+            update(SettlementUserPayable)
+            .where(
+                SettlementUserPayable.period_id == payment.period_id,
+                SettlementUserPayable.user_id == payment.payer_user_id,
+                SettlementUserPayable.status == prev_payable_status,
+                SettlementUserPayable.amount_paid_coins == paid_before,
             )
-
-            # 写入账本（按 beneficiary 聚合；只处理本次刚资金化的行，避免重复入账）
-            db.execute(
-                text(
-                    """
-                    INSERT INTO wallet_ledger
-                      (user_id, period_id, entry_type, delta_locked_coins, ref_source_user_id, remark)
-                    SELECT
-                      beneficiary_user_id,
-                      :period_id,
-                      'COMMISSION_LOCKED_IN',
-                      SUM(amount_coins) AS sum_coins,
-                      :source_user_id,
-                      'downline paid'
-                    FROM settlement_commissions
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 1
-                      AND funded_at = :now
-                    GROUP BY beneficiary_user_id
-                    """
+            .values(
+                amount_paid_coins=paid_after,
+                status=new_payable_status,
+                first_paid_at=func.coalesce(SettlementUserPayable.first_paid_at, now),
+                paid_at=(
+                    func.coalesce(SettlementUserPayable.paid_at, now)
+                    if new_payable_status == 2
+                    else SettlementUserPayable.paid_at
                 ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
             )
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise HTTPException(status_code=409, detail="应缴记录已被并发修改，请重试")
 
-            # 同步更新钱包账户 locked_coins（不存在则初始化）
-            db.execute(
-                text(
-                    """
-                    INSERT INTO wallet_accounts(user_id, available_coins, locked_coins)
-                    SELECT
-                      beneficiary_user_id,
-                      0,
-                      SUM(amount_coins) AS sum_coins
-                    FROM settlement_commissions
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 1
-                      AND funded_at = :now
-                    GROUP BY beneficiary_user_id
-                    ON DUPLICATE KEY UPDATE
-                      locked_coins = locked_coins + VALUES(locked_coins)
-                    """
-                ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-            )
+        # 阶段2：首次缴清 -> 资金化分成并入账到上级钱包（locked）
+        just_paid = prev_payable_status != 2 and new_payable_status == 2
+        if just_paid:
+            period_id = payment.period_id
+            source_user_id = payment.payer_user_id
 
-            # 阶段3：尝试即时解锁（满足"上级已缴清"的受益人，以及本次缴清的 payer 自己）
-            beneficiary_rows = (
-                db.execute(
-                    text(
-                        """
-                        SELECT DISTINCT beneficiary_user_id
-                        FROM settlement_commissions
-                        WHERE period_id = :period_id
-                          AND source_user_id = :source_user_id
-                          AND funding_status = 1
-                          AND funded_at = :now
-                        """
-                    ),
-                    {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-                )
-                .mappings()
-                .all()
-            )
+            _fund_commissions_for_source(db, period_id, source_user_id, now)
 
+            # 阶段3：尝试即时解锁（满足"上级已缴清"的受益人，以及本次缴清的 payer 自己）
             try:
-                for r in beneficiary_rows:
-                    bid = int(r.get("beneficiary_user_id") or 0)
-                    if bid > 0:
-                        unlock_commissions_for_beneficiary(db, period_id, bid, now=now)
-
-                # payer 本人本期若存在已资金化但未解锁的分成，也在其"缴清"后立即解锁
-                unlock_commissions_for_beneficiary(db, period_id, source_user_id, now=now)
+                unlock_commissions_for_source(db, period_id, source_user_id, now=now)
             except ValueError as exc:
                 raise HTTPException(status_code=409, detail=str(exc))
 
+        result = SettlementPaymentResponse.model_validate(payment)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise exc
 
-    db.refresh(payment)
-    return payment
+    return result
 
 
 @router.post("/settlement-payments/{payment_id}/reject", response_model=SettlementPaymentResponse)
-async def reject_settlement_payment(
+def reject_settlement_payment(
     payment_id: int,
     data: SettlementPaymentReject,
     db: Session = Depends(get_db),
@@ -806,29 +879,27 @@ async def reject_settlement_payment(
     now = datetime.now()
 
     try:
-        payment = (
-            db.query(SettlementPayment)
-            .filter(SettlementPayment.payment_id == int(payment_id))
-            .with_for_update()
-            .first()
-        )
+        payment = db.query(SettlementPayment).filter(SettlementPayment.payment_id == int(payment_id)).first()
         if not payment:
             raise HTTPException(status_code=404, detail="缴费记录不存在")
         if int(payment.status) != 0:
             raise HTTPException(status_code=400, detail="该记录不是待审核状态")
 
-        payment.status = 2
-        payment.confirmed_at = now
-        payment.confirmed_by = current_user.id
-        payment.reject_reason = data.reject_reason
+        res = db.execute(
+            update(SettlementPayment)
+            .where(SettlementPayment.payment_id == int(payment_id), SettlementPayment.status == 0)
+            .values(status=2, confirmed_at=now, confirmed_by=current_user.id, reject_reason=data.reject_reason)
+        )
+        if res.rowcount != 1:
+            raise HTTPException(status_code=409, detail="该缴费记录已被处理，请刷新后重试")
 
+        result = SettlementPaymentResponse.model_validate(payment)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise exc
 
-    db.refresh(payment)
-    return payment
+    return result
 
 
 # ==================== 封号提报 API ====================
@@ -838,7 +909,7 @@ async def reject_settlement_payment(
     response_model=SettlementBanReportResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_settlement_ban_report(
+def create_settlement_ban_report(
     banned_coins: int = Form(..., ge=1, description="被封禁金币（coins，正数）"),
     proof_file: UploadFile = File(..., description="截图文件（png/jpg/jpeg/gif/webp）"),
     period_id: Optional[int] = Form(None, description="为空则使用当前结算期"),
@@ -877,6 +948,7 @@ async def create_settlement_ban_report(
 
     proof_path = _save_ban_report_proof_file(proof_file, int(period_id), int(current_user.id))
 
+    now = datetime.now()
     report = SettlementBanReport(
         period_id=int(period_id),
         user_id=int(current_user.id),
@@ -885,47 +957,67 @@ async def create_settlement_ban_report(
         proof_file_path=proof_path,
         status=0,
         is_applied=0,
+        submitted_at=now,
+        created_at=now,
+        updated_at=now,
     )
     db.add(report)
+    db.flush()
+    result = SettlementBanReportResponse.model_validate(report)
     db.commit()
-    db.refresh(report)
-    return report
+    return result
 
 
-@router.get("/settlement-ban-reports/my", response_model=List[SettlementBanReportResponse])
-async def list_my_settlement_ban_reports(
+@router.get("/settlement-ban-reports/my")
+def list_my_settlement_ban_reports(
     period_id: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="翻页游标：上一页最后一条 report_id"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """我的封号提报记录（用户）"""
-    query = db.query(SettlementBanReport).filter(SettlementBanReport.user_id == current_user.id)
+    """我的封号提报记录（用户，按 report_id 倒序游标分页）"""
+    query = db.query(SettlementBanReport).options(*safe_options()).filter(
+        SettlementBanReport.user_id == current_user.id
+    )
     if period_id is not None:
         query = query.filter(SettlementBanReport.period_id == int(period_id))
-    return query.order_by(SettlementBanReport.report_id.desc()).all()
+    if cursor is not None:
+        query = query.filter(SettlementBanReport.report_id < int(cursor))
+    reports = query.order_by(SettlementBanReport.report_id.desc()).limit(int(limit)).all()
+    return _BAN_REPORT_LIST_ADAPTER.dump_python(
+        _BAN_REPORT_LIST_ADAPTER.validate_python(reports, from_attributes=True)
+    )
 
 
-@router.get("/settlement-ban-reports", response_model=List[SettlementBanReportResponse])
-async def list_settlement_ban_reports(
+@router.get("/settlement-ban-reports")
+def list_settlement_ban_reports(
     period_id: Optional[int] = Query(None),
     status_filter: Optional[int] = Query(None, alias="status"),
     applied: Optional[int] = Query(None, description="0/1"),
+    limit: int = Query(200, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="翻页游标：上一页最后一条 report_id"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    claims: dict = Depends(get_current_admin_claims),
 ):
-    """封号提报记录列表（管理员）"""
-    query = db.query(SettlementBanReport)
+    """封号提报记录列表（管理员，按 report_id 倒序游标分页）"""
+    query = db.query(SettlementBanReport).options(*safe_options())
     if period_id is not None:
         query = query.filter(SettlementBanReport.period_id == int(period_id))
     if status_filter is not None:
         query = query.filter(SettlementBanReport.status == int(status_filter))
     if applied is not None:
         query = query.filter(SettlementBanReport.is_applied == int(applied))
-    return query.order_by(SettlementBanReport.report_id.desc()).all()
+    if cursor is not None:
+        query = query.filter(SettlementBanReport.report_id < int(cursor))
+    reports = query.order_by(SettlementBanReport.report_id.desc()).limit(int(limit)).all()
+    return _BAN_REPORT_LIST_ADAPTER.dump_python(
+        _BAN_REPORT_LIST_ADAPTER.validate_python(reports, from_attributes=True)
+    )
 
 
 @router.post("/settlement-ban-reports/{report_id}/approve", response_model=SettlementBanReportResponse)
-async def approve_settlement_ban_report(
+def approve_settlement_ban_report(
     report_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -933,32 +1025,31 @@ async def approve_settlement_ban_report(
     """审核通过封号提报（管理员）"""
     now = datetime.now()
     try:
-        report = (
-            db.query(SettlementBanReport)
-            .filter(SettlementBanReport.report_id == int(report_id))
-            .with_for_update()
-            .first()
+        # 条件 UPDATE 原子完成"待审核 -> 已审核"，无需先 SELECT ... FOR UPDATE
+        res = db.execute(
+            update(SettlementBanReport)
+            .where(SettlementBanReport.report_id == report_id, SettlementBanReport.status == 0)
+            .values(status=1, reject_reason=None, reviewed_by=current_user.id, reviewed_at=now)
+            .execution_options(synchronize_session=False)
         )
+        report = db.get(SettlementBanReport, report_id)
         if not report:
             raise HTTPException(status_code=404, detail="封号提报不存在")
-        if int(report.status or 0) != 0:
+        if res.rowcount != 1:
             raise HTTPException(status_code=400, detail="该提报不是待审核状态")
 
-        report.status = 1
-        report.reject_reason = None
-        report.reviewed_by = current_user.id
-        report.reviewed_at = now
+        # 同一事务内读取更新后的行（含 updated_at），提交前序列化，省去 commit 后的 refresh
+        result = SettlementBanReportResponse.model_validate(report)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise exc
 
-    db.refresh(report)
-    return report
+    return result
 
 
 @router.post("/settlement-ban-reports/{report_id}/reject", response_model=SettlementBanReportResponse)
-async def reject_settlement_ban_report(
+def reject_settlement_ban_report(
     report_id: int,
     data: SettlementBanReportReject,
     db: Session = Depends(get_db),
@@ -967,32 +1058,31 @@ async def reject_settlement_ban_report(
     """驳回封号提报（管理员）"""
     now = datetime.now()
     try:
-        report = (
-            db.query(SettlementBanReport)
-            .filter(SettlementBanReport.report_id == int(report_id))
-            .with_for_update()
-            .first()
+        # 条件 UPDATE 原子完成"待审核 -> 已审核"，无需先 SELECT ... FOR UPDATE
+        res = db.execute(
+            update(SettlementBanReport)
+            .where(SettlementBanReport.report_id == report_id, SettlementBanReport.status == 0)
+            .values(status=2, reject_reason=data.reject_reason, reviewed_by=current_user.id, reviewed_at=now)
+            .execution_options(synchronize_session=False)
         )
+        report = db.get(SettlementBanReport, report_id)
         if not report:
             raise HTTPException(status_code=404, detail="封号提报不存在")
-        if int(report.status or 0) != 0:
+        if res.rowcount != 1:
             raise HTTPException(status_code=400, detail="该提报不是待审核状态")
 
-        report.status = 2
-        report.reject_reason = data.reject_reason
-        report.reviewed_by = current_user.id
-        report.reviewed_at = now
+        # 同一事务内读取更新后的行（含 updated_at），提交前序列化，省去 commit 后的 refresh
+        result = SettlementBanReportResponse.model_validate(report)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise exc
 
-    db.refresh(report)
-    return report
+    return result
 
 
 @router.post("/settlement-ban-reports/{report_id}/apply", response_model=SettlementBanReportResponse)
-async def apply_settlement_ban_report(
+def apply_settlement_ban_report(
     report_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -1002,25 +1092,28 @@ async def apply_settlement_ban_report(
     now = datetime.now().replace(microsecond=0)
 
     try:
-        report = (
-            db.query(SettlementBanReport)
-            .filter(SettlementBanReport.report_id == int(report_id))
-            .with_for_update()
-            .first()
-        )
+        report = db.get(SettlementBanReport, report_id, with_for_update=True)
         if not report:
             raise HTTPException(status_code=404, detail="封号提报不存在")
-        if int(report.status or 0) != 1:
+        if report.status != 1:
             raise HTTPException(status_code=400, detail="仅允许对已通过审核的提报进行应用")
-        if int(report.is_applied or 0) == 1:
+        if report.is_applied == 1:
             raise HTTPException(status_code=400, detail="该提报已应用过，禁止重复扣减")
 
-        period_id = int(report.period_id)
-        source_user_id = int(report.user_id)
-
-        period = _get_period_or_404(db, period_id)
-        if int(period.status or 0) == 2:
+        period_id = report.period_id
+        source_user_id = report.user_id
+
+        # status 可变：在本事务内加共享锁读取，避免并发关闭结算期时仍按旧状态扣减
+        period_status = db.execute(
+            select(SettlementPeriod.status)
+            .where(SettlementPeriod.period_id == period_id)
+            .with_for_update(read=True)
+        ).scalar()
+        if period_status is None:
+            raise HTTPException(status_code=404, detail="结算期不存在")
+        if period_status == 2:
             raise HTTPException(status_code=400, detail="该结算期已关闭，禁止应用封号扣减")
+        period = _get_period_config(db, period_id)
 
         # 保护：如果分成已资金化/解锁或已写入钱包账本，则不允许再扣减（否则需要回滚钱包，风险高）
         has_funded_commission = db.query(SettlementCommission).filter(
@@ -1038,39 +1131,41 @@ async def apply_settlement_ban_report(
         if has_wallet_ledger:
             raise HTTPException(status_code=409, detail="该用户本期分成已入账钱包，禁止应用封号扣减（请手工做账调整）")
 
-        income = (
-            db.query(SettlementUserIncome)
+        # 收益汇总与应缴按 (period_id, user_id) 一次 JOIN 加锁，固定加锁顺序
+        row = (
+            db.query(SettlementUserIncome, SettlementUserPayable)
+            .outerjoin(
+                SettlementUserPayable,
+                and_(
+                    SettlementUserPayable.period_id == SettlementUserIncome.period_id,
+                    SettlementUserPayable.user_id == SettlementUserIncome.user_id,
+                ),
+            )
             .filter(SettlementUserIncome.period_id == period_id, SettlementUserIncome.user_id == source_user_id)
             .with_for_update()
             .first()
         )
-        if not income:
+        if not row:
             raise HTTPException(status_code=404, detail="未找到对应的结算收益汇总记录")
-
-        payable = (
-            db.query(SettlementUserPayable)
-            .filter(SettlementUserPayable.period_id == period_id, SettlementUserPayable.user_id == source_user_id)
-            .with_for_update()
-            .first()
-        )
+        income, payable = row
         if not payable:
             raise HTTPException(status_code=404, detail="未找到对应的应缴记录")
 
-        old_gross = int(income.gross_coins or 0)
+        old_gross = income.gross_coins
         if old_gross <= 0:
             raise HTTPException(status_code=400, detail="本期 gross_coins 为 0，无法继续扣减")
 
-        banned = int(report.banned_coins or 0)
+        banned = report.banned_coins
         if banned <= 0:
             raise HTTPException(status_code=400, detail="banned_coins 必须为正数")
 
         deduct_gross = min(banned, old_gross)
         new_gross = old_gross - deduct_gross
 
-        host_bps = int(period.host_bps or 0)
-        collect_bps = int(period.collect_bps or 0)
-        l1_bps = int(period.l1_bps or 0)
-        l2_bps = int(period.l2_bps or 0)
+        host_bps = period.host_bps
+        collect_bps = period.collect_bps
+        l1_bps = period.l1_bps
+        l2_bps = period.l2_bps
 
         new_self_keep = (new_gross * host_bps) // 10000
         new_due = (new_gross * collect_bps) // 10000
@@ -1083,11 +1178,11 @@ async def apply_settlement_ban_report(
 
         # 记录本次扣减差值（用于审计/可追溯）
         report.deduct_gross_coins = old_gross - new_gross
-        report.deduct_self_keep_coins = int(income.self_keep_coins or 0) - new_self_keep
-        report.deduct_due_coins = int(income.self_payable_coins or 0) - new_due
-        report.deduct_l1_commission_coins = int(income.l1_commission_coins or 0) - new_l1
-        report.deduct_l2_commission_coins = int(income.l2_commission_coins or 0) - new_l2
-        report.deduct_platform_retain_coins = int(income.platform_retain_coins or 0) - new_platform
+        report.deduct_self_keep_coins = income.self_keep_coins - new_self_keep
+        report.deduct_due_coins = income.self_payable_coins - new_due
+        report.deduct_l1_commission_coins = income.l1_commission_coins - new_l1
+        report.deduct_l2_commission_coins = income.l2_commission_coins - new_l2
+        report.deduct_platform_retain_coins = income.platform_retain_coins - new_platform
 
         # 应用到结算汇总（以重新计算结果为准，避免多次扣减带来的取整偏差）
         income.gross_coins = new_gross
@@ -1098,11 +1193,11 @@ async def apply_settlement_ban_report(
         income.platform_retain_coins = new_platform
 
         # 同步应缴（应缴 = self_payable_coins）
-        prev_status = int(payable.status or 0)
+        prev_status = payable.status
         payable.amount_due_coins = new_due
 
-        due = int(payable.amount_due_coins or 0)
-        paid = int(payable.amount_paid_coins or 0)
+        due = new_due
+        paid = payable.amount_paid_coins
         if due <= 0:
             payable.status = 2
             if payable.paid_at is None:
@@ -1116,151 +1211,65 @@ async def apply_settlement_ban_report(
             if date.today() > period.pay_end:
                 payable.status = 3
 
-        # 更新分成明细金额（仅未资金化状态允许调整）
-        if has_l1:
-            comm1 = db.query(SettlementCommission).filter(
-                SettlementCommission.period_id == period_id,
-                SettlementCommission.source_user_id == source_user_id,
-                SettlementCommission.beneficiary_user_id == int(income.l1_user_id),
-                SettlementCommission.level == 1,
-            ).with_for_update().first()
-            if comm1:
-                comm1.amount_coins = new_l1
-            elif new_l1 > 0:
-                db.add(SettlementCommission(
-                    period_id=period_id,
-                    source_user_id=source_user_id,
-                    beneficiary_user_id=int(income.l1_user_id),
-                    level=1,
-                    amount_coins=new_l1,
-                    funding_status=0,
-                    is_unlocked=0,
-                ))
-
-        if has_l2:
-            comm2 = db.query(SettlementCommission).filter(
-                SettlementCommission.period_id == period_id,
-                SettlementCommission.source_user_id == source_user_id,
-                SettlementCommission.beneficiary_user_id == int(income.l2_user_id),
-                SettlementCommission.level == 2,
-            ).with_for_update().first()
-            if comm2:
-                comm2.amount_coins = new_l2
-            elif new_l2 > 0:
-                db.add(SettlementCommission(
-                    period_id=period_id,
-                    source_user_id=source_user_id,
-                    beneficiary_user_id=int(income.l2_user_id),
-                    level=2,
-                    amount_coins=new_l2,
-                    funding_status=0,
-                    is_unlocked=0,
-                ))
+        # 更新分成明细金额（仅未资金化状态允许调整）：按主键 upsert，一条语句写入 +1/+2
+        upserts = []
+        for level, has_level, beneficiary_user_id, new_amount in (
+            (1, has_l1, income.l1_user_id, new_l1),
+            (2, has_l2, income.l2_user_id, new_l2),
+        ):
+            if not has_level:
+                continue
+            if new_amount > 0:
+                upserts.append({
+                    "period_id": period_id,
+                    "source_user_id": source_user_id,
+                    "beneficiary_user_id": beneficiary_user_id,
+                    "level": level,
+                    "amount_coins": new_amount,
+                    "funding_status": 0,
+                    "is_unlocked": 0,
+                })
+            else:
+                # 扣减到 0：只清零已有行，不新建 0 金额明细
+                db.query(SettlementCommission).filter(
+                    SettlementCommission.period_id == period_id,
+                    SettlementCommission.source_user_id == source_user_id,
+                    SettlementCommission.beneficiary_user_id == beneficiary_user_id,
+                    SettlementCommission.level == level,
+                ).update({"amount_coins": 0}, synchronize_session=False)
+        if upserts:
+            stmt = mysql_insert(SettlementCommission).values(upserts)
+            db.execute(stmt.on_duplicate_key_update(amount_coins=stmt.inserted.amount_coins))
 
         report.is_applied = 1
         report.applied_by = current_user.id
         report.applied_at = now
+        report.updated_at = now
 
         # 若扣减后首次达到 PAID，则触发分成资金化入账（与缴费确认口径一致）
-        just_paid = prev_status != 2 and int(payable.status or 0) == 2
+        just_paid = prev_status != 2 and payable.status == 2
         if just_paid:
-            db.execute(
-                text(
-                    """
-                    UPDATE settlement_commissions
-                    SET funding_status = 1,
-                        funded_at = :now
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 0
-                    """
-                ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-            )
+            _fund_commissions_for_source(db, period_id, source_user_id, now)
 
-            db.execute(
-                text(
-                    """
-                    INSERT INTO wallet_ledger
-                      (user_id, period_id, entry_type, delta_locked_coins, ref_source_user_id, remark)
-                    SELECT
-                      beneficiary_user_id,
-                      :period_id,
-                      'COMMISSION_LOCKED_IN',
-                      SUM(amount_coins) AS sum_coins,
-                      :source_user_id,
-                      'downline paid'
-                    FROM settlement_commissions
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 1
-                      AND funded_at = :now
-                    GROUP BY beneficiary_user_id
-                    """
-                ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-            )
-
-            db.execute(
-                text(
-                    """
-                    INSERT INTO wallet_accounts(user_id, available_coins, locked_coins)
-                    SELECT
-                      beneficiary_user_id,
-                      0,
-                      SUM(amount_coins) AS sum_coins
-                    FROM settlement_commissions
-                    WHERE period_id = :period_id
-                      AND source_user_id = :source_user_id
-                      AND funding_status = 1
-                      AND funded_at = :now
-                    GROUP BY beneficiary_user_id
-                    ON DUPLICATE KEY UPDATE
-                      locked_coins = locked_coins + VALUES(locked_coins)
-                    """
-                ),
-                {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-            )
-
-            beneficiary_rows = (
-                db.execute(
-                    text(
-                        """
-                        SELECT DISTINCT beneficiary_user_id
-                        FROM settlement_commissions
-                        WHERE period_id = :period_id
-                          AND source_user_id = :source_user_id
-                          AND funding_status = 1
-                          AND funded_at = :now
-                        """
-                    ),
-                    {"now": now, "period_id": period_id, "source_user_id": source_user_id},
-                )
-                .mappings()
-                .all()
-            )
             try:
-                for r in beneficiary_rows:
-                    bid = int(r.get("beneficiary_user_id") or 0)
-                    if bid > 0:
-                        unlock_commissions_for_beneficiary(db, period_id, bid, now=now)
-                unlock_commissions_for_beneficiary(db, period_id, source_user_id, now=now)
+                unlock_commissions_for_source(db, period_id, source_user_id, now=now)
             except ValueError as exc:
                 raise HTTPException(status_code=409, detail=str(exc))
 
+        db.flush()
+        result = SettlementBanReportResponse.model_validate(report)
         db.commit()
     except Exception as exc:
         db.rollback()
         raise exc
 
-    db.refresh(report)
-    return report
+    return result
 
 
 # ==================== 结算期管理 API ====================
 
 @router.post("/settlement-periods/{period_id}/activate")
-async def activate_settlement_period(
+def activate_settlement_period(
     period_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -1276,13 +1285,17 @@ async def activate_settlement_period(
     period = _get_period_or_404(db, period_id)
 
     try:
-        # 取消其他所有结算期的生效状态
+        # 取消其他结算期的生效状态（只改当前 is_active=1 的行，走 idx_periods_active）
         db.query(SettlementPeriod).filter(
-            SettlementPeriod.period_id != int(period_id)
-        ).update({"is_active": 0})
+            SettlementPeriod.is_active == 1,
+            SettlementPeriod.period_id != int(period_id),
+        ).update({"is_active": 0}, synchronize_session=False)
 
-        # 设置当前结算期为生效期
-        period.is_active = 1
+        # 设置当前结算期为生效期（已生效则不产生写入）
+        db.query(SettlementPeriod).filter(
+            SettlementPeriod.period_id == int(period_id),
+            SettlementPeriod.is_active == 0,
+        ).update({"is_active": 1}, synchronize_session=False)
 
         db.commit()
         return {"message": f"已设置 {period.period_start}~{period.period_end} 为当前生效期", "period_id": period_id}
@@ -1292,7 +1305,7 @@ async def activate_settlement_period(
 
 
 @router.delete("/settlement-periods/{period_id}")
-async def delete_settlement_period(
+def delete_settlement_period(
     period_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -1305,56 +1318,41 @@ async def delete_settlement_period(
     - 若该期已产生钱包账本流水（wallet_ledger.period_id），也禁止删除
     - 删除时会同时清理关联的：关系快照/收益汇总/应缴/分成明细
     """
-    period = _get_period_or_404(db, period_id)
+    _get_period_or_404(db, period_id)
 
-    # 检查是否有缴费记录
-    payment_count = db.query(SettlementPayment).filter(
-        SettlementPayment.period_id == int(period_id)
-    ).count()
-    if payment_count > 0:
+    # 检查是否有缴费记录（先用 EXISTS 探测，命中后才统计条数用于提示）
+    payment_q = db.query(SettlementPayment.payment_id).filter(SettlementPayment.period_id == int(period_id))
+    if db.query(payment_q.exists()).scalar():
+        payment_count = payment_q.count()
         raise HTTPException(
             status_code=400,
             detail=f"该结算期已有 {payment_count} 条缴费记录，无法删除"
         )
 
     # 检查是否已发生钱包入账/解锁流水（强审计表，不允许删除周期后造成断链）
-    ledger_count = db.query(WalletLedger).filter(WalletLedger.period_id == int(period_id)).count()
-    if ledger_count > 0:
+    ledger_q = db.query(WalletLedger.ledger_id).filter(WalletLedger.period_id == int(period_id))
+    if db.query(ledger_q.exists()).scalar():
+        ledger_count = ledger_q.count()
         raise HTTPException(
             status_code=400,
             detail=f"该结算期已产生 {ledger_count} 条钱包账本流水，无法删除（请走关账/对账流程）"
         )
 
     try:
-        # 若当前为生效期，先取消生效标记
-        if int(period.is_active or 0) == 1:
-            period.is_active = 0
-            db.flush()
-
-        # 先清理分成明细
-        db.query(SettlementCommission).filter(SettlementCommission.period_id == int(period_id)).delete()
-
-        # 删除关系快照
-        db.query(SettlementReferralSnapshot).filter(
-            SettlementReferralSnapshot.period_id == int(period_id)
-        ).delete()
-
-        # 删除用户收益汇总
-        db.query(SettlementUserIncome).filter(
-            SettlementUserIncome.period_id == int(period_id)
-        ).delete()
-
-        # 删除用户应缴记录
-        db.query(SettlementUserPayable).filter(
-            SettlementUserPayable.period_id == int(period_id)
-        ).delete()
-
-        # 删除结算期本身
-        db.query(SettlementPeriod).filter(
-            SettlementPeriod.period_id == int(period_id)
-        ).delete()
+        # 按 period_id 批量删除关联数据与结算期本身（生效标记随行删除，无需先置 0）；
+        # 不需要同步 Session 中的对象，统一 synchronize_session=False
+        pid = int(period_id)
+        for model in (
+            SettlementCommission,  # 分成明细
+            SettlementReferralSnapshot,  # 关系快照
+            SettlementUserIncome,  # 用户收益汇总
+            SettlementUserPayable,  # 用户应缴记录
+            SettlementPeriod,  # 结算期本身
+        ):
+            db.query(model).filter(model.period_id == pid).delete(synchronize_session=False)
 
         db.commit()
+        _invalidate_period_config(pid)
         return {"message": "结算期已删除", "period_id": period_id}
     except Exception as exc:
         db.rollback()
@@ -1,6 +1,12 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, or_, select
 from datetime import date, timedelta
 from app.database import get_db
 from app.models import (
@@ -17,210 +23,298 @@ from app.models import (
     UserScriptEnv,
     EnvStatus,
 )
-from app.schemas import DashboardAccountStatusItem, DashboardAccountStatusResponse, DashboardStats
+from app.schemas import DashboardAccountStatusResponse, DashboardStats
 from app.auth import get_current_user
-from app.services.account_health import classify_account_health, pick_account_health_basis
+from app.services.account_health import (
+    account_health_severity,
+    classify_account_health,
+    pick_account_health_basis,
+)
 
 router = APIRouter(prefix="/api", tags=["统计"])
 
+# 当前结算期金币比例短时缓存：一天内只会变动几次，仪表板每次请求无需回表
+DASHBOARD_COIN_RATE_CACHE_TTL = 60
+_coin_rate_cache: Optional[Tuple[float, int]] = None
+_coin_rate_cache_lock = threading.Lock()
+
+
+def _get_current_coin_rate(db: Session) -> int:
+    """当前结算期（OPEN/PAYING 中最新一期）的 coin_rate，无有效期时按 10000（带 TTL 缓存）"""
+    global _coin_rate_cache
+    now = time.monotonic()
+    with _coin_rate_cache_lock:
+        cached = _coin_rate_cache
+    if cached and now < cached[0]:
+        return cached[1]
+
+    coin_rate = (
+        db.query(SettlementPeriod.coin_rate)
+        .filter(SettlementPeriod.status.in_([0, 1]))
+        .order_by(SettlementPeriod.period_id.desc())
+        .limit(1)
+        .scalar()
+    )
+    coin_rate = int(coin_rate) if coin_rate and int(coin_rate) > 0 else 10000
+    with _coin_rate_cache_lock:
+        _coin_rate_cache = (now + DASHBOARD_COIN_RATE_CACHE_TTL, coin_rate)
+    return coin_rate
+
+
+# 仪表板整包响应短时缓存：按 (接口, user_id, 角色, 日期) 缓存，重复刷新直接命中内存
+DASHBOARD_PAYLOAD_CACHE_TTL = 30
+DASHBOARD_PAYLOAD_CACHE_MAX = 2000
+_payload_cache: Dict[Tuple[str, int, str, date], Tuple[float, Dict[str, Any]]] = {}
+_payload_cache_lock = threading.Lock()
+
+
+def _payload_cache_key(name: str, user: User) -> Tuple[str, int, str, date]:
+    return (name, int(user.id), str(user.role.value), date.today())
+
+
+def _get_cached_payload(key: Tuple[str, int, str, date]) -> Optional[Dict[str, Any]]:
+    now = time.monotonic()
+    with _payload_cache_lock:
+        cached = _payload_cache.get(key)
+    if cached and now < cached[0]:
+        return cached[1]
+    return None
+
+
+def _set_cached_payload(key: Tuple[str, int, str, date], payload: Dict[str, Any]) -> None:
+    now = time.monotonic()
+    with _payload_cache_lock:
+        if len(_payload_cache) >= DASHBOARD_PAYLOAD_CACHE_MAX:
+            # 先清过期项；仍然满则清空（最多多回表一次）
+            for k in [k for k, (expires, _) in _payload_cache.items() if expires <= now]:
+                _payload_cache.pop(k, None)
+            if len(_payload_cache) >= DASHBOARD_PAYLOAD_CACHE_MAX:
+                _payload_cache.clear()
+        # 过期时间加少量抖动，避免同一批用户同时失效
+        _payload_cache[key] = (now + DASHBOARD_PAYLOAD_CACHE_TTL + random.uniform(0, 5), payload)
+
 
 @router.get("/stats/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取仪表板统计数据"""
+    cache_key = _payload_cache_key("dashboard", current_user)
+    cached = _get_cached_payload(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+
     today = date.today()
     yesterday = today - timedelta(days=1)
     week_ago = today - timedelta(days=7)
 
     if current_user.role == UserRole.ADMIN:
-        # 管理员看全局数据
-        total_users = db.query(User).count()
-        total_ks_accounts = db.query(UserScriptEnv).count()
-        total_configs = db.query(UserScriptConfig).count()
-        total_ql_instances = db.query(QLInstance).count()
-
-        yesterday_coins = db.query(func.sum(EarningRecord.coins_total)).filter(
-            EarningRecord.stat_date == yesterday
-        ).scalar() or 0
-
-        week_coins = db.query(func.sum(EarningRecord.coins_total)).filter(
-            EarningRecord.stat_date >= week_ago
-        ).scalar() or 0
-
-        # 管理端：待审核的缴费记录数
-        pending_settlements = db.query(SettlementPayment).filter(
-            SettlementPayment.status == 0
-        ).count()
-
-        # 管理员也显示自己的钱包余额
-        wallet = db.query(WalletAccount).filter(WalletAccount.user_id == current_user.id).first()
-        available_coins = int(wallet.available_coins or 0) if wallet else 0
-        period = (
-            db.query(SettlementPeriod)
-            .filter(SettlementPeriod.status.in_([0, 1]))
-            .order_by(SettlementPeriod.period_id.desc())
-            .first()
-        )
-        coin_rate = int(period.coin_rate) if period and int(getattr(period, "coin_rate", 0) or 0) > 0 else 10000
-        wallet_balance = float(available_coins / coin_rate) if coin_rate > 0 else 0.0
+        # 管理员看全局数据：各项计数/汇总作为标量子查询，一条 SELECT 取回
+        (
+            total_users,
+            total_ks_accounts,
+            total_configs,
+            total_ql_instances,
+            yesterday_coins,
+            week_coins,
+            pending_settlements,
+            available_coins,
+        ) = db.execute(
+            select(
+                select(func.count()).select_from(User).scalar_subquery(),
+                select(func.count()).select_from(UserScriptEnv).scalar_subquery(),
+                select(func.count()).select_from(UserScriptConfig).scalar_subquery(),
+                select(func.count()).select_from(QLInstance).scalar_subquery(),
+                select(func.sum(EarningRecord.coins_total))
+                .where(EarningRecord.stat_date == yesterday)
+                .scalar_subquery(),
+                select(func.sum(EarningRecord.coins_total))
+                .where(EarningRecord.stat_date >= week_ago)
+                .scalar_subquery(),
+                # 管理端：待审核的缴费记录数
+                select(func.count())
+                .select_from(SettlementPayment)
+                .where(SettlementPayment.status == 0)
+                .scalar_subquery(),
+                # 管理员也显示自己的钱包余额
+                select(WalletAccount.available_coins)
+                .where(WalletAccount.user_id == current_user.id)
+                .scalar_subquery(),
+            )
+        ).one()
     else:
         # 普通用户看自己的数据
         total_users = 0
-        total_configs = db.query(UserScriptConfig).filter(
-            UserScriptConfig.user_id == current_user.id
-        ).count()
-        total_ql_instances = db.query(QLInstance).filter(QLInstance.status == 1).count()
-
-        # 当前用户可见账号集合：user_script_configs.user_id -> user_script_envs
-        owned_env_ids = [
-            env_id
-            for (env_id,) in db.query(UserScriptEnv.id)
+
+        # 当前用户可见账号集合（user_script_configs.user_id -> user_script_envs）直接 JOIN 收益记录，
+        # 账号数与昨日/近 7 日金币在同一聚合中求出，不再先取回 env_id 列表
+        coins_subq = (
+            select(
+                func.count(func.distinct(UserScriptEnv.id)).label("accounts"),
+                func.sum(case((EarningRecord.stat_date == yesterday, EarningRecord.coins_total), else_=0)).label("y"),
+                func.sum(EarningRecord.coins_total).label("w"),
+            )
+            .select_from(UserScriptEnv)
             .join(UserScriptConfig, UserScriptEnv.config_id == UserScriptConfig.id)
-            .filter(UserScriptConfig.user_id == current_user.id)
-            .all()
-        ]
-        total_ks_accounts = len(owned_env_ids)
-
-        if owned_env_ids:
-            yesterday_coins = db.query(func.sum(EarningRecord.coins_total)).filter(
-                EarningRecord.env_id.in_(owned_env_ids),
-                EarningRecord.stat_date == yesterday
-            ).scalar() or 0
-
-            week_coins = db.query(func.sum(EarningRecord.coins_total)).filter(
-                EarningRecord.env_id.in_(owned_env_ids),
-                EarningRecord.stat_date >= week_ago
-            ).scalar() or 0
-        else:
-            yesterday_coins = 0
-            week_coins = 0
-
-        # 用户端：当前用户存在未缴清的期数（UNPAID/PARTIAL/OVERDUE）
-        pending_settlements = db.query(SettlementUserPayable).filter(
-            SettlementUserPayable.user_id == current_user.id,
-            SettlementUserPayable.status != 2
-        ).count()
-
-        wallet = db.query(WalletAccount).filter(WalletAccount.user_id == current_user.id).first()
-        available_coins = int(wallet.available_coins or 0) if wallet else 0
-        period = (
-            db.query(SettlementPeriod)
-            .filter(SettlementPeriod.status.in_([0, 1]))
-            .order_by(SettlementPeriod.period_id.desc())
-            .first()
+            .outerjoin(
+                EarningRecord,
+                and_(EarningRecord.env_id == UserScriptEnv.id, EarningRecord.stat_date >= week_ago),
+            )
+            .where(UserScriptConfig.user_id == current_user.id)
+            .subquery()
         )
-        coin_rate = int(period.coin_rate) if period and int(getattr(period, "coin_rate", 0) or 0) > 0 else 10000
-        wallet_balance = float(available_coins / coin_rate) if coin_rate > 0 else 0.0
-
-    return DashboardStats(
-        total_users=total_users,
-        total_ks_accounts=total_ks_accounts,
-        total_configs=total_configs,
-        total_ql_instances=total_ql_instances,
-        yesterday_coins=int(yesterday_coins),
-        week_coins=int(week_coins),
-        pending_settlements=pending_settlements,
-        wallet_balance=wallet_balance
-    )
+        (
+            total_ks_accounts,
+            total_configs,
+            total_ql_instances,
+            yesterday_coins,
+            week_coins,
+            pending_settlements,
+            available_coins,
+        ) = db.execute(
+            select(
+                coins_subq.c.accounts,
+                select(func.count())
+                .select_from(UserScriptConfig)
+                .where(UserScriptConfig.user_id == current_user.id)
+                .scalar_subquery(),
+                select(func.count()).select_from(QLInstance).where(QLInstance.status == 1).scalar_subquery(),
+                coins_subq.c.y,
+                coins_subq.c.w,
+                # 用户端：当前用户存在未缴清的期数（UNPAID/PARTIAL/OVERDUE）
+                select(func.count())
+                .select_from(SettlementUserPayable)
+                .where(SettlementUserPayable.user_id == current_user.id, SettlementUserPayable.status != 2)
+                .scalar_subquery(),
+                select(WalletAccount.available_coins)
+                .where(WalletAccount.user_id == current_user.id)
+                .scalar_subquery(),
+            ).select_from(coins_subq)
+        ).one()
+
+    yesterday_coins = yesterday_coins or 0
+    week_coins = week_coins or 0
+    available_coins = int(available_coins or 0)
+    coin_rate = _get_current_coin_rate(db)
+    wallet_balance = float(available_coins / coin_rate) if coin_rate > 0 else 0.0
+
+    payload = {
+        "total_users": int(total_users),
+        "total_ks_accounts": int(total_ks_accounts),
+        "total_configs": int(total_configs),
+        "total_ql_instances": int(total_ql_instances),
+        "yesterday_coins": int(yesterday_coins),
+        "week_coins": int(week_coins),
+        "pending_settlements": int(pending_settlements),
+        "wallet_balance": wallet_balance,
+    }
+    _set_cached_payload(cache_key, payload)
+    return ORJSONResponse(payload)
 
 
 @router.get("/stats/account-health", response_model=DashboardAccountStatusResponse)
-async def get_account_health_stats(
+def get_account_health_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """仪表板：自己 + 下级账号状态（今日已统计则用今日，否则用昨日）"""
+    cache_key = _payload_cache_key("account_health", current_user)
+    cached = _get_cached_payload(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+
     stat_date, basis, basis_label = pick_account_health_basis(db)
 
-    # 可见用户集合：自己 + +1/+2 下级（按 user_referrals）
-    level_map = {int(current_user.id): ("self", "本人")}
-    level1_ids = {
-        int(uid)
-        for (uid,) in db.query(UserReferral.user_id)
-        .filter(UserReferral.inviter_level1 == int(current_user.id))
-        .all()
-    }
-    level2_ids = {
-        int(uid)
-        for (uid,) in db.query(UserReferral.user_id)
-        .filter(UserReferral.inviter_level2 == int(current_user.id))
+    # 可见用户集合：自己 + +1/+2 下级（按 user_referrals，一次查询按 CASE 区分层级，+1 优先）
+    me = int(current_user.id)
+    level_map = {me: ("self", "本人")}
+    referral_rows = (
+        db.query(UserReferral.user_id, case((UserReferral.inviter_level1 == me, "l1"), else_="l2").label("lvl"))
+        .filter(or_(UserReferral.inviter_level1 == me, UserReferral.inviter_level2 == me))
         .all()
-    }
-    for uid in level1_ids:
-        level_map[uid] = ("l1", "+1")
-    for uid in level2_ids:
-        level_map.setdefault(uid, ("l2", "+2"))
+    )
+    for uid, lvl in referral_rows:
+        if lvl == "l1":
+            level_map[int(uid)] = ("l1", "+1")
+        else:
+            level_map.setdefault(int(uid), ("l2", "+2"))
 
-    user_ids = set(level_map.keys()) | level1_ids | level2_ids
-    user_ids_list = list(user_ids)
+    user_ids_list = list(level_map.keys())
 
-    # 账号集合：user_script_envs（仅统计 ksck* 变量）
+    # 账号集合：user_script_envs（仅统计 ksck* 变量），JOIN 用户表取展示信息，
+    # LEFT JOIN 统计日收益按账号聚合，一次查询取回（record_count=0 表示当日无数据）
+    coins_expr = func.coalesce(func.sum(EarningRecord.coins_total), 0)
+    record_count_expr = func.count(EarningRecord.stat_date)
     env_rows = (
-        db.query(UserScriptEnv.id, UserScriptEnv.env_name, UserScriptEnv.remark, UserScriptConfig.user_id)
+        db.query(
+            UserScriptEnv.id,
+            UserScriptEnv.env_name,
+            UserScriptEnv.remark,
+            UserScriptConfig.user_id,
+            User.username,
+            User.nickname,
+            coins_expr.label("coins"),
+            record_count_expr.label("record_count"),
+        )
         .join(UserScriptConfig, UserScriptEnv.config_id == UserScriptConfig.id)
+        .outerjoin(User, User.id == UserScriptConfig.user_id)
+        .outerjoin(
+            EarningRecord,
+            and_(EarningRecord.env_id == UserScriptEnv.id, EarningRecord.stat_date == stat_date),
+        )
         .filter(UserScriptConfig.user_id.in_(user_ids_list))
         .filter(UserScriptEnv.env_name.like("ksck%"))
         .filter(UserScriptEnv.status == EnvStatus.VALID.value)
+        .group_by(
+            UserScriptEnv.id,
+            UserScriptEnv.env_name,
+            UserScriptEnv.remark,
+            UserScriptConfig.user_id,
+            User.username,
+            User.nickname,
+        )
+        # 按严重度、金币、env_id 由数据库排好序，循环中直接顺序追加
+        .order_by(account_health_severity(record_count_expr > 0, coins_expr), coins_expr, UserScriptEnv.id)
         .all()
     )
 
-    # 用户展示信息
-    users = db.query(User.id, User.username, User.nickname).filter(User.id.in_(user_ids_list)).all()
-    user_map = {int(u.id): {"username": u.username, "nickname": u.nickname} for u in users}
-
-    env_ids = [int(env_id) for (env_id, _env_name, _remark, _owner_user_id) in env_rows]
-    coins_map = {}
-    data_env_ids: set[int] = set()
-    if env_ids:
-        coin_rows = (
-            db.query(EarningRecord.env_id, func.sum(EarningRecord.coins_total).label("coins_total"))
-            .filter(EarningRecord.stat_date == stat_date, EarningRecord.env_id.in_(env_ids))
-            .group_by(EarningRecord.env_id)
-            .all()
-        )
-        coins_map = {int(env_id): int(total or 0) for (env_id, total) in coin_rows}
-        data_env_ids = {int(env_id) for (env_id, _total) in coin_rows}
-
-    counts = {"total": 0, "no_data": 0, "need_config": 0, "black": 0, "edge": 0, "normal": 0}
-    items: list[DashboardAccountStatusItem] = []
+    counts = {"total": len(env_rows), "no_data": 0, "need_config": 0, "black": 0, "edge": 0, "normal": 0}
+    items: list[dict] = []
 
-    for env_id, env_name, remark, owner_user_id in env_rows:
+    for env_id, env_name, remark, owner_user_id, owner_username, owner_nickname, coins, record_count in env_rows:
         owner_id = int(owner_user_id) if owner_user_id is not None else None
         relation, relation_label = level_map.get(owner_id, ("other", "其他"))
-        owner_info = user_map.get(owner_id) if owner_id is not None else None
+        coins = int(coins)
 
-        coins = coins_map.get(int(env_id), 0)
-        has_data = int(env_id) in data_env_ids
-        category, category_label = classify_account_health(has_data, int(coins))
+        category, category_label = classify_account_health(record_count > 0, coins)
 
+        # 字段均已按类型转换，直接组装 dict（结构同 DashboardAccountStatusItem）
         items.append(
-            DashboardAccountStatusItem(
-                env_id=int(env_id),
-                env_name=str(env_name),
-                remark=remark,
-                owner_user_id=owner_id,
-                owner_username=(owner_info or {}).get("username") if owner_info else None,
-                owner_nickname=(owner_info or {}).get("nickname") if owner_info else None,
-                relation=relation,
-                relation_label=relation_label,
-                stat_coins=int(coins),
-                category=category,
-                category_label=category_label,
-            )
+            {
+                "env_id": int(env_id),
+                "env_name": env_name,
+                "remark": remark,
+                "owner_user_id": owner_id,
+                "owner_username": owner_username,
+                "owner_nickname": owner_nickname,
+                "relation": relation,
+                "relation_label": relation_label,
+                "stat_coins": coins,
+                "category": category,
+                "category_label": category_label,
+            }
         )
 
-        counts["total"] += 1
-        counts[category] = counts.get(category, 0) + 1
-
-    severity = {"no_data": 0, "need_config": 1, "black": 2, "edge": 3, "normal": 4}
-    items.sort(key=lambda x: (severity.get(x.category, 99), x.stat_coins, x.env_id))
+        counts[category] += 1
 
-    return DashboardAccountStatusResponse(
-        stat_date=stat_date,
-        basis=basis,
-        basis_label=basis_label,
-        counts=counts,
-        items=items,
-    )
+    # 直接返回 ORJSONResponse：跳过 response_model 的二次校验/序列化（模型仅用于文档）
+    payload = {
+        "stat_date": stat_date,
+        "basis": basis,
+        "basis_label": basis_label,
+        "counts": counts,
+        "items": items,
+    }
+    _set_cached_payload(cache_key, payload)
+    return ORJSONResponse(payload)
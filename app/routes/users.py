@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models import User
 from app.schemas import UserResponse
@@ -8,13 +10,38 @@ from app.auth import get_current_user
 
 router = APIRouter(prefix="/api", tags=["用户管理"])
 
+# 列表序列化适配器（模块加载时构建一次，整表校验+序列化在 pydantic-core 内完成）
+_USER_LIST_ADAPTER = TypeAdapter(List[UserResponse])
+
+
+def _paginate(query, limit: Optional[int], offset: int):
+    """按需追加 OFFSET/LIMIT（limit 为空时不截断）"""
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_users(
+def get_users(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="不传则返回全部（前端用户列表依赖完整结果）"),
+    offset: int = Query(0, ge=0),
+    brief: bool = Query(False, description="仅返回 id/username/nickname（下拉框等场景）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取所有用户列表（需要认证）"""
-    users = db.query(User).filter(User.status == 1).all()
-    return [UserResponse.model_validate(user) for user in users]
+    """获取用户列表（需要认证，按 id 排序；传 limit/offset 时分页）"""
+    if brief:
+        # 只取三列，跳过 ORM 实例化与模型校验
+        rows = _paginate(
+            db.query(User.id, User.username, User.nickname).filter(User.status == 1).order_by(User.id),
+            limit,
+            offset,
+        ).all()
+        return ORJSONResponse([{"id": r.id, "username": r.username, "nickname": r.nickname} for r in rows])
 
+    users = _paginate(db.query(User).filter(User.status == 1).order_by(User.id), limit, offset).all()
+    return ORJSONResponse(
+        _USER_LIST_ADAPTER.dump_python(_USER_LIST_ADAPTER.validate_python(users, from_attributes=True), mode="json")
+    )
@@ -3,7 +3,9 @@ from __future__ import annotations
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import func, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_user
@@ -26,6 +28,9 @@ from app.schemas import (
 
 router = APIRouter(prefix="/api", tags=["钱包"])
 
+# 账本列表按 WalletLedgerEntryResponse 字段顺序直接选列（行数多，不逐行构建 ORM/响应对象）
+_LEDGER_RESPONSE_COLUMNS = tuple(getattr(WalletLedger, name) for name in WalletLedgerEntryResponse.model_fields)
+
 DEFAULT_COIN_RATE = 10000
 
 
@@ -49,18 +54,18 @@ def _get_coin_rate(period: Optional[SettlementPeriod]) -> int:
 
 
 def _get_or_create_wallet(db: Session, user_id: int) -> WalletAccount:
-    wallet = db.query(WalletAccount).filter(WalletAccount.user_id == user_id).first()
+    wallet = db.get(WalletAccount, user_id)
     if wallet:
         return wallet
-    wallet = WalletAccount(user_id=user_id, available_coins=0, locked_coins=0)
-    db.add(wallet)
+    # 首次访问并发建号：ON DUPLICATE KEY 吞掉唯一键冲突，不再出现 IntegrityError
+    stmt = mysql_insert(WalletAccount).values(user_id=user_id, available_coins=0, locked_coins=0)
+    db.execute(stmt.on_duplicate_key_update(user_id=stmt.inserted.user_id))
     db.commit()
-    db.refresh(wallet)
-    return wallet
+    return db.get(WalletAccount, user_id)
 
 
 @router.get("/wallet", response_model=WalletAccountResponse)
-async def get_wallet(
+def get_wallet(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -69,7 +74,7 @@ async def get_wallet(
 
 
 @router.get("/wallet/summary", response_model=WalletSummaryResponse)
-async def get_wallet_summary(
+def get_wallet_summary(
     period_id: Optional[int] = Query(None, description="为空则取当前结算期"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -192,14 +197,18 @@ async def get_wallet_summary(
 
 
 @router.get("/wallet/ledger", response_model=List[WalletLedgerEntryResponse])
-async def list_wallet_ledger(
+def list_wallet_ledger(
     limit: int = Query(100, ge=1, le=500),
     period_id: Optional[int] = Query(None),
+    cursor: Optional[int] = Query(None, description="翻页游标：上一页最后一条 ledger_id"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """账本流水（最近 N 条）"""
-    query = db.query(WalletLedger).filter(WalletLedger.user_id == current_user.id)
+    """账本流水（最近 N 条，按 ledger_id 倒序游标分页）"""
+    query = db.query(*_LEDGER_RESPONSE_COLUMNS).filter(WalletLedger.user_id == current_user.id)
     if period_id is not None:
         query = query.filter(WalletLedger.period_id == int(period_id))
-    return query.order_by(WalletLedger.ledger_id.desc()).limit(int(limit)).all()
+    if cursor is not None:
+        query = query.filter(WalletLedger.ledger_id < int(cursor))
+    rows = query.order_by(WalletLedger.ledger_id.desc()).limit(int(limit)).all()
+    return ORJSONResponse([row._asdict() for row in rows])
@@ -4,6 +4,8 @@ from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_user
@@ -31,7 +33,7 @@ def _get_or_create_wallet_locked(db: Session, user_id: int) -> WalletAccount:
 
 
 @router.post("/withdraw-requests", response_model=WithdrawRequestResponse, status_code=status.HTTP_201_CREATED)
-async def create_withdraw_request(
+def create_withdraw_request(
     data: WithdrawRequestCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -44,13 +46,16 @@ async def create_withdraw_request(
     now = datetime.now()
 
     try:
-        wallet = _get_or_create_wallet_locked(db, current_user.id)
-        available = int(wallet.available_coins or 0)
-        if available < amount:
+        # 余额校验与扣减合并为一条条件 UPDATE（行锁内原子完成，钱包不存在同样视为余额不足）
+        deducted = db.execute(
+            update(WalletAccount)
+            .where(WalletAccount.user_id == current_user.id, WalletAccount.available_coins >= amount)
+            .values(available_coins=WalletAccount.available_coins - amount)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deducted != 1:
             raise HTTPException(status_code=400, detail="可提现余额不足")
 
-        wallet.available_coins = available - amount
-
         req = WithdrawRequest(
             user_id=current_user.id,
             amount_coins=amount,
@@ -74,17 +79,17 @@ async def create_withdraw_request(
             )
         )
 
+        result = WithdrawRequestResponse.model_validate(req)
         db.commit()
     except Exception:
         db.rollback()
         raise
 
-    db.refresh(req)
-    return req
+    return result
 
 
 @router.get("/withdraw-requests/my", response_model=List[WithdrawRequestResponse])
-async def list_my_withdraw_requests(
+def list_my_withdraw_requests(
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -100,7 +105,7 @@ async def list_my_withdraw_requests(
 
 
 @router.post("/withdraw-requests/{withdraw_id}/cancel", response_model=WithdrawRequestResponse)
-async def cancel_withdraw_request(
+def cancel_withdraw_request(
     withdraw_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -120,8 +125,12 @@ async def cancel_withdraw_request(
         if int(req.status or 0) != 0:
             raise HTTPException(status_code=400, detail="仅待审核的提现可以取消")
 
-        wallet = _get_or_create_wallet_locked(db, current_user.id)
-        wallet.available_coins = int(wallet.available_coins or 0) + int(req.amount_coins or 0)
+        # 退回余额：一条 upsert 原子累加（钱包缺失时按退款额建号）
+        refund = int(req.amount_coins or 0)
+        stmt = mysql_insert(WalletAccount).values(user_id=current_user.id, available_coins=refund, locked_coins=0)
+        db.execute(
+            stmt.on_duplicate_key_update(available_coins=WalletAccount.available_coins + stmt.inserted.available_coins)
+        )
 
         req.status = 4
         req.processed_at = now
@@ -140,17 +149,18 @@ async def cancel_withdraw_request(
             )
         )
 
+        db.flush()
+        result = WithdrawRequestResponse.model_validate(req)
         db.commit()
     except Exception:
         db.rollback()
         raise
 
-    db.refresh(req)
-    return req
+    return result
 
 
 @router.get("/withdraw-requests", response_model=List[WithdrawRequestResponse])
-async def list_withdraw_requests_admin(
+def list_withdraw_requests_admin(
     status_filter: Optional[int] = Query(None, alias="status"),
     user_id: Optional[int] = Query(None),
     limit: int = Query(100, ge=1, le=500),
@@ -167,7 +177,7 @@ async def list_withdraw_requests_admin(
 
 
 @router.post("/withdraw-requests/{withdraw_id}/approve", response_model=WithdrawRequestResponse)
-async def approve_withdraw_request(
+def approve_withdraw_request(
     withdraw_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -202,7 +212,7 @@ async def approve_withdraw_request(
 
 
 @router.post("/withdraw-requests/{withdraw_id}/pay", response_model=WithdrawRequestResponse)
-async def pay_withdraw_request(
+def pay_withdraw_request(
     withdraw_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -249,7 +259,7 @@ async def pay_withdraw_request(
 
 
 @router.post("/withdraw-requests/{withdraw_id}/reject", response_model=WithdrawRequestResponse)
-async def reject_withdraw_request(
+def reject_withdraw_request(
     withdraw_id: int,
     data: WithdrawRequestReject,
     db: Session = Depends(get_db),
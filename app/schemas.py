@@ -1,111 +1,159 @@
-from pydantic import BaseModel, Field, validator
+import json
+from functools import cache
+from pathlib import Path
+
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_validator
 from datetime import datetime, date
-from typing import Optional, List, Dict
-from decimal import Decimal
-from app.models import (
-    UserRole, ConfigStatus, EnvStatus, KSAccountStatus,
-    RunLogStatus, TransactionType
-)
+from typing import Annotated, Optional, List, Dict
+from app.enums import UserRole, ConfigStatus, EnvStatus
+
+
+class ORMModel(BaseModel):
+    """
+    可直接由 ORM 对象构建的响应模型基类（core schema 延迟到首次使用时构建）
+
+    字段只使用 int / float / str / date / datetime 等 orjson 原生支持的类型（不用 Decimal、
+    不自定义 __iter__），ORJSONResponse 可直接在 C 层序列化 dump 结果。
+    """
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
+
+
+@cache
+def _schema_examples() -> Dict[str, dict]:
+    """OpenAPI 示例数据（首次生成文档时才读取 schema_examples.json）"""
+    return json.loads(Path(__file__).with_name("schema_examples.json").read_text(encoding="utf-8"))
+
+
+def _example(name: str):
+    """json_schema_extra 回调：生成 schema 时按模型名挂载示例"""
+    def _extra(schema: dict) -> None:
+        schema["example"] = _schema_examples()[name]
+    return _extra
+
+
+# 标识类输入：首尾空白由 pydantic-core 去除（在长度校验之前）
+StrippedStr = Annotated[str, StringConstraints(strip_whitespace=True)]
+
+# 响应中的 coins 字段：数据库 BIGINT 列直接给出 int，strict 模式只做类型检查，不走宽松转换
+CoinInt = Annotated[int, Field(strict=True)]
+
+# 手机号：仅数字（允许空串），由 pydantic-core 按正则校验
+PhoneStr = Annotated[str, StringConstraints(pattern=r"^\d*$", max_length=20)]
 
 
 # ==================== 用户相关 ====================
 
 class UserRegister(BaseModel):
     """用户注册数据模型"""
-    username: str = Field(..., min_length=3, max_length=50, description="用户名/登录名")
+    username: StrippedStr = Field(..., min_length=3, max_length=50, description="用户名/登录名")
     password: str = Field(..., min_length=6, max_length=72, description="密码（最多72字节）")
     nickname: Optional[str] = Field(None, max_length=50, description="昵称/备注名")
-    phone: Optional[str] = Field(None, max_length=20, description="手机号")
+    phone: Optional[PhoneStr] = Field(None, description="手机号")
     wechat_id: Optional[str] = Field(None, max_length=50, description="微信ID（用于联系/结算）")
-    invite_code: Optional[str] = Field(None, description="邀请码（可选，用于建立推广关系）")
+    invite_code: Optional[StrippedStr] = Field(None, description="邀请码（可选，用于建立推广关系）")
 
-    @validator('phone')
-    def validate_phone(cls, v):
-        if v and not v.isdigit():
-            raise ValueError('手机号只能包含数字')
-        return v
-    
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def validate_password_length(cls, v):
         """验证密码字节长度不超过72字节（bcrypt限制）"""
-        if isinstance(v, str):
-            password_bytes = v.encode('utf-8')
-            if len(password_bytes) > 72:
-                raise ValueError('密码长度超过限制（最多72字节，约54个字符）')
+        # UTF-8 每字符最多 4 字节：≤18 字符必然不超限；纯 ASCII 时字节数=字符数（Field 已限 72）
+        if len(v) <= 18 or v.isascii():
+            return v
+        if len(v.encode('utf-8')) > 72:
+            raise ValueError('密码长度超过限制（最多72字节，约54个字符）')
         return v
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "username": "testuser",
-                "password": "password123",
-                "nickname": "测试用户",
-                "phone": "13800138000",
-                "wechat_id": "wxid_test",
-                "invite_code": "INVITE123"
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_example("UserRegister"))
 
 
 class UserLogin(BaseModel):
     """用户登录数据模型"""
-    username_or_email: str = Field(..., description="用户名或手机号")
+    username_or_email: StrippedStr = Field(..., description="用户名或手机号")
     password: str = Field(..., description="密码")
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "username_or_email": "testuser",
-                "password": "password123"
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_example("UserLogin"))
 
 
-class UserResponse(BaseModel):
+class UserResponse(ORMModel):
     """用户信息响应模型"""
     id: int
     username: str
     nickname: Optional[str] = None
     phone: Optional[str] = None
     wechat_id: Optional[str] = None
-    role: str
+    role: UserRole
     status: int
     referral_code: Optional[str] = None  # 我的推广码
     inviter_id: Optional[int] = None     # 直接邀请人ID
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class BindInviterRequest(BaseModel):
     """绑定邀请人请求"""
-    invite_code: str = Field(..., description="邀请码/推广码")
+    model_config = ConfigDict(defer_build=True)
+
+    invite_code: StrippedStr = Field(..., description="邀请码/推广码")
+
+
+class InviterBrief(ORMModel):
+    """邀请人简要信息"""
+    id: int
+    username: str
+    nickname: Optional[str] = None
 
 
 class ReferralInfo(BaseModel):
     """推广信息响应"""
     my_referral_code: str  # 我的推广码
-    inviter: Optional[dict] = None  # 我的邀请人信息
+    inviter: Optional[InviterBrief] = None  # 我的邀请人信息
     level1_count: int = 0  # 我直接邀请的人数
     level2_count: int = 0  # 我间接邀请的人数（+2）
 
 
+class UserBriefOut(ORMModel):
+    """推广关系中的用户简要信息"""
+    id: int
+    username: str
+    nickname: Optional[str] = None
+    phone: Optional[str] = None
+
+
+class ReferralOut(ORMModel):
+    """推广关系列表项"""
+    user_id: int
+    user: Optional[UserBriefOut] = None
+    inviter_level1: Optional[int] = None
+    inviter1: Optional[UserBriefOut] = None
+    inviter_level2: Optional[int] = None
+    inviter2: Optional[UserBriefOut] = None
+    created_at: datetime
+
+
+class InvitedUserOut(ORMModel):
+    """我邀请的用户"""
+    id: int
+    username: str
+    nickname: Optional[str] = None
+    role: UserRole
+    status: int
+    created_at: Optional[datetime] = None
+
+
 class UserUpdate(BaseModel):
     """用户更新数据模型"""
     nickname: Optional[str] = Field(None, max_length=50)
-    phone: Optional[str] = Field(None, max_length=20)
+    phone: Optional[PhoneStr] = None
     wechat_id: Optional[str] = Field(None, max_length=50)
-    role: Optional[str] = None
+    role: Optional[UserRole] = None
     status: Optional[int] = None
 
 
 class AccountUpdate(BaseModel):
     """个人账户更新"""
-    username: Optional[str] = Field(None, min_length=3, max_length=50)
+    username: Optional[StrippedStr] = Field(None, min_length=3, max_length=50)
     nickname: Optional[str] = Field(None, max_length=50)
-    phone: Optional[str] = Field(None, max_length=20)
+    phone: Optional[PhoneStr] = None
     wechat_id: Optional[str] = Field(None, max_length=50)
 
 
@@ -130,6 +178,8 @@ class Message(BaseModel):
 
 class QLInstanceCreate(BaseModel):
     """创建青龙实例"""
+    model_config = ConfigDict(defer_build=True)
+
     name: str = Field(..., max_length=50, description="青龙实例名称")
     base_url: str = Field(..., max_length=255, description="http://ip:5700")
     client_id: str = Field(..., max_length=100, description="青龙应用 client_id")
@@ -140,6 +190,8 @@ class QLInstanceCreate(BaseModel):
 
 class QLInstanceUpdate(BaseModel):
     """更新青龙实例"""
+    model_config = ConfigDict(defer_build=True)
+
     name: Optional[str] = Field(None, max_length=50)
     base_url: Optional[str] = Field(None, max_length=255)
     client_id: Optional[str] = Field(None, max_length=100)
@@ -148,7 +200,7 @@ class QLInstanceUpdate(BaseModel):
     status: Optional[int] = None
 
 
-class QLInstanceResponse(BaseModel):
+class QLInstanceResponse(ORMModel):
     """青龙实例响应"""
     id: int
     name: str
@@ -160,9 +212,6 @@ class QLInstanceResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== 脚本配置相关 ====================
 
@@ -171,32 +220,29 @@ class UserScriptConfigCreate(BaseModel):
     user_id: Optional[int] = Field(None, description="归属用户ID（管理员可指定，不填默认当前用户）")
     ql_instance_id: int = Field(..., description="对应青龙实例ID")
     script_name: str = Field(..., max_length=100, description="脚本名称")
-    group_key: str = Field(..., max_length=100, description="配置组key")
-    status: str = Field("enabled", description="状态: enabled/disabled")
+    group_key: StrippedStr = Field(..., max_length=100, description="配置组key")
+    status: ConfigStatus = Field(ConfigStatus.ENABLED, description="状态: enabled/disabled")
 
 
 class UserScriptConfigUpdate(BaseModel):
     """更新用户脚本配置"""
     script_name: Optional[str] = Field(None, max_length=100)
-    group_key: Optional[str] = Field(None, max_length=100)
-    status: Optional[str] = None
+    group_key: Optional[StrippedStr] = Field(None, max_length=100)
+    status: Optional[ConfigStatus] = None
 
 
-class UserScriptConfigResponse(BaseModel):
+class UserScriptConfigResponse(ORMModel):
     """用户脚本配置响应"""
     id: int
     user_id: int
     ql_instance_id: int
     script_name: str
     group_key: str
-    status: str
+    status: ConfigStatus
     last_sync_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== 环境变量相关 ====================
 
@@ -204,20 +250,20 @@ class UserScriptEnvCreate(BaseModel):
     """创建环境变量"""
     config_id: int = Field(..., description="配置ID")
     env_name: str = Field(..., max_length=100, description="环境变量名")
-    env_value: str = Field(..., description="变量值")
+    env_value: str = Field(..., max_length=16384, description="变量值")
     ql_env_id: Optional[str] = Field(None, max_length=100)
     ip_id: Optional[int] = Field(None, description="IP池ID")
-    status: str = Field("valid", description="状态: valid/invalid")
+    status: EnvStatus = Field(EnvStatus.VALID, description="状态: valid/invalid")
     remark: Optional[str] = Field(None, max_length=255)
 
 
 class UserScriptEnvUpdate(BaseModel):
     """更新环境变量"""
     env_name: Optional[str] = Field(None, max_length=100)
-    env_value: Optional[str] = None
+    env_value: Optional[str] = Field(None, max_length=16384)
     ql_env_id: Optional[str] = Field(None, max_length=100)
     ip_id: Optional[int] = Field(None, description="IP池ID")
-    status: Optional[str] = None
+    status: Optional[EnvStatus] = None
     remark: Optional[str] = Field(None, max_length=255)
 
 
@@ -231,7 +277,7 @@ class IPInfo(BaseModel):
     used: int = 0
 
 
-class UserScriptEnvResponse(BaseModel):
+class UserScriptEnvResponse(ORMModel):
     """环境变量响应"""
     id: int
     config_id: int
@@ -251,125 +297,12 @@ class UserScriptEnvResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class EnvDisableRequest(BaseModel):
     """禁用环境变量请求"""
     days: int = Field(..., ge=1, le=30, description="禁用天数（1-30天），支持3/5/7天")
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "days": 3
-            }
-        }
-
-
-# ==================== 快手账号相关 ====================
-
-class KSAccountCreate(BaseModel):
-    """创建快手账号"""
-    user_id: int = Field(..., description="号主用户ID")
-    config_id: Optional[int] = Field(None, description="关联配置ID")
-    mobile: Optional[str] = Field(None, max_length=20, description="快手绑定手机号")
-    ks_uid: Optional[str] = Field(None, max_length=50, description="快手用户ID")
-    current_ck: Optional[str] = Field(None, description="当前CK")
-    status: str = Field("normal", description="状态: normal/black/banned/expired")
-    device_info: Optional[str] = Field(None, max_length=255)
-    ip_group: Optional[str] = Field(None, max_length=50)
-
-
-class KSAccountUpdate(BaseModel):
-    """更新快手账号"""
-    config_id: Optional[int] = None
-    mobile: Optional[str] = Field(None, max_length=20)
-    ks_uid: Optional[str] = Field(None, max_length=50)
-    current_ck: Optional[str] = None
-    status: Optional[str] = None
-    device_info: Optional[str] = Field(None, max_length=255)
-    ip_group: Optional[str] = Field(None, max_length=50)
-
-
-class KSAccountResponse(BaseModel):
-    """快手账号响应"""
-    id: int
-    user_id: int
-    config_id: Optional[int] = None
-    mobile: Optional[str] = None
-    ks_uid: Optional[str] = None
-    current_ck: Optional[str] = None
-    status: str
-    last_ck_refresh_at: Optional[datetime] = None
-    last_run_at: Optional[datetime] = None
-    device_info: Optional[str] = None
-    ip_group: Optional[str] = None
-    created_at: datetime
-    updated_at: datetime
-
-    class Config:
-        from_attributes = True
-
-
-# ==================== 脚本运行开关相关 ====================
-
-class ScriptRunSwitchCreate(BaseModel):
-    """创建运行开关"""
-    config_id: int = Field(..., description="配置ID")
-    is_enabled: int = Field(1, description="1=开，0=关")
-    cron_expr: Optional[str] = Field(None, max_length=100)
-    max_daily_runs: Optional[int] = None
-
-
-class ScriptRunSwitchUpdate(BaseModel):
-    """更新运行开关"""
-    is_enabled: Optional[int] = None
-    cron_expr: Optional[str] = Field(None, max_length=100)
-    max_daily_runs: Optional[int] = None
-
-
-class ScriptRunSwitchResponse(BaseModel):
-    """运行开关响应"""
-    id: int
-    config_id: int
-    is_enabled: int
-    cron_expr: Optional[str] = None
-    max_daily_runs: Optional[int] = None
-    created_at: datetime
-    updated_at: datetime
-
-    class Config:
-        from_attributes = True
-
-
-# ==================== 运行日志相关 ====================
-
-class ScriptRunLogCreate(BaseModel):
-    """创建运行日志"""
-    config_id: int
-    ks_account_id: Optional[int] = None
-    task_name: str = Field(..., max_length=100)
-    run_at: datetime
-    status: str = Field("success")
-    coins_earned: int = Field(0)
-    raw_log_snippet: Optional[str] = None
-
-
-class ScriptRunLogResponse(BaseModel):
-    """运行日志响应"""
-    id: int
-    config_id: int
-    ks_account_id: Optional[int] = None
-    task_name: str
-    run_at: datetime
-    status: str
-    coins_earned: int
-    raw_log_snippet: Optional[str] = None
-    created_at: datetime
-
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(defer_build=True, json_schema_extra=_example("EnvDisableRequest"))
 
 
 # ==================== 收益记录相关 ====================
@@ -391,6 +324,8 @@ class EarningRecordCreate(BaseModel):
 
 class EarningRecordUpdate(BaseModel):
     """更新收益记录"""
+    model_config = ConfigDict(defer_build=True)
+
     coins_total: Optional[int] = None
     coins_from_look: Optional[int] = None
     coins_from_lookk: Optional[int] = None
@@ -401,31 +336,30 @@ class EarningRecordUpdate(BaseModel):
     record_note: Optional[str] = Field(None, max_length=255)
 
 
-class EarningRecordResponse(BaseModel):
+class EarningRecordResponse(ORMModel):
     """收益记录响应"""
     env_id: int
     user_id: Optional[int] = None
     stat_date: date
     account_remark: str
-    coins_total: int
-    coins_from_look: int
-    coins_from_lookk: int
-    coins_from_dj: int
-    coins_from_food: int
-    coins_from_box: int
-    coins_from_search: int
+    coins_total: CoinInt
+    coins_from_look: CoinInt
+    coins_from_lookk: CoinInt
+    coins_from_dj: CoinInt
+    coins_from_food: CoinInt
+    coins_from_box: CoinInt
+    coins_from_search: CoinInt
     record_note: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== 结算（阶段1）相关 ====================
 
 class SettlementPeriodCreate(BaseModel):
     """创建结算期（管理员）"""
+    model_config = ConfigDict(defer_build=True)
+
     period_start: date
     period_end: date
     pay_start: date
@@ -440,7 +374,7 @@ class SettlementPeriodCreate(BaseModel):
     status: int = Field(0, ge=0, le=2, description="0=OPEN 1=PAYING 2=CLOSED")
 
 
-class SettlementPeriodResponse(BaseModel):
+class SettlementPeriodResponse(ORMModel):
     """结算期响应"""
     period_id: int
     period_label: Optional[str] = None  # 周期标识，如 2025W01
@@ -458,44 +392,35 @@ class SettlementPeriodResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
 
-
-class SettlementUserIncomeResponse(BaseModel):
+class SettlementUserIncomeResponse(ORMModel):
     """结算期用户收益汇总响应"""
     period_id: int
     user_id: int
-    gross_coins: int
-    self_keep_coins: int
-    self_payable_coins: int
+    gross_coins: CoinInt
+    self_keep_coins: CoinInt
+    self_payable_coins: CoinInt
     l1_user_id: Optional[int] = None
     l2_user_id: Optional[int] = None
-    l1_commission_coins: int
-    l2_commission_coins: int
-    platform_retain_coins: int
+    l1_commission_coins: CoinInt
+    l2_commission_coins: CoinInt
+    platform_retain_coins: CoinInt
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
-class SettlementUserPayableResponse(BaseModel):
+class SettlementUserPayableResponse(ORMModel):
     """结算期应缴义务响应"""
     period_id: int
     user_id: int
-    amount_due_coins: int
-    amount_paid_coins: int
+    amount_due_coins: CoinInt
+    amount_paid_coins: CoinInt
     status: int
     first_paid_at: Optional[datetime] = None
     paid_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class SettlementPaymentCreate(BaseModel):
     """提交缴费（用户）"""
@@ -507,10 +432,12 @@ class SettlementPaymentCreate(BaseModel):
 
 class SettlementPaymentReject(BaseModel):
     """驳回缴费（管理员）"""
+    model_config = ConfigDict(defer_build=True)
+
     reject_reason: str = Field(..., max_length=255)
 
 
-class SettlementPaymentResponse(BaseModel):
+class SettlementPaymentResponse(ORMModel):
     """缴费记录响应"""
     payment_id: int
     period_id: int
@@ -524,9 +451,6 @@ class SettlementPaymentResponse(BaseModel):
     confirmed_by: Optional[int] = None
     reject_reason: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-
 
 class SettlementMeResponse(BaseModel):
     """结算中心（用户视角）聚合响应"""
@@ -541,10 +465,12 @@ class SettlementMeResponse(BaseModel):
 
 class SettlementBanReportReject(BaseModel):
     """驳回封号提报（管理员）"""
+    model_config = ConfigDict(defer_build=True)
+
     reject_reason: str = Field(..., max_length=255)
 
 
-class SettlementBanReportResponse(BaseModel):
+class SettlementBanReportResponse(ORMModel):
     """封号提报响应"""
     report_id: int
     period_id: int
@@ -569,38 +495,29 @@ class SettlementBanReportResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== 钱包相关 ====================
 
-class WalletAccountResponse(BaseModel):
+class WalletAccountResponse(ORMModel):
     """钱包账户响应"""
     user_id: int
-    available_coins: int
-    locked_coins: int
+    available_coins: CoinInt
+    locked_coins: CoinInt
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
-class WalletLedgerEntryResponse(BaseModel):
+class WalletLedgerEntryResponse(ORMModel):
     """钱包账本流水响应"""
     ledger_id: int
     user_id: int
     period_id: Optional[int] = None
     entry_type: str
-    delta_available_coins: int
-    delta_locked_coins: int
+    delta_available_coins: CoinInt
+    delta_locked_coins: CoinInt
     ref_source_user_id: Optional[int] = None
     remark: Optional[str] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class WalletDownlineDueSummary(BaseModel):
     """下级待缴汇总"""
@@ -633,10 +550,12 @@ class WithdrawRequestCreate(BaseModel):
 
 class WithdrawRequestReject(BaseModel):
     """提现驳回原因"""
+    model_config = ConfigDict(defer_build=True)
+
     reject_reason: str = Field(..., min_length=1, max_length=255)
 
 
-class WithdrawRequestResponse(BaseModel):
+class WithdrawRequestResponse(ORMModel):
     """提现申请响应"""
     withdraw_id: int
     user_id: int
@@ -649,9 +568,6 @@ class WithdrawRequestResponse(BaseModel):
     processed_by: Optional[int] = None
     reject_reason: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-
 
 # ==================== 统计相关 ====================
 
@@ -689,13 +605,3 @@ class DashboardAccountStatusResponse(BaseModel):
     basis_label: str
     counts: Dict[str, int] = {}
     items: List[DashboardAccountStatusItem] = []
-
-
-class EarningStats(BaseModel):
-    """收益统计"""
-    date: date
-    coins_total: int
-    coins_from_food: int
-    coins_from_look: int
-    coins_from_box: int
-    coins_from_search: int
@@ -1,5 +1,6 @@
 from datetime import date, timedelta
 
+from sqlalchemy import case, exists, select
 from sqlalchemy.orm import Session
 
 from app.models import EarningRecord
@@ -8,28 +9,39 @@ from app.models import EarningRecord
 def pick_account_health_basis(db: Session) -> tuple[date, str, str]:
     """选择账号状态统计日：今日有数据用今日，否则用昨日"""
     today = date.today()
-    has_today = (
-        db.query(EarningRecord.stat_date)
-        .filter(EarningRecord.stat_date == today)
-        .limit(1)
-        .first()
-        is not None
-    )
+    # EXISTS 探测：数据库按索引命中即返回单个布尔值
+    has_today = bool(db.execute(select(exists().where(EarningRecord.stat_date == today))).scalar())
     stat_date = today if has_today else (today - timedelta(days=1))
     basis = "today" if has_today else "yesterday"
     basis_label = "今日" if has_today else "昨日"
     return stat_date, basis, basis_label
 
 
+# 分类阈值（统计日金币）：< BLACK 为黑号，< EDGE 为边缘，其余正常
+ACCOUNT_HEALTH_BLACK_BELOW = 500
+ACCOUNT_HEALTH_EDGE_BELOW = 10000
+
+
 def classify_account_health(has_data: bool, coins: int) -> tuple[str, str]:
     """按统计日金币分类账号状态"""
     if not has_data:
         return "no_data", "未统计"
     if coins <= 0:
         return "need_config", "需更换配置"
-    if coins < 500:
+    if coins < ACCOUNT_HEALTH_BLACK_BELOW:
         return "black", "黑号"
-    if coins < 10000:
+    if coins < ACCOUNT_HEALTH_EDGE_BELOW:
         return "edge", "边缘"
     return "normal", "正常"
 
+
+def account_health_severity(has_data, coins):
+    """与 classify_account_health 同口径的 SQL 严重度表达式（0=未统计 … 4=正常），用于 ORDER BY"""
+    return case(
+        (~has_data, 0),
+        (coins <= 0, 1),
+        (coins < ACCOUNT_HEALTH_BLACK_BELOW, 2),
+        (coins < ACCOUNT_HEALTH_EDGE_BELOW, 3),
+        else_=4,
+    )
+
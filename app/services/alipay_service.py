@@ -4,6 +4,8 @@
 """
 import os
 import json
+import threading
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Optional, List, Dict
@@ -194,6 +196,34 @@ def get_alipay_config(db: Session) -> Optional[AlipayConfig]:
     ).order_by(AlipayConfig.id.desc()).first()
 
 
+# 收款码 URL 短时缓存：结算中心等高频页面每次都要展示，配置变更时由管理接口主动失效
+ALIPAY_QRCODE_CACHE_TTL = 30
+_qrcode_cache: Dict[str, object] = {"url": None, "expire_at": 0.0}
+_qrcode_cache_lock = threading.Lock()
+
+
+def get_alipay_qrcode_url(db: Session) -> Optional[str]:
+    """获取启用配置的收款码 URL（带 TTL 缓存）"""
+    now = time.monotonic()
+    with _qrcode_cache_lock:
+        if now < _qrcode_cache["expire_at"]:
+            return _qrcode_cache["url"]
+
+    config = get_alipay_config(db)
+    url = config.qrcode_url if config else None
+    with _qrcode_cache_lock:
+        _qrcode_cache["url"] = url
+        _qrcode_cache["expire_at"] = now + ALIPAY_QRCODE_CACHE_TTL
+    return url
+
+
+def invalidate_alipay_config_cache() -> None:
+    """支付宝配置变更后清空缓存"""
+    with _qrcode_cache_lock:
+        _qrcode_cache["url"] = None
+        _qrcode_cache["expire_at"] = 0.0
+
+
 def generate_order_no() -> str:
     """生成订单号 CZ + 年月日时分秒 + 4位随机数"""
     now = datetime.now()
@@ -7,7 +7,7 @@ from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
 from app.models import EarningRecord, EnvStatus, QLInstance, UserScriptConfig, UserScriptEnv
-from app.services.qinglong import QingLongClient
+from app.services.qinglong import QingLongClient, get_cached_client
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +48,7 @@ def _get_qinglong_client(db: Session, config: UserScriptConfig) -> Optional[Qing
     )
     if not instance:
         return None
-    return QingLongClient(instance)
+    return get_cached_client(instance)
 
 
 def _latest_earning_date(db: Session) -> Optional[date]:
@@ -1,45 +1,96 @@
 # app/services/qinglong.py
+import threading
 import time
-from typing import Any, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 from app.models import QLInstance
 
+# 每个客户端的 keep-alive 连接池大小
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 20
+
+# 批量同步：单次批量创建的变量数、并发更新的最大请求数（不超过连接池大小）
+BULK_CREATE_CHUNK = 200
+BULK_UPDATE_CONCURRENCY = 16
+
+# 连通性测试超时（连接, 读取），避免故障实例长时间占用工作线程
+PING_TIMEOUT = (3, 6)
+
 
 class QingLongClient:
     """青龙面板 API 客户端"""
     
     def __init__(self, instance: QLInstance):
+        self.instance_id = instance.id
         self.base_url = instance.base_url.rstrip("/")
         self.client_id = instance.client_id
         self.client_secret = instance.client_secret
-        self._token: Optional[str] = None
-        self._expire_at: float = 0.0
+        # (token, 提前 60 秒的失效时刻)，整体替换，无锁读取时 token 与有效期始终配套
+        self._token_entry: Optional[Tuple[str, float]] = None
+        # 缓存的客户端被多个工作线程共享，token 刷新串行化，避免同时打到鉴权接口
+        self._token_lock = threading.Lock()
+
+        # 复用 TCP 连接，避免每次请求重新握手
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def matches(self, instance: QLInstance) -> bool:
+        """实例地址/凭据是否与当前客户端一致"""
+        return (
+            self.base_url == instance.base_url.rstrip("/")
+            and self.client_id == instance.client_id
+            and self.client_secret == instance.client_secret
+        )
 
-    def _get_token(self) -> str:
-        """获取或刷新 token"""
-        now = time.time()
-        if self._token and now < self._expire_at - 60:
-            return self._token
+    def close(self) -> None:
+        """关闭连接池"""
+        self._session.close()
 
+    def _get_token(self, timeout: Any = 10) -> str:
+        """获取或刷新 token"""
+        entry = self._token_entry
+        if entry is not None and time.time() < entry[1]:
+            return entry[0]
+
+        with self._token_lock:
+            # 等锁期间其他线程可能已刷新
+            now = time.time()
+            entry = self._token_entry
+            if entry is not None and now < entry[1]:
+                return entry[0]
+            return self._refresh_token(now, timeout)
+
+    def _refresh_token(self, now: float, timeout: Any) -> str:
+        """请求鉴权接口获取新 token（调用方持有 _token_lock）"""
         url = f"{self.base_url}/open/auth/token"
-        r = requests.get(
-            url,
-            params={"client_id": self.client_id, "client_secret": self.client_secret},
-            timeout=10,
-        )
-        r.raise_for_status()
-
-        data = r.json()
-        if data.get("code") != 200:
-            raise RuntimeError(f"获取青龙 token 失败: {data}")
+        try:
+            r = self._session.get(
+                url,
+                params={"client_id": self.client_id, "client_secret": self.client_secret},
+                timeout=timeout,
+            )
+            r.raise_for_status()
+
+            data = orjson.loads(r.content)
+            if data.get("code") != 200:
+                raise RuntimeError(f"获取青龙 token 失败: {data}")
+        except Exception:
+            # token 获取失败时移出缓存（不关闭连接池），下次请求重建客户端
+            self._token_entry = None
+            evict_cached_client(self.instance_id, self)
+            raise
 
         token = data["data"]["token"]
         expiration = data["data"].get("expiration") or 3600
 
-        self._token = token
-        self._expire_at = now + float(expiration)
+        self._token_entry = (token, now + float(expiration) - 60)
         return token
 
     def _headers(self) -> Dict[str, str]:
@@ -53,12 +104,15 @@ class QingLongClient:
         url = f"{self.base_url}{endpoint}"
         kwargs.setdefault("headers", self._headers())
         kwargs.setdefault("timeout", 15)
+        if "json" in kwargs:
+            # 请求体用 orjson 编码（Content-Type 已在 _headers 中声明）
+            kwargs["data"] = orjson.dumps(kwargs.pop("json"))
 
-        r = requests.request(method, url, **kwargs)
+        r = self._session.request(method, url, **kwargs)
 
         # 尝试解析响应
         try:
-            data = r.json()
+            data = orjson.loads(r.content)
         except Exception:
             # 如果不是 JSON 响应，抛出详细错误
             error_msg = f"青龙请求失败: {method} {url} -> HTTP {r.status_code}\n响应内容: {r.text[:500]}"
@@ -78,7 +132,7 @@ class QingLongClient:
     
     def ping(self) -> Dict[str, Any]:
         """连通性测试：能否成功拿到 token"""
-        token = self._get_token()
+        token = self._get_token(timeout=PING_TIMEOUT)
         return {"ok": True, "token_prefix": token[:12]}
 
     # ==================== 环境变量管理 ====================
@@ -191,3 +245,135 @@ class QingLongClient:
                 self.disable_env(env_id)
         
         return result
+
+    def bulk_sync(self, envs: List[Dict[str, Any]]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        """批量同步环境变量：拉取一次全量列表按名称比对，再分类批量创建/更新/启用/禁用
+
+        Args:
+            envs: [{"name": "xxx", "value": "xxx", "remarks": "xxx", "enabled": True}, ...]
+
+        返回与 envs 一一对应的 (结果, 异常)；同名变量与逐条 sync_env 一致，以最后一条为准
+        """
+        if not envs:
+            return []
+
+        existing: Dict[str, Dict[str, Any]] = {}
+        for env in self.list_envs():
+            existing.setdefault(env.get("name"), env)
+        wanted = {item["name"]: item for item in envs}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, Exception] = {}
+
+        # 1) 不存在的变量分块批量创建
+        to_create = [name for name in wanted if name not in existing]
+        for start in range(0, len(to_create), BULK_CREATE_CHUNK):
+            chunk = to_create[start:start + BULK_CREATE_CHUNK]
+            try:
+                created = self.create_envs_batch(
+                    [{"name": n, "value": wanted[n]["value"], "remarks": wanted[n]["remarks"]} for n in chunk]
+                )
+            except Exception as e:
+                errors.update(dict.fromkeys(chunk, e))
+                continue
+            created_by_name = {env.get("name"): env for env in created}
+            for name in chunk:
+                if name in created_by_name:
+                    results[name] = created_by_name[name]
+                else:
+                    errors[name] = RuntimeError(f"青龙未返回新建的变量: {name}")
+
+        # 2) 已存在且值/备注有变化的并发更新（青龙更新接口只支持单条），无变化的直接复用
+        to_update = []
+        for name, item in wanted.items():
+            env = existing.get(name)
+            if env is None:
+                continue
+            if env.get("value") == item["value"] and env.get("remarks") == item["remarks"]:
+                results[name] = env
+            else:
+                to_update.append((name, env.get("id") or env.get("_id")))
+
+        def _update_one(entry: Tuple[str, Any]):
+            name, env_id = entry
+            try:
+                item = wanted[name]
+                return name, self.update_env(env_id, name, item["value"], item["remarks"]), None
+            except Exception as e:
+                return name, None, e
+
+        if to_update:
+            with ThreadPoolExecutor(max_workers=min(BULK_UPDATE_CONCURRENCY, len(to_update))) as pool:
+                for name, result, error in pool.map(_update_one, to_update):
+                    if error is not None:
+                        errors[name] = error
+                    else:
+                        results[name] = result
+
+        # 3) 启用/禁用各一次批量请求
+        for enabled, toggle in ((True, self.enable_envs), (False, self.disable_envs)):
+            names = [
+                name for name, result in results.items()
+                if bool(wanted[name].get("enabled", True)) is enabled and (result.get("id") or result.get("_id"))
+            ]
+            if not names:
+                continue
+            try:
+                toggle([results[name].get("id") or results[name].get("_id") for name in names])
+            except Exception as e:
+                for name in names:
+                    errors[name] = e
+                    results.pop(name, None)
+
+        return [(results.get(item["name"]), errors.get(item["name"])) for item in envs]
+
+
+# ==================== 客户端缓存 ====================
+
+_CLIENT_CACHE: Dict[int, QingLongClient] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+def get_cached_client(instance: QLInstance) -> QingLongClient:
+    """按实例ID复用客户端（连接池 + token），实例地址/凭据变更后自动重建
+
+    连接池只在应用关闭时（close_cached_clients）显式关闭。
+    """
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(instance.id)
+        if client is not None and client.matches(instance):
+            return client
+        # 旧客户端可能仍被其他请求线程使用，只替换缓存引用，不关闭其连接池（由 GC 回收）
+        client = QingLongClient(instance)
+        if instance.id is not None:
+            _CLIENT_CACHE[instance.id] = client
+        return client
+
+
+def peek_cached_client(instance_id: int) -> Optional[QingLongClient]:
+    """仅查看缓存中的客户端，不做校验也不新建"""
+    with _CLIENT_CACHE_LOCK:
+        return _CLIENT_CACHE.get(instance_id)
+
+
+def evict_cached_client(instance_id: Optional[int], client: Optional[QingLongClient] = None) -> None:
+    """移除缓存的客户端（传入 client 时仅当缓存项就是它才移除）
+
+    只丢弃缓存引用、不关闭连接池：其他线程可能仍在用该客户端发请求，关闭会让它们一并失败。
+    """
+    if instance_id is None:
+        return
+    with _CLIENT_CACHE_LOCK:
+        cached = _CLIENT_CACHE.get(instance_id)
+        if cached is None or (client is not None and cached is not client):
+            return
+        del _CLIENT_CACHE[instance_id]
+
+
+def close_cached_clients() -> None:
+    """关闭并清空全部缓存的客户端（应用关闭时调用）"""
+    with _CLIENT_CACHE_LOCK:
+        clients = list(_CLIENT_CACHE.values())
+        _CLIENT_CACHE.clear()
+    for client in clients:
+        client.close()
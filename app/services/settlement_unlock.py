@@ -3,10 +3,108 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Any, Dict, Optional
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.orm import Session
 
 
+# 解锁路径的语句在模块加载时构建一次，逐次调用直接复用
+_SQL_BENEFICIARY_UNLOCK_SUM = text(
+    """
+    SELECT COALESCE(SUM(c.amount_coins), 0) AS sum_coins
+    FROM settlement_commissions c
+    JOIN settlement_user_payable p
+      ON p.period_id = c.period_id AND p.user_id = c.beneficiary_user_id
+    WHERE c.period_id = :period_id
+      AND c.beneficiary_user_id = :beneficiary
+      AND c.funding_status = 1
+      AND c.is_unlocked = 0
+      AND p.status = 2
+    FOR UPDATE
+    """
+)
+
+_SQL_PERIOD_UNLOCK_SUMS = text(
+    """
+    SELECT c.beneficiary_user_id AS beneficiary_user_id,
+           COALESCE(SUM(c.amount_coins), 0) AS sum_coins
+    FROM settlement_commissions c
+    JOIN settlement_user_payable p
+      ON p.period_id = c.period_id AND p.user_id = c.beneficiary_user_id
+    WHERE c.period_id = :period_id
+      AND c.funding_status = 1
+      AND c.is_unlocked = 0
+      AND p.status = 2
+    GROUP BY c.beneficiary_user_id
+    FOR UPDATE
+    """
+)
+
+_SQL_LOCK_WALLETS = text(
+    """
+    SELECT user_id, locked_coins
+    FROM wallet_accounts
+    WHERE user_id IN :user_ids
+    FOR UPDATE
+    """
+).bindparams(bindparam("user_ids", expanding=True))
+
+_SQL_MARK_UNLOCKED = text(
+    """
+    UPDATE settlement_commissions
+    SET is_unlocked = 1,
+        unlocked_at = :now
+    WHERE period_id = :period_id
+      AND beneficiary_user_id IN :user_ids
+      AND funding_status = 1
+      AND is_unlocked = 0
+    """
+).bindparams(bindparam("user_ids", expanding=True))
+
+_SQL_INSERT_UNLOCK_LEDGER = text(
+    """
+    INSERT INTO wallet_ledger(user_id, period_id, entry_type, delta_available_coins, delta_locked_coins, remark)
+    VALUES (:user_id, :period_id, 'COMMISSION_UNLOCK', :sum_coins, :neg_sum, 'unlock after paid')
+    """
+)
+
+_SQL_UPSERT_UNLOCK_WALLET = text(
+    """
+    INSERT INTO wallet_accounts(user_id, available_coins, locked_coins)
+    VALUES (:user_id, :sum_coins, :neg_sum)
+    ON DUPLICATE KEY UPDATE
+      available_coins = available_coins + VALUES(available_coins),
+      locked_coins = locked_coins + VALUES(locked_coins)
+    """
+)
+
+_SQL_SOURCE_UNLOCK_SUMS = text(
+    """
+    SELECT c.beneficiary_user_id AS beneficiary_user_id,
+           COALESCE(SUM(c.amount_coins), 0) AS sum_coins
+    FROM settlement_commissions c
+    JOIN settlement_user_payable p
+      ON p.period_id = c.period_id AND p.user_id = c.beneficiary_user_id
+    WHERE c.period_id = :period_id
+      AND c.funding_status = 1
+      AND c.is_unlocked = 0
+      AND p.status = 2
+      AND (
+        c.beneficiary_user_id = :source_user_id
+        OR c.beneficiary_user_id IN (
+          SELECT beneficiary_user_id
+          FROM settlement_commissions
+          WHERE period_id = :period_id
+            AND source_user_id = :source_user_id
+            AND funding_status = 1
+            AND funded_at = :now
+        )
+      )
+    GROUP BY c.beneficiary_user_id
+    FOR UPDATE
+    """
+)
+
+
 def unlock_commissions_for_beneficiary(
     db: Session,
     period_id: int,
@@ -29,20 +127,7 @@ def unlock_commissions_for_beneficiary(
     # 锁定符合条件的 commission 行，并计算本次可解锁总额
     row = (
         db.execute(
-            text(
-                """
-                SELECT COALESCE(SUM(c.amount_coins), 0) AS sum_coins
-                FROM settlement_commissions c
-                JOIN settlement_user_payable p
-                  ON p.period_id = c.period_id AND p.user_id = c.beneficiary_user_id
-                WHERE c.period_id = :period_id
-                  AND c.beneficiary_user_id = :beneficiary
-                  AND c.funding_status = 1
-                  AND c.is_unlocked = 0
-                  AND p.status = 2
-                FOR UPDATE
-                """
-            ),
+            _SQL_BENEFICIARY_UNLOCK_SUM,
             {"period_id": int(period_id), "beneficiary": int(beneficiary_user_id)},
         )
         .mappings()
@@ -52,102 +137,72 @@ def unlock_commissions_for_beneficiary(
     if sum_coins <= 0:
         return 0
 
-    # 锁定钱包行，确保 locked 足够（避免凭空造币）
-    wallet = (
-        db.execute(
-            text(
-                """
-                SELECT available_coins, locked_coins
-                FROM wallet_accounts
-                WHERE user_id = :user_id
-                FOR UPDATE
-                """
-            ),
-            {"user_id": int(beneficiary_user_id)},
-        )
-        .mappings()
-        .first()
-    )
-    if wallet is None:
-        # 理论上：只有发生过 locked 入账才会有可解锁金额；若钱包不存在，属于数据不一致
-        db.execute(
-            text(
-                """
-                INSERT INTO wallet_accounts(user_id, available_coins, locked_coins)
-                VALUES (:user_id, 0, 0)
-                ON DUPLICATE KEY UPDATE user_id = user_id
-                """
-            ),
-            {"user_id": int(beneficiary_user_id)},
-        )
-        wallet = (
-            db.execute(
-                text(
-                    """
-                    SELECT available_coins, locked_coins
-                    FROM wallet_accounts
-                    WHERE user_id = :user_id
-                    FOR UPDATE
-                    """
-                ),
-                {"user_id": int(beneficiary_user_id)},
-            )
-            .mappings()
-            .first()
-        )
+    # 钱包校验 + commission / ledger / wallet 三步写入与批量解锁共用同一实现
+    result = _apply_unlock_sums(db, period_id, {int(beneficiary_user_id): sum_coins}, now)
+    return int(result["unlocked_total_coins"])
 
-    locked = int((wallet or {}).get("locked_coins") or 0)
-    if locked < sum_coins:
-        raise ValueError(
-            f"解锁失败：钱包 locked 不足（user_id={beneficiary_user_id}, locked={locked}, need={sum_coins}）"
-        )
+
+def _apply_unlock_sums(db: Session, period_id: int, sums: Dict[int, int], now: datetime) -> Dict[str, Any]:
+    """
+    按 {beneficiary_user_id: 可解锁 coins} 批量执行解锁（调用方已用 FOR UPDATE 锁定 commission 行）。
+
+    任一用户钱包 locked 不足时抛出 ValueError，由调用方回滚。
+    """
+    sums = {uid: need for uid, need in sums.items() if uid > 0 and need > 0}
+    if not sums:
+        return {"unlocked_users": 0, "unlocked_total_coins": 0}
+    user_ids = list(sums)
+
+    # 锁定钱包行，确保 locked 足够（避免凭空造币）
+    wallets = db.execute(_SQL_LOCK_WALLETS, {"user_ids": user_ids}).mappings().all()
+    locked_map = {int(w["user_id"]): int(w["locked_coins"] or 0) for w in wallets}
+    for uid, need in sums.items():
+        locked = locked_map.get(uid, 0)
+        if locked < need:
+            raise ValueError(f"解锁失败：钱包 locked 不足（user_id={uid}, locked={locked}, need={need}）")
 
     # 1) 标记 commission 已解锁
-    db.execute(
-        text(
-            """
-            UPDATE settlement_commissions
-            SET is_unlocked = 1,
-                unlocked_at = :now
-            WHERE period_id = :period_id
-              AND beneficiary_user_id = :beneficiary
-              AND funding_status = 1
-              AND is_unlocked = 0
-            """
-        ),
-        {"now": now, "period_id": int(period_id), "beneficiary": int(beneficiary_user_id)},
-    )
+    db.execute(_SQL_MARK_UNLOCKED, {"now": now, "period_id": int(period_id), "user_ids": user_ids})
 
-    # 2) 写入账本（locked -> available）
+    # 2) 写入账本（locked -> available），executemany 合并为多行 INSERT
     db.execute(
-        text(
-            """
-            INSERT INTO wallet_ledger(user_id, period_id, entry_type, delta_available_coins, delta_locked_coins, remark)
-            VALUES (:user_id, :period_id, 'COMMISSION_UNLOCK', :sum_coins, :neg_sum, 'unlock after paid')
-            """
-        ),
-        {
-            "user_id": int(beneficiary_user_id),
-            "period_id": int(period_id),
-            "sum_coins": int(sum_coins),
-            "neg_sum": -int(sum_coins),
-        },
+        _SQL_INSERT_UNLOCK_LEDGER,
+        [
+            {"user_id": uid, "period_id": int(period_id), "sum_coins": need, "neg_sum": -need}
+            for uid, need in sums.items()
+        ],
     )
 
-    # 3) 更新账户余额
+    # 3) 更新账户余额（钱包行已确认存在，ON DUPLICATE KEY 只走更新分支）
     db.execute(
-        text(
-            """
-            UPDATE wallet_accounts
-            SET available_coins = available_coins + :sum_coins,
-                locked_coins = locked_coins - :sum_coins
-            WHERE user_id = :user_id
-            """
-        ),
-        {"user_id": int(beneficiary_user_id), "sum_coins": int(sum_coins)},
+        _SQL_UPSERT_UNLOCK_WALLET,
+        [{"user_id": uid, "sum_coins": need, "neg_sum": -need} for uid, need in sums.items()],
     )
 
-    return sum_coins
+    return {"unlocked_users": len(sums), "unlocked_total_coins": sum(sums.values())}
+
+
+def unlock_commissions_for_source(
+    db: Session,
+    period_id: int,
+    source_user_id: int,
+    now: datetime,
+) -> Dict[str, Any]:
+    """
+    来源用户缴清后，一次性解锁相关受益人的已资金化分成（集合化版本）。
+
+    覆盖范围与逐个调用 unlock_commissions_for_beneficiary 一致：
+    - 本次刚资金化（funded_at = now）的 commission 的所有 beneficiary
+    - source_user_id 本人
+
+    任一用户钱包 locked 不足时抛出 ValueError，由调用方回滚。
+    """
+    params = {"now": now, "period_id": int(period_id), "source_user_id": int(source_user_id)}
+
+    # 锁定符合条件的 commission 行，并按受益人聚合可解锁总额
+    rows = db.execute(_SQL_SOURCE_UNLOCK_SUMS, params).mappings().all()
+    sums = {int(r["beneficiary_user_id"] or 0): int(r["sum_coins"] or 0) for r in rows}
+    return _apply_unlock_sums(db, period_id, sums, now)
 
 
 def unlock_commissions_for_period(
@@ -165,46 +220,11 @@ def unlock_commissions_for_period(
     if now is None:
         now = datetime.now()
 
+    # 一条聚合查询锁定并汇总全部受益人，再批量解锁（不再逐人调用）
     rows = (
-        db.execute(
-            text(
-                """
-                SELECT c.beneficiary_user_id AS beneficiary_user_id
-                FROM settlement_commissions c
-                JOIN settlement_user_payable p
-                  ON p.period_id = c.period_id AND p.user_id = c.beneficiary_user_id
-                WHERE c.period_id = :period_id
-                  AND c.funding_status = 1
-                  AND c.is_unlocked = 0
-                  AND p.status = 2
-                GROUP BY c.beneficiary_user_id
-                """
-            ),
-            {"period_id": int(period_id)},
-        )
+        db.execute(_SQL_PERIOD_UNLOCK_SUMS, {"period_id": int(period_id)})
         .mappings()
         .all()
     )
-
-    unlocked_users = 0
-    unlocked_total_coins = 0
-
-    for r in rows:
-        beneficiary_user_id = int(r.get("beneficiary_user_id") or 0)
-        if beneficiary_user_id <= 0:
-            continue
-        unlocked = unlock_commissions_for_beneficiary(
-            db,
-            int(period_id),
-            beneficiary_user_id,
-            now=now,
-        )
-        if unlocked > 0:
-            unlocked_users += 1
-            unlocked_total_coins += int(unlocked)
-
-    return {
-        "unlocked_users": unlocked_users,
-        "unlocked_total_coins": unlocked_total_coins,
-    }
-
+    sums = {int(r["beneficiary_user_id"] or 0): int(r["sum_coins"] or 0) for r in rows}
+    return _apply_unlock_sums(db, period_id, sums, now)
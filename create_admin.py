@@ -1,28 +1,38 @@
 """
 创建管理员账号的脚本
 使用方法: python create_admin.py
+（非交互环境可设置 ADMIN_PASSWORD 环境变量传入密码）
 """
+import os
 import sys
+from getpass import getpass
 from pathlib import Path
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.database import SessionLocal, init_db
+from sqlalchemy import inspect, select
+
+from app.database import SessionLocal, engine, init_db
 from app.models import User, UserRole
 from app.auth import hash_password
 
 def create_admin():
     """创建管理员账号"""
-    # 初始化数据库
-    init_db()
+    # 初始化数据库（表已存在时跳过，建表/补索引由应用启动时的 init_db 负责）
+    if not inspect(engine).has_table(User.__tablename__):
+        init_db()
     
-    db = SessionLocal()
+    # 存在性检查直接走连接，不开 ORM Session；会话只在最终写入时打开，避免等待输入期间占用事务
+    db = None
     try:
-        # 检查是否已有管理员
-        admin_exists = db.query(User).filter(User.role == UserRole.ADMIN).first()
-        if admin_exists:
-            print(f"管理员已存在: {admin_exists.username}")
+        # 检查是否已有管理员（只取用户名，不加载整行）
+        with engine.connect() as conn:
+            admin_username = conn.scalar(
+                select(User.username).where(User.role == UserRole.ADMIN).limit(1)
+            )
+        if admin_username:
+            print(f"管理员已存在: {admin_username}")
             response = input("是否要创建新的管理员？(y/n): ")
             if response.lower() != 'y':
                 print("已取消创建")
@@ -39,33 +49,41 @@ def create_admin():
             return
         
         # 检查用户名是否已存在
-        existing_user = db.query(User).filter(User.username == username).first()
-        if existing_user:
+        with engine.connect() as conn:
+            existing_user_id = conn.scalar(select(User.id).where(User.username == username).limit(1))
+        if existing_user_id is not None:
             print(f"用户名 {username} 已存在")
             response = input("是否要将其设置为管理员？(y/n): ")
             if response.lower() == 'y':
-                existing_user.role = UserRole.ADMIN
+                db = SessionLocal()
+                db.query(User).filter(User.id == existing_user_id).update(
+                    {User.role: UserRole.ADMIN}, synchronize_session=False
+                )
                 db.commit()
                 print(f"已将用户 {username} 设置为管理员")
                 return
             else:
                 return
         
-        password = input("请输入密码: ").strip()
+        # 非交互环境（容器/CI）可通过 ADMIN_PASSWORD 传入密码，跳过确认输入
+        env_password = None if sys.stdin.isatty() else os.environ.get("ADMIN_PASSWORD")
+        password = (env_password if env_password is not None else getpass("请输入密码: ")).strip()
         if len(password) < 6:
             print("密码长度至少6个字符")
             return
         
-        confirm_password = input("请再次输入密码: ").strip()
-        if password != confirm_password:
-            print("两次输入的密码不一致")
-            return
+        if env_password is None:
+            confirm_password = getpass("请再次输入密码: ").strip()
+            if password != confirm_password:
+                print("两次输入的密码不一致")
+                return
         
         nickname = input("请输入昵称（可选）: ").strip() or None
         phone = input("请输入手机号（可选）: ").strip() or None
         wechat_id = input("请输入微信ID（可选）: ").strip() or None
         
         # 创建管理员
+        db = SessionLocal()
         hashed_password = hash_password(password)
         admin_user = User(
             username=username,
@@ -79,21 +97,22 @@ def create_admin():
         
         db.add(admin_user)
         db.commit()
-        db.refresh(admin_user)
         
         print("=" * 50)
         print("管理员创建成功！")
-        print(f"用户名: {admin_user.username}")
+        print(f"用户名: {username}")
         print(f"角色: 管理员")
         print("=" * 50)
         
     except Exception as e:
-        db.rollback()
+        if db is not None:
+            db.rollback()
         print(f"创建管理员失败: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        db.close()
+        if db is not None:
+            db.close()
 
 if __name__ == "__main__":
     create_admin()